@@ -1,8 +1,220 @@
-from django.contrib import admin
-from .models import User, Restaurant, Table, Booking, TimeSlot
+"""
+Админка. Слоты и брони - самые большие таблицы, поэтому у них:
+  - связанные объекты в списке одним JOIN (list_select_related), выбор связей по id
+    (raw_id_fields) и фильтр по id ресторана (RestaurantIdFilter) вместо выпадающих
+    списков и списков фильтра на всю таблицу;
+  - сортировка и date_hierarchy по проиндексированному полю;
+  - число строк без COUNT(*) по всей таблице (EstimatedCountPaginator,
+    show_full_result_count = False);
+  - массовые действия одним UPDATE/DELETE на выборку вместо save()/delete() на
+    каждый объект. Действие применяется к отмеченным строкам или ко всей
+    отфильтрованной выборке ("выбрать все"), так что диапазон задаётся фильтрами
+    и date_hierarchy. Стандартное delete_selected для этих моделей убрано: оно
+    удаляет по объекту и строит страницу подтверждения со всеми связями.
+"""
+from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.functional import cached_property
+
+from .caching import bump_version
+from .models import User, Restaurant, Table, Booking, TimeSlot, RestaurantSchedule, TimeSlotHistory, Job, raw_delete
+from .signals import timeslots_bulk_changed
+
+
+def estimated_count(model, using):
+    """Оценка числа строк таблицы по статистике СУБД или None."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+            row = cursor.fetchone()
+            # -1 - таблицу ещё не анализировали
+            return row[0] if row and row[0] >= 0 else None
+        if connection.vendor == 'sqlite':
+            try:
+                # Появляется после ANALYZE; первое число stat - строк в таблице
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                row = cursor.fetchone()
+            except DatabaseError:
+                row = None
+            if row:
+                return int(row[0].split()[0])
+            # Без статистики - по границам первичного ключа (два поиска по индексу)
+            cursor.execute(f'SELECT MAX(rowid) - MIN(rowid) + 1 FROM "{table}"')
+            return cursor.fetchone()[0]
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Без фильтров число строк берётся из статистики СУБД (если строк больше
+    count_limit). С фильтрами - точный COUNT, но не дальше count_limit строк:
+    остальные страницы доступны через уточнение фильтров.
+    """
+    count_limit = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list.order_by()
+        if not queryset.query.where:
+            estimate = estimated_count(queryset.model, queryset.db)
+            if estimate is not None and estimate > self.count_limit:
+                return estimate
+        return queryset[:self.count_limit].count()
+
+
+def _affected(slots):
+    """Столики и диапазон дней выборки слотов одним запросом или None, если она пуста."""
+    rows = list(slots.order_by().values('table_id').annotate(first=Min('start_time'), last=Max('start_time')))
+    if not rows:
+        return None
+    return (
+        [row['table_id'] for row in rows],
+        timezone.localdate(min(row['first'] for row in rows)),
+        timezone.localdate(max(row['last'] for row in rows)),
+    )
+
+
+def _change_slots(slots, operation):
+    """
+    Выполнить над выборкой слотов set-based операцию operation(slots) -> (слотов, броней)
+    и разослать то, что при save() сделали бы сигналы на каждый слот:
+    пересчёт сводки, запись в ленту изменений, новые версии кэша.
+    """
+    with transaction.atomic():
+        affected = _affected(slots)
+        if affected is None:
+            return 0, 0
+        changed, bookings = operation(slots)
+        table_ids, date_from, date_to = affected
+        timeslots_bulk_changed.send(sender=TimeSlot, table_ids=table_ids, date_from=date_from, date_to=date_to)
+    if bookings:
+        bump_version('booking')
+    return changed, bookings
+
+
+def _delete_bookings(slots):
+    return raw_delete(Booking.objects.filter(timeslot__in=slots.order_by().values('pk')))
+
+
+def free_slots(slots):
+    """Освободить слоты; их брони удаляются."""
+    def operation(slots):
+        bookings = _delete_bookings(slots)
+        return slots.exclude(status='free').update(status='free'), bookings
+    return _change_slots(slots, operation)
+
+
+def reserve_slots(slots):
+    """Закрыть свободные слоты для брони (без Booking - например, под мероприятие)."""
+    return _change_slots(slots, lambda slots: (slots.filter(status='free').update(status='reserved'), 0))
+
+
+def delete_slots(slots):
+    """Удалить слоты вместе с бронями."""
+    def operation(slots):
+        bookings = _delete_bookings(slots)
+        return raw_delete(slots), bookings
+    return _change_slots(slots, operation)
+
+
+class RestaurantIdFilter(admin.SimpleListFilter):
+    """
+    Фильтр по id ресторана полем ввода. RelatedFieldListFilter выводил бы в боковую
+    панель все рестораны каталога на каждый показ списка.
+    """
+    title = 'ресторан (id)'
+    parameter_name = 'restaurant'
+    template = 'admin/api_restaurant/id_filter.html'
+
+    def lookups(self, request, model_admin):
+        return ()
+
+    def has_output(self):
+        return True
+
+    def choices(self, changelist):
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': 'Все',
+            # Остальные фильтры и сортировка - скрытыми полями формы ввода id
+            'params': [(name, value) for name, value in changelist.params.items() if name != self.parameter_name],
+        }
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if not value:
+            return queryset
+        if not value.isdigit():
+            raise IncorrectLookupParameters(f'id ресторана - число, получено {value!r}')
+        return queryset.filter(table__restaurant_id=int(value))
+
+
+class ScalableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+
+@admin.register(TimeSlot)
+class TimeSlotAdmin(ScalableAdmin):
+    list_display = ('id', 'table', 'start_time', 'end_time', 'status')
+    list_select_related = ('table__restaurant',)
+    # status и столик ресторана - по индексу timeslot_table_status_time,
+    # start_time - по timeslot_start_time
+    list_filter = ('status', ('start_time', admin.DateFieldListFilter), RestaurantIdFilter)
+    raw_id_fields = ('table',)
+    date_hierarchy = 'start_time'
+    ordering = ('-start_time',)
+    actions = ('free_selected', 'reserve_selected', 'delete_selected_slots')
+
+    @admin.action(description='Освободить выбранные слоты (брони удаляются)', permissions=['change'])
+    def free_selected(self, request, queryset):
+        slots, bookings = free_slots(queryset)
+        self.message_user(request, f'Освобождено слотов: {slots}, удалено броней: {bookings}', messages.SUCCESS)
+
+    @admin.action(description='Закрыть выбранные свободные слоты', permissions=['change'])
+    def reserve_selected(self, request, queryset):
+        slots, _ = reserve_slots(queryset)
+        self.message_user(request, f'Закрыто слотов: {slots}', messages.SUCCESS)
+
+    @admin.action(description='Удалить выбранные слоты (вместе с бронями)', permissions=['delete'])
+    def delete_selected_slots(self, request, queryset):
+        slots, bookings = delete_slots(queryset)
+        self.message_user(request, f'Удалено слотов: {slots}, броней: {bookings}', messages.SUCCESS)
+
+
+@admin.register(Booking)
+class BookingAdmin(ScalableAdmin):
+    list_display = ('id', 'user', 'table', 'timeslot', 'created_at')
+    list_select_related = ('user', 'table__restaurant', 'timeslot__table__restaurant')
+    list_filter = (('created_at', admin.DateFieldListFilter),)
+    raw_id_fields = ('user', 'table', 'timeslot')
+    date_hierarchy = 'created_at'
+    ordering = ('-created_at',)
+    actions = ('cancel_selected',)
+
+    @admin.action(description='Отменить выбранные брони (слоты освобождаются)', permissions=['delete'])
+    def cancel_selected(self, request, queryset):
+        # id слотов читаются заранее: подзапрос по броням опустел бы после их удаления
+        slot_ids = list(queryset.order_by().values_list('timeslot_id', flat=True))
+        _, bookings = free_slots(TimeSlot.objects.filter(pk__in=slot_ids))
+        self.message_user(request, f'Отменено броней: {bookings}', messages.SUCCESS)
+
 
 admin.site.register(User)
 admin.site.register(Restaurant)
 admin.site.register(Table)
-admin.site.register(Booking)
-admin.site.register(TimeSlot)
+admin.site.register(RestaurantSchedule)
+admin.site.register(TimeSlotHistory)
+admin.site.register(Job)
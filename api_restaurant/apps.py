@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class ApiRestaurantConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api_restaurant'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from . import schema
+
+        # Схема, собранная manage.py build_schema, - в память до первого запроса
+        if schema.schema_settings()['PRECOMPUTED']:
+            schema.load()
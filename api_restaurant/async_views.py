@@ -0,0 +1,240 @@
+"""
+ASGI-нативные версии read-эндпоинтов поиска свободных мест.
+
+DRF-вьюсеты синхронные, под ASGI каждый запрос к ним уходит в поток через
+sync_to_async. Здесь обычные async-вьюхи Django с асинхронным ORM: ответы в том же
+формате строк, что и у сериализаторов (см. rows.py), пагинация курсорами по
+(поле сортировки, id), размер страницы ограничен как в pagination.KeysetPagination.
+
+Имеет смысл только под ASGI-сервером (uvicorn project.asgi:application);
+под WSGI Django выполняет async-вьюхи в отдельном event loop на каждый запрос.
+"""
+import base64
+import binascii
+import json
+import math
+import time
+from datetime import datetime
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_GET
+
+from .availability import day_bounds
+from .changefeed import changes_queryset, feed_settings, fetch_changes, get_broker, latest_change_id
+from .models import Restaurant, Table, TimeSlot
+from .pagination import KeysetPagination
+from .renderers import json_response
+from .rows import RESTAURANT_ROW, TABLE_ROW, TIMESLOT_ROW
+from .search import matching
+
+
+class BadRequest(Exception):
+    pass
+
+
+def _page_size(request):
+    try:
+        size = int(request.GET.get(KeysetPagination.page_size_query_param, KeysetPagination.page_size))
+    except ValueError:
+        size = KeysetPagination.page_size
+    return max(1, min(size, KeysetPagination.max_page_size))
+
+
+def _encode_cursor(value, pk):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([value, pk]).encode()).decode()
+
+
+def _int_param(request, name):
+    """Целый параметр запроса или None; нечисло - 400, а не ошибка ORM."""
+    raw = request.GET.get(name)
+    if not raw:
+        return None
+    try:
+        return int(raw)
+    except ValueError:
+        raise BadRequest(f"Параметр {name} должен быть целым числом.")
+
+
+def _decode_cursor(raw, is_datetime):
+    try:
+        value, pk = json.loads(base64.urlsafe_b64decode(raw.encode()))
+    except (ValueError, TypeError, binascii.Error):
+        raise BadRequest("Неверный курсор.")
+    # bool - подкласс int, но id им не бывает
+    if not isinstance(pk, int) or isinstance(pk, bool):
+        raise BadRequest("Неверный курсор.")
+    if is_datetime:
+        value = parse_datetime(value) if isinstance(value, str) else None
+        if value is None:
+            raise BadRequest("Неверный курсор.")
+    elif not isinstance(value, str):
+        raise BadRequest("Неверный курсор.")
+    return value, pk
+
+
+async def _keyset_page(request, queryset, field, row_spec, is_datetime=False):
+    limit = _page_size(request)
+    cursor = request.GET.get('cursor')
+    if cursor:
+        value, pk = _decode_cursor(cursor, is_datetime)
+        queryset = queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}))
+
+    fetched = [item async for item in row_spec.values(queryset.order_by(field, 'id'))[:limit + 1]]
+    next_url = None
+    if len(fetched) > limit:
+        fetched = fetched[:limit]
+        params = request.GET.copy()
+        params['cursor'] = _encode_cursor(fetched[-1][field], fetched[-1]['id'])
+        next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+    return json_response({'next': next_url, 'results': [row_spec.build(item) for item in fetched]})
+
+
+def _parse_date(raw):
+    try:
+        return timezone.datetime.strptime(raw, '%Y-%m-%d').date()
+    except ValueError:
+        raise BadRequest("Неверный формат даты. Нужно: YYYY-MM-DD.")
+
+
+def _bad_request_as_400(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        except BadRequest as exc:
+            return json_response({'detail': str(exc)}, status=400)
+    return wrapper
+
+
+@require_GET
+@_bad_request_as_400
+async def restaurant_list(request):
+    queryset = Restaurant.objects.all()
+    if request.GET.get('search', '').strip():
+        # Полнотекстовый индекс (search.py); порядок страниц - по названию, как и без поиска
+        matches = await sync_to_async(matching)('restaurant', request.GET['search'])
+        queryset = queryset.filter(pk__in=matches.subquery()) if matches else queryset.none()
+    return await _keyset_page(request, queryset, 'name', RESTAURANT_ROW)
+
+
+@require_GET
+@_bad_request_as_400
+async def tables_available(request):
+    """То же, что TableViewSet.available"""
+    queryset = Table.objects.all()
+    restaurant, capacity = _int_param(request, 'restaurant'), _int_param(request, 'capacity')
+    if restaurant is not None:
+        queryset = queryset.filter(restaurant_id=restaurant)
+    if capacity is not None:
+        queryset = queryset.filter(capacity__gte=capacity)
+    if request.GET.get('date'):
+        queryset = queryset.filter(availability__date=_parse_date(request.GET['date']))
+    return await _keyset_page(request, queryset, 'table_number', TABLE_ROW)
+
+
+@require_GET
+@_bad_request_as_400
+async def timeslots_available(request):
+    """То же, что TimeSlotViewSet.available"""
+    queryset = TimeSlot.objects.filter(status='free', start_time__gte=timezone.now())
+    restaurant, table = _int_param(request, 'restaurant'), _int_param(request, 'table')
+    if restaurant is not None:
+        queryset = queryset.filter(table__restaurant_id=restaurant)
+    if table is not None:
+        queryset = queryset.filter(table_id=table)
+    if request.GET.get('date'):
+        day_start, day_end = day_bounds(_parse_date(request.GET['date']))
+        queryset = queryset.filter(start_time__gte=day_start, start_time__lt=day_end)
+    return await _keyset_page(
+        request, queryset, 'start_time', TIMESLOT_ROW, is_datetime=True
+    )
+
+
+def _feed_queryset(request):
+    restaurant = request.GET.get('restaurant', '')
+    if not restaurant.isdigit():
+        raise BadRequest("Нужен параметр restaurant.")
+    date = _parse_date(request.GET['date']) if request.GET.get('date') else None
+    return changes_queryset(int(restaurant), date)
+
+
+def _parse_change_id(raw):
+    try:
+        return max(int(raw), 0)
+    except ValueError:
+        raise BadRequest("Неверный курсор.")
+
+
+@require_GET
+@_bad_request_as_400
+async def timeslot_changes(request):
+    """
+    Long-poll ленты изменений (changefeed.py). Без after - только текущий курсор.
+    С after - изменения новее него; если их нет, ответ ждёт до timeout секунд.
+    """
+    queryset = _feed_queryset(request)
+    if not request.GET.get('after'):
+        return json_response({'cursor': await latest_change_id(), 'changes': []})
+    after = _parse_change_id(request.GET['after'])
+    config = feed_settings()
+    try:
+        timeout = min(float(request.GET.get('timeout', config['LONG_POLL_TIMEOUT'])), config['LONG_POLL_TIMEOUT'])
+    except ValueError:
+        raise BadRequest("Неверный timeout.")
+    if math.isnan(timeout):
+        raise BadRequest("Неверный timeout.")
+
+    broker = get_broker()
+    deadline = time.monotonic() + timeout
+    while True:
+        # Последний id брокера - до чтения журнала: изменение между ними не потеряется
+        seen = await broker.latest()
+        changes = await fetch_changes(queryset, after)
+        remaining = deadline - time.monotonic()
+        if changes or remaining <= 0:
+            break
+        await broker.wait(seen, min(remaining, config['POLL_INTERVAL']))
+    return json_response({'cursor': changes[-1]['id'] if changes else after, 'changes': changes})
+
+
+async def _event_stream(queryset, after):
+    config = feed_settings()
+    broker = get_broker()
+    finish = time.monotonic() + config['STREAM_SECONDS']
+    heartbeat = time.monotonic() + config['HEARTBEAT']
+    # После STREAM_SECONDS поток закрывается, EventSource переподключится с Last-Event-ID
+    yield f'retry: 3000\nid: {after}\n\n'
+    while time.monotonic() < finish:
+        seen = await broker.latest()
+        changes = await fetch_changes(queryset, after)
+        for change in changes:
+            after = change['id']
+            yield f'id: {after}\nevent: slot\ndata: {json.dumps(change)}\n\n'
+        if changes:
+            heartbeat = time.monotonic() + config['HEARTBEAT']
+        elif time.monotonic() >= heartbeat:
+            # Комментарий SSE: держит соединение живым через прокси
+            yield ': ping\n\n'
+            heartbeat = time.monotonic() + config['HEARTBEAT']
+        if len(changes) < config['MAX_CHANGES']:
+            await broker.wait(seen, max(min(config['POLL_INTERVAL'], finish - time.monotonic()), 0))
+
+
+@require_GET
+@_bad_request_as_400
+async def timeslot_changes_stream(request):
+    """Лента изменений как Server-Sent Events; курсор - Last-Event-ID или after"""
+    queryset = _feed_queryset(request)
+    raw = request.headers.get('Last-Event-ID') or request.GET.get('after')
+    after = _parse_change_id(raw) if raw else await latest_change_id()
+    response = StreamingHttpResponse(_event_stream(queryset, after), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
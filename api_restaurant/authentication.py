@@ -0,0 +1,192 @@
+"""
+JWT-аутентификация без запроса пользователя на каждый запрос.
+
+Стандартный JWTAuthentication читает строку User из БД при каждом запросе.
+Здесь в токен при выдаче кладутся id, username и is_staff (ClaimsRefreshToken),
+и по ним строится лёгкий ClaimsUser без обращения к БД.
+
+Если клеймов нет (токен выдан до включения режима) или пользователь изменился
+после выдачи токена, берётся пользователь из кэша (AUTH_USER_CACHE_TIMEOUT секунд),
+а при промахе - из БД. При сохранении/удалении пользователя и смене его групп
+и прав (signals.py) в User.claims_valid_after пишется момент изменения t, а запись
+в кэше удаляется: токены с клеймами старше t дальше работают через кэш/БД, то есть
+с актуальными is_staff и is_active. Отметка хранится в БД, в кэше (алиас API_CACHE,
+caching.py) - только её копия на AUTH_USER_CACHE_TIMEOUT секунд вместе с is_active:
+после рестарта, вытеснения из кэша или на другом процессе она перечитывается одним
+запросом. Другие процессы с локальным кэшем видят изменение не позже чем через
+AUTH_USER_CACHE_TIMEOUT секунд. Обновление access-токена (ClaimsTokenRefreshSerializer)
+берёт клеймы из БД, а не копирует их из refresh-токена.
+
+API_AUTH_TRUST_CLAIMS = False отключает доверие клеймам (остаётся только кэш).
+"""
+import math
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import (
+    SimpleJWTScheme, TokenObtainPairSerializerExtension, TokenRefreshSerializerExtension,
+)
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .caching import get_cache
+
+CLAIMS_AT = 'claims_at'
+CLAIMS = ('username', 'is_staff', CLAIMS_AT)
+
+
+def _user_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def _changed_key(user_id):
+    return f'auth:changed:{user_id}'
+
+
+def _user_cache_timeout():
+    return getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60)
+
+
+def invalidate_user(user_id):
+    """Пользователь изменился: убрать из кэша и перестать доверять уже выданным клеймам."""
+    changed_at = time.time()
+    get_user_model().objects.filter(pk=user_id).update(
+        claims_valid_after=datetime.fromtimestamp(changed_at, timezone.utc),
+    )
+    cache = get_cache()
+    cache.delete(_user_key(user_id))
+    cache.delete(_changed_key(user_id))
+
+
+def claims_valid_after(user_id):
+    """
+    Момент (time.time()), раньше которого клеймы пользователя не действуют:
+    inf - пользователь неактивен или удалён, 0 - клеймы не отзывались.
+    """
+    cache = get_cache()
+    changed_at = cache.get(_changed_key(user_id))
+    if changed_at is None:
+        row = get_user_model().objects.filter(pk=user_id).values_list('claims_valid_after', 'is_active').first()
+        if row is None or (api_settings.CHECK_USER_IS_ACTIVE and not row[1]):
+            changed_at = math.inf
+        else:
+            changed_at = row[0].timestamp() if row[0] else 0
+        cache.set(_changed_key(user_id), changed_at, timeout=_user_cache_timeout())
+    return changed_at
+
+
+def cached_user(user_id):
+    cache = get_cache()
+    user = cache.get(_user_key(user_id))
+    if user is None:
+        User = get_user_model()
+        try:
+            user = User.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+        except User.DoesNotExist:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        cache.set(_user_key(user_id), user, timeout=_user_cache_timeout())
+    return user
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh-токен с клеймами пользователя; access-токены копируют их из него."""
+
+    @classmethod
+    def for_user(cls, user):
+        return cls.set_claims(super().for_user(user), user)
+
+    @staticmethod
+    def set_claims(token, user):
+        token['username'] = user.get_username()
+        token['is_staff'] = user.is_staff
+        token[CLAIMS_AT] = time.time()
+        return token
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """Новый access-токен с клеймами из БД: refresh-токен живёт дольше, и его клеймы могли устареть."""
+    token_class = ClaimsRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = get_user_model().objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh.payload.get(api_settings.USER_ID_CLAIM)}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        self.token_class.set_claims(refresh, user)
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                try:
+                    refresh.blacklist()
+                except AttributeError:
+                    # Приложение token_blacklist не установлено
+                    pass
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+        return data
+
+
+class ClaimsUser(TokenUser):
+    """Пользователь из клеймов токена. id - того же типа, что и pk модели, чтобы подходил для фильтров и FK."""
+
+    @cached_property
+    def id(self):
+        return get_user_model()._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        if self._claims_trusted(validated_token, user_id):
+            return ClaimsUser(validated_token)
+
+        user = cached_user(user_id)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
+
+    def _claims_trusted(self, validated_token, user_id):
+        if not getattr(settings, 'API_AUTH_TRUST_CLAIMS', True):
+            return False
+        if any(claim not in validated_token for claim in CLAIMS):
+            return False
+        return claims_valid_after(user_id) < validated_token[CLAIMS_AT]
+
+
+# Описание в OpenAPI - как у стандартных классов simplejwt
+class ClaimsJWTScheme(SimpleJWTScheme):
+    target_class = ClaimsJWTAuthentication
+
+
+class ClaimsTokenObtainPairSerializerExtension(TokenObtainPairSerializerExtension):
+    target_class = ClaimsTokenObtainPairSerializer
+
+
+class ClaimsTokenRefreshSerializerExtension(TokenRefreshSerializerExtension):
+    target_class = ClaimsTokenRefreshSerializer
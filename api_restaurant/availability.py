@@ -0,0 +1,124 @@
+"""
+Проверка пересечений слотов и сводка свободных мест.
+
+Пересечение с бронью перед записью (TimeSlot.clean, TimeSlotSerializer.validate)
+проверяется в БД (reserved_overlap_exists) по составному индексу
+(table, status, start_time, end_time): ответ всегда актуален, в том числе для
+слотов, созданных другими процессами. TableIntervals - занятые интервалы одного
+столика в памяти, для пакетных проверок внутри одного запроса (booking.py, schedule.py).
+
+Там же - пересчёт материализованной сводки TableAvailability
+(столик, день) -> число свободных слотов и самый ранний свободный.
+"""
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.db.models import Count, Min
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def reserved_overlap_exists(table_id, start, end, exclude_pk=None):
+    """Пересекается ли [start, end) с забронированным слотом столика - по БД, для записи."""
+    from .models import TimeSlot
+
+    query = TimeSlot.objects.filter(table_id=table_id, start_time__lt=end, end_time__gt=start, status='reserved')
+    if exclude_pk is not None:
+        query = query.exclude(pk=exclude_pk)
+    return query.exists()
+
+
+class TableIntervals:
+    """Занятые интервалы одного столика, отсортированные по началу."""
+
+    def __init__(self, intervals=()):
+        # (start, end, pk)
+        self._items = sorted(intervals)
+        self._max_end = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, pk, start, end):
+        self.remove(pk)
+        insort(self._items, (start, end, pk))
+        self._max_end = None
+
+    def remove(self, pk):
+        for i, item in enumerate(self._items):
+            if item[2] == pk:
+                del self._items[i]
+                self._max_end = None
+                return
+
+    def _prefix_max_end(self):
+        # max_end[i] - максимальный end среди первых i+1 интервалов
+        if self._max_end is None:
+            result = []
+            current = None
+            for _, end, _ in self._items:
+                current = end if current is None or end > current else current
+                result.append(current)
+            self._max_end = result
+        return self._max_end
+
+    def overlaps(self, start, end, exclude_pk=None):
+        """Есть ли интервал, пересекающийся с [start, end)."""
+        # Кандидаты - интервалы с start < end запроса
+        count = bisect_left(self._items, (end,))
+        if not count:
+            return False
+        max_end = self._prefix_max_end()
+        if max_end[count - 1] <= start:
+            return False
+        for i in range(count - 1, -1, -1):
+            if max_end[i] <= start:
+                break
+            item_start, item_end, pk = self._items[i]
+            if item_end > start and pk != exclude_pk:
+                return True
+        return False
+
+
+def day_bounds(date_from, date_to=None):
+    """Границы [начало date_from, начало следующего за date_to дня) в текущей таймзоне."""
+    date_to = date_to or date_from
+    start = timezone.make_aware(datetime.combine(date_from, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    return start, end
+
+
+def refresh_table_days(table_ids, date_from, date_to=None):
+    """
+    Пересчитать сводку TableAvailability для столиков за дни [date_from, date_to].
+    Три запроса независимо от объёма: агрегат по слотам, удаление, bulk_create.
+    """
+    from .models import TableAvailability, TimeSlot
+
+    date_to = date_to or date_from
+    start, end = day_bounds(date_from, date_to)
+    rows = (
+        TimeSlot.objects
+        .filter(table_id__in=table_ids, status='free', start_time__gte=start, start_time__lt=end)
+        .annotate(day=TruncDate('start_time'))
+        .values('table_id', 'table__restaurant_id', 'day')
+        .annotate(free=Count('id'), earliest=Min('start_time'))
+        .order_by()
+    )
+    summary = [
+        TableAvailability(
+            restaurant_id=row['table__restaurant_id'],
+            table_id=row['table_id'],
+            date=row['day'],
+            free_slots=row['free'],
+            earliest_free_start=row['earliest'],
+        )
+        for row in rows
+    ]
+    with transaction.atomic(savepoint=False):
+        TableAvailability.objects.filter(
+            table_id__in=table_ids, date__gte=date_from, date__lte=date_to
+        ).delete()
+        TableAvailability.objects.bulk_create(summary, batch_size=1000)
+    return len(summary)
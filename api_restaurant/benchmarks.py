@@ -0,0 +1,515 @@
+"""
+Сценарии бенчмарков. Запуск: python manage.py bench [имя ...]
+
+Команда создаёт временную тестовую БД, поэтому рабочая db.sqlite3 не трогается.
+Каждый сценарий - функция, принимающая out (callable для вывода строк).
+"""
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def decorator(func):
+        BENCHMARKS[name] = func
+        return func
+    return decorator
+
+
+def timed(func, repeat=200):
+    """Среднее время одного вызова func в микросекундах."""
+    func()  # прогрев
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1e6
+
+
+def make_restaurant(tables=1, name='Bench'):
+    from .models import Restaurant, Table
+
+    restaurant = Restaurant.objects.create(name=name, address='-')
+    Table.objects.bulk_create([
+        Table(restaurant=restaurant, table_number=str(i + 1), capacity=2 + i % 6)
+        for i in range(tables)
+    ])
+    return restaurant
+
+
+def make_slots(table, count, start=None, hours=1, reserved_every=2):
+    """count часовых слотов подряд, каждый reserved_every-й забронирован."""
+    from .models import TimeSlot
+
+    start = start or timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    TimeSlot.objects.bulk_create([
+        TimeSlot(
+            table=table,
+            start_time=start + timedelta(hours=i * hours),
+            end_time=start + timedelta(hours=(i + 1) * hours),
+            status='reserved' if reserved_every and i % reserved_every == 0 else 'free',
+        )
+        for i in range(count)
+    ], batch_size=1000)
+    return start
+
+
+@benchmark('overlap')
+def bench_overlap(out):
+    """Проверка пересечения: запрос в БД против интервалов в памяти (TableIntervals)."""
+    from .availability import TableIntervals
+    from .models import Table, TimeSlot
+
+    restaurant = make_restaurant(tables=1)
+    table = Table.objects.get(restaurant=restaurant)
+    out(f"{'slots':>8} {'db, us':>10} {'index, us':>10}")
+    base = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    total = 0
+    for count in (100, 1000, 10000, 50000):
+        make_slots(table, count - total, start=base + timedelta(hours=total))
+        total = count
+        # Пробный интервал посередине расписания
+        probe_start = base + timedelta(hours=count // 2, minutes=30)
+        probe_end = probe_start + timedelta(hours=1)
+
+        def db_check():
+            TimeSlot.objects.filter(
+                table=table, start_time__lt=probe_end, end_time__gt=probe_start, status='reserved'
+            ).exists()
+
+        intervals = TableIntervals(
+            TimeSlot.objects.filter(table=table, status='reserved').values_list('start_time', 'end_time', 'pk')
+        )
+
+        def index_check():
+            intervals.overlaps(probe_start, probe_end)
+
+        out(f'{count:>8} {timed(db_check):>10.1f} {timed(index_check, 2000):>10.1f}')
+
+
+@benchmark('booking')
+def bench_booking(out, threads=8, slots=500):
+    """Параллельное бронирование: пропускная способность и отсутствие двойных броней."""
+    import threading
+
+    from django.core.exceptions import ValidationError
+    from django.db import OperationalError, connection
+
+    from .booking import book_timeslot
+    from .models import Booking, Table, TimeSlot, User
+
+    restaurant = make_restaurant(tables=1)
+    table = Table.objects.get(restaurant=restaurant)
+    make_slots(table, slots, reserved_every=0)
+    slot_ids = list(TimeSlot.objects.filter(table=table).values_list('pk', flat=True))
+    users = [User.objects.create(username=f'bench{i}') for i in range(threads)]
+
+    counters = {'booked': 0, 'conflicts': 0, 'errors': 0}
+    lock = threading.Lock()
+    barrier = threading.Barrier(threads)
+
+    def worker(user):
+        barrier.wait()
+        booked = conflicts = errors = 0
+        try:
+            # Все потоки идут по одним и тем же слотам - максимум конкуренции
+            for slot_id in slot_ids:
+                while True:
+                    try:
+                        book_timeslot(user, slot_id)
+                        booked += 1
+                    except ValidationError:
+                        conflicts += 1
+                    except OperationalError:
+                        # database is locked - повторяем, как повторил бы клиент
+                        errors += 1
+                        time.sleep(0.001)
+                        continue
+                    break
+        finally:
+            connection.close()
+        with lock:
+            counters['booked'] += booked
+            counters['conflicts'] += conflicts
+            counters['errors'] += errors
+
+    workers = [threading.Thread(target=worker, args=(user,)) for user in users]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    double = Booking.objects.count() - Booking.objects.values('timeslot').distinct().count()
+    out(f"threads={threads} slots={slots} booked={counters['booked']} conflicts={counters['conflicts']} "
+        f"lock_retries={counters['errors']} double_bookings={double}")
+    out(f"{counters['booked'] / elapsed:.0f} bookings/s, {threads * slots / elapsed:.0f} attempts/s")
+
+
+@benchmark('tables_available')
+def bench_tables_available(out, tables=200, days=60, slots_per_day=12):
+    """TableViewSet.available по дате: прежний distinct-подзапрос против сводки TableAvailability."""
+    from .availability import day_bounds, refresh_table_days
+    from .models import Table, TimeSlot
+
+    restaurant = make_restaurant(tables=tables)
+    table_ids = list(Table.objects.filter(restaurant=restaurant).values_list('pk', flat=True))
+    start = timezone.now().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    slots = []
+    for table_id in table_ids:
+        for day in range(days):
+            for i in range(slots_per_day):
+                slot_start = start + timedelta(days=day, hours=i)
+                # Часть столиков к концу периода полностью занята
+                status = 'reserved' if (table_id + day) % 3 == 0 or i % 2 else 'free'
+                slots.append(TimeSlot(table_id=table_id, start_time=slot_start,
+                                      end_time=slot_start + timedelta(hours=1), status=status))
+    TimeSlot.objects.bulk_create(slots, batch_size=2000)
+    refresh_table_days(table_ids, timezone.localdate(start), timezone.localdate(start) + timedelta(days=days))
+    target = timezone.localdate(start) + timedelta(days=days // 2)
+
+    def subquery():
+        day_start, day_end = day_bounds(target)
+        with_free = Table.objects.filter(
+            time_slots__status='free',
+            time_slots__start_time__gte=day_start,
+            time_slots__start_time__lt=day_end
+        ).distinct()
+        return set(Table.objects.filter(restaurant=restaurant, capacity__gte=4, id__in=with_free).values_list('pk'))
+
+    def summary():
+        return set(Table.objects.filter(restaurant=restaurant, capacity__gte=4, availability__date=target).values_list('pk'))
+
+    out(f'tables={tables} days={days} slots={len(slots)} same_result={subquery() == summary()}')
+    out(f'subquery: {timed(subquery, 50):.0f} us, summary: {timed(summary, 50):.0f} us')
+
+
+@benchmark('export')
+def bench_export(out, slots=100000):
+    """Потоковая выгрузка слотов: время до первого чанка, общее время и пик памяти."""
+    import tracemalloc
+
+    from rest_framework.test import APIClient
+
+    from .models import Table, User
+
+    restaurant = make_restaurant(tables=10)
+    per_table = slots // 10
+    for table in Table.objects.filter(restaurant=restaurant):
+        make_slots(table, per_table)
+    client = APIClient()
+    client.force_authenticate(User.objects.create(username='bench-staff', is_staff=True))
+
+    def consume(fmt):
+        started = time.perf_counter()
+        response = client.get(f'/api/timeslots/export/?fmt={fmt}')
+        chunks = iter(response.streaming_content)
+        size = len(next(chunks))
+        first_byte = time.perf_counter() - started
+        for chunk in chunks:
+            size += len(chunk)
+        return size, first_byte, time.perf_counter() - started
+
+    for fmt in ('ndjson', 'csv'):
+        size, first_byte, total = consume(fmt)
+        # Память - отдельным прогоном: tracemalloc сильно замедляет выполнение
+        tracemalloc.start()
+        consume(fmt)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        out(f'{fmt}: {slots} rows, {size / 1e6:.1f} MB, first byte {first_byte * 1000:.0f} ms, '
+            f'total {total:.1f} s, peak memory {peak / 1e6:.1f} MB')
+
+
+@benchmark('serialize')
+def bench_serialize(out):
+    """Сериализация списков: ModelSerializer против строк из .values() (rows.py), строк в секунду."""
+    from rest_framework.renderers import JSONRenderer
+
+    from .models import Booking, Table, TimeSlot, User
+    from .rows import BOOKING_ROW, TIMESLOT_ROW
+    from .serializers import BookingSerializer, TimeSlotSerializer
+
+    restaurant = make_restaurant(tables=10)
+    tables = list(Table.objects.filter(restaurant=restaurant))
+    user = User.objects.create(username='bench-serialize')
+    renderer = JSONRenderer()
+
+    slots_qs = TimeSlot.objects.select_related('table', 'table__restaurant').order_by('start_time')
+    bookings_qs = Booking.objects.select_related('user', 'table', 'table__restaurant', 'timeslot').order_by('-created_at')
+
+    out(f"{'rows':>7} {'kind':<9} {'serializer rows/s':>18} {'values rows/s':>14} {'speedup':>8}")
+    total = 0
+    for count in (1000, 10000, 100000):
+        per_table = (count - total) // len(tables)
+        for table in tables:
+            make_slots(table, per_table, start=timezone.now() + timedelta(days=1, hours=total // len(tables)),
+                       reserved_every=0)
+        # Для половины слотов создаём брони без сигналов - здесь важна только выборка
+        new_slots = TimeSlot.objects.filter(bookings__isnull=True).values_list('pk', 'table_id')[:(count - total) // 2]
+        Booking.objects.bulk_create([Booking(user=user, table_id=table_id, timeslot_id=pk) for pk, table_id in new_slots],
+                                    batch_size=2000)
+        total = count
+
+        for kind, queryset, serializer_class, spec in (
+            ('timeslots', slots_qs, TimeSlotSerializer, TIMESLOT_ROW),
+            ('bookings', bookings_qs, BookingSerializer, BOOKING_ROW),
+        ):
+            rows = queryset.count()
+            started = time.perf_counter()
+            renderer.render(serializer_class(queryset.all(), many=True).data)
+            slow = time.perf_counter() - started
+            started = time.perf_counter()
+            renderer.render(spec.rows(queryset.all()))
+            fast = time.perf_counter() - started
+            out(f'{rows:>7} {kind:<9} {rows / slow:>18.0f} {rows / fast:>14.0f} {slow / fast:>7.1f}x')
+
+
+@benchmark('sqlite_modes')
+def bench_sqlite_modes(out):
+    """
+    Сценарий booking на файловой SQLite: настройки по умолчанию против
+    WAL + synchronous=NORMAL + BEGIN IMMEDIATE (DB_SQLITE_TUNED, project/database.py).
+    Каждый режим - отдельный процесс, потому что настройки соединения читаются при старте.
+    """
+    import os
+    import subprocess
+    import sys
+    import tempfile
+
+    from django.conf import settings
+
+    for tuned in ('0', '1'):
+        with tempfile.TemporaryDirectory() as directory:
+            env = dict(os.environ, DB_ENGINE='sqlite', DB_SQLITE_TUNED=tuned)
+            result = subprocess.run(
+                [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'bench', 'booking',
+                 '--database-file', os.path.join(directory, 'bench.sqlite3')],
+                env=env, capture_output=True, text=True,
+            )
+        out(f"DB_SQLITE_TUNED={tuned}:")
+        for line in (result.stdout + result.stderr).splitlines():
+            if not line.startswith('=='):
+                out(f'  {line}')
+
+
+@benchmark('passwords')
+def bench_passwords(out, duration=3.0):
+    """
+    Регистрации и входы в секунду на одно ядро (один поток) для каждого алгоритма
+    хеширования с параметрами из окружения (project/passwords.py).
+    """
+    from itertools import count
+
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+
+    from project.passwords import HASHERS, password_hashers
+
+    client = APIClient()
+    numbers = count()
+
+    def rate(func):
+        func()  # прогрев
+        done = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < duration:
+            func()
+            done += 1
+        return done / (time.perf_counter() - started)
+
+    out(f"{'hasher':<8} {'register/s':>11} {'login/s':>9}")
+    for algorithm in HASHERS:
+        try:
+            hashers = password_hashers({'PASSWORD_HASHER': algorithm})
+        except ValueError as exc:
+            out(f'{algorithm:<8} пропущен: {exc}')
+            continue
+        with override_settings(PASSWORD_HASHERS=hashers):
+            def register():
+                response = client.post('/api/register/', {'username': f'bench{next(numbers)}', 'password': 'bench-pw-1'})
+                assert response.status_code == 201, response.status_code
+
+            username = f'bench{next(numbers)}'
+            client.post('/api/register/', {'username': username, 'password': 'bench-pw-1'})
+
+            def login():
+                response = client.post('/api/token/', {'username': username, 'password': 'bench-pw-1'})
+                assert response.status_code == 200, response.status_code
+
+            out(f'{algorithm:<8} {rate(register):>11.1f} {rate(login):>9.1f}')
+
+
+@benchmark('grid')
+def bench_grid(out, tables=40, repeat=20):
+    """День ресторана для виджета: постраничный список свободных слотов против ?layout=grid."""
+    from django.test import override_settings
+    from rest_framework.test import APIClient
+
+    from .models import Table
+
+    restaurant = make_restaurant(tables=tables)
+    start = timezone.now().replace(hour=10, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    for table in Table.objects.filter(restaurant=restaurant):
+        make_slots(table, 13, start=start, reserved_every=3)
+    date = timezone.localdate(start)
+    client = APIClient()
+
+    def slot_list():
+        size = 0
+        url = f'/api/timeslots/available/?restaurant={restaurant.pk}&date={date}&page_size=100'
+        while url:
+            response = client.get(url)
+            size += len(response.content)
+            url = response.data['next']
+        return size
+
+    def grid():
+        response = client.get(f'/api/timeslots/available/?layout=grid&restaurant={restaurant.pk}&date={date}')
+        return len(response.content)
+
+    # Кэш ответов выключен - сравниваем саму выборку и сериализацию
+    with override_settings(API_CACHE={'ENABLED': False}):
+        out(f"tables={tables} slots={tables * 13}")
+        for name, func in (('list', slot_list), ('grid', grid)):
+            size = func()
+            out(f'{name}: {size / 1024:.1f} KB, {timed(func, repeat) / 1000:.1f} ms')
+
+
+@benchmark('search')
+def bench_search(out, sizes=(10000, 100000), repeat=20):
+    """Поиск ресторанов: LIKE '%слово%' (SearchFilter) против полнотекстового индекса."""
+    import random
+
+    from django.db.models import Q
+
+    from .models import Restaurant
+    from .search import rebuild, search
+
+    words = ['Pizza', 'Sushi', 'Grill', 'Bistro', 'Cafe', 'Trattoria', 'Diner', 'Noodle', 'Taverna', 'Bar']
+    streets = ['Main', 'Ocean', 'Park', 'Lake', 'River', 'Hill', 'Garden', 'Station']
+    rng = random.Random(1)
+    created = 0
+    out(f"{'restaurants':>11} {'query':<16} {'like, ms':>9} {'fts, ms':>8}")
+    for size in sizes:
+        Restaurant.objects.bulk_create([
+            Restaurant(
+                name=f'{rng.choice(words)} {rng.choice(words)} {number}',
+                address=f'{rng.choice(streets)} street {number % 500}',
+            )
+            for number in range(created, size)
+        ], batch_size=5000)
+        created = size
+        rebuild()
+        for query in ('trattoria 777', 'tratoria 777', 'ocean'):
+            def like():
+                queryset = Restaurant.objects.all()
+                for term in query.split():
+                    queryset = queryset.filter(Q(name__icontains=term) | Q(address__icontains=term))
+                return list(queryset.order_by('name')[:10])
+
+            def fts():
+                return list(Restaurant.objects.filter(pk__in=search('restaurant', query)[:10]))
+
+            out(f'{size:>11} {query:<16} {timed(like, repeat) / 1000:>9.1f} {timed(fts, repeat) / 1000:>8.1f}')
+
+
+@benchmark('import')
+def bench_import(out, slots=1000000, tables=100, sample=2000):
+    """
+    Импорт слотов: import_restaurants (NDJSON, пачки bulk_create) против сохранения
+    по одному, как в loaddata (TimeSlot.save() с full_clean и сигналами) - на sample слотах.
+    """
+    import json
+    import os
+    import tempfile
+
+    from .bulkdata import import_records, read_records
+    from .models import Table, TimeSlot
+
+    start = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    per_table = slots // tables
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'slots.ndjson')
+        with open(path, 'w') as file:
+            file.write(json.dumps({'model': 'restaurant', 'id': 1, 'name': 'Import', 'address': '-'}) + '\n')
+            for table in range(tables):
+                file.write(json.dumps({
+                    'model': 'table', 'id': table, 'restaurant': 1, 'table_number': str(table), 'capacity': 4,
+                }) + '\n')
+                for i in range(per_table):
+                    slot_start = start + timedelta(minutes=30 * i)
+                    file.write(json.dumps({
+                        'model': 'timeslot', 'table': table, 'start_time': slot_start.isoformat(),
+                        'end_time': (slot_start + timedelta(minutes=30)).isoformat(), 'status': 'free',
+                    }) + '\n')
+        size = os.path.getsize(path)
+
+        started = time.perf_counter()
+        with open(path) as file:
+            importer = import_records(read_records(file, 'ndjson'))
+        bulk = time.perf_counter() - started
+        out(f"import_restaurants: {importer.counts['timeslot']} slots, {size / 1e6:.0f} MB, "
+            f"{bulk:.1f} s, {importer.counts['timeslot'] / bulk:.0f} slots/s, errors {importer.error_count}")
+
+    table = Table.objects.filter(restaurant__name='Import').first()
+    sample_start = start - timedelta(days=365)
+    started = time.perf_counter()
+    for i in range(sample):
+        slot_start = sample_start + timedelta(minutes=30 * i)
+        TimeSlot.objects.create(table=table, start_time=slot_start, end_time=slot_start + timedelta(minutes=30))
+    per_object = (time.perf_counter() - started) / sample
+    out(f'save() per slot: {sample} slots, {1 / per_object:.0f} slots/s, '
+        f'{slots} slots would take {slots * per_object / 60:.0f} min')
+
+
+@benchmark('rendering')
+def bench_rendering(out, tables=50, repeat=50):
+    """
+    Ответы /api/timeslots/available/: время рендеринга JSONRenderer (stdlib) и FastJSONRenderer
+    (orjson), размер без сжатия, после gzip и brotli (если установлен) и время сжатия.
+    """
+    import gzip
+
+    from rest_framework.renderers import JSONRenderer
+    from rest_framework.test import APIClient
+
+    from .middleware import brotli, compression_settings
+    from .models import Table, User
+    from .renderers import FastJSONRenderer, orjson
+
+    restaurant = make_restaurant(tables=tables)
+    start = None
+    for table in Table.objects.filter(restaurant=restaurant):
+        start = make_slots(table, 24, reserved_every=3)
+    day = timezone.localdate(start)
+    client = APIClient()
+    client.force_authenticate(User.objects.create(username='bench-rendering'))
+    config = compression_settings()
+    base = f'/api/timeslots/available/?restaurant={restaurant.pk}&date={day}'
+    cases = (
+        ('page of 10 (default)', base),
+        ('page of 100', base + '&page_size=100'),
+        (f'grid, {tables} tables', base + '&layout=grid'),
+    )
+
+    out(f'orjson: {"yes" if orjson else "no"}, brotli: {"yes" if brotli else "no"}')
+    out(f"{'response':<22} {'stdlib, ms':>10} {'fast, ms':>9} {'raw, KB':>8} "
+        f"{'gzip, KB':>9} {'gzip, ms':>9} {'br, KB':>7} {'br, ms':>7}")
+    for name, url in cases:
+        data = client.get(url).data
+        content = FastJSONRenderer().render(data)
+        stdlib = timed(lambda: JSONRenderer().render(data), repeat) / 1000
+        fast = timed(lambda: FastJSONRenderer().render(data), repeat) / 1000
+        gzip_size = len(gzip.compress(content, compresslevel=config['GZIP_LEVEL'], mtime=0))
+        gzip_ms = timed(lambda: gzip.compress(content, compresslevel=config['GZIP_LEVEL'], mtime=0), repeat) / 1000
+        if brotli is not None:
+            br_size = f"{len(brotli.compress(content, quality=config['BROTLI_QUALITY'])) / 1024:>7.1f}"
+            br_ms = f"{timed(lambda: brotli.compress(content, quality=config['BROTLI_QUALITY']), repeat) / 1000:>7.2f}"
+        else:
+            br_size = br_ms = f"{'-':>7}"
+        out(f'{name:<22} {stdlib:>10.3f} {fast:>9.3f} {len(content) / 1024:>8.1f} '
+            f'{gzip_size / 1024:>9.1f} {gzip_ms:>9.3f} {br_size} {br_ms}')
@@ -0,0 +1,93 @@
+"""
+Путь бронирования слота.
+
+Всё в одной транзакции и за фиксированное число запросов:
+  1. SELECT ... FOR UPDATE - блокируем строку слота (на SQLite блокировки строк нет,
+     там защищает шаг 2);
+  2. UPDATE ... WHERE status='free' - занимаем слот, только если он всё ещё свободен;
+  3. INSERT брони.
+Два параллельных запроса на один слот не могут оба пройти шаг 2, поэтому
+двойного бронирования не бывает, а проигравший получает ValidationError,
+а не IntegrityError на уникальном индексе.
+
+book_timeslots - то же для нескольких слотов сразу (все или ничего), и число
+запросов не зависит от числа слотов: блокировка всех слотов, пересечения
+с бронями пользователя, один UPDATE и bulk_create броней.
+"""
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .availability import TableIntervals
+from .caching import bump_version_on_commit
+from .models import Booking, TimeSlot
+from .signals import timeslots_bulk_changed
+
+
+def book_timeslot(user, timeslot_id):
+    with transaction.atomic():
+        try:
+            slot = TimeSlot.objects.select_for_update().get(pk=timeslot_id)
+        except TimeSlot.DoesNotExist:
+            raise ValidationError("Слот не найден")
+        if slot.status != 'free':
+            raise ValidationError("Это время уже забронировано")
+
+        # user - модель или ClaimsUser из токена (authentication.py)
+        booking = Booking(user_id=user.pk, table_id=slot.table_id, timeslot=slot)
+        booking.save()
+    return booking
+
+
+def book_timeslots(user, timeslot_ids):
+    """
+    Забронировать слоты одной транзакцией. Слоты разных столиков на одно время
+    допустимы (бронь на компанию), пересечение с уже имеющимися бронями
+    пользователя - нет. Возвращает созданные брони.
+    """
+    timeslot_ids = list(dict.fromkeys(timeslot_ids))
+    with transaction.atomic():
+        # Блокируем в порядке pk, чтобы встречные пакеты не ждали друг друга по кругу
+        slots = list(
+            TimeSlot.objects.select_for_update().filter(pk__in=timeslot_ids).order_by('pk')
+            .only('pk', 'table_id', 'start_time', 'end_time', 'status')
+        )
+        missing = set(timeslot_ids) - {slot.pk for slot in slots}
+        if missing:
+            raise ValidationError(f"Слоты не найдены: {', '.join(map(str, sorted(missing)))}")
+        busy = [slot.pk for slot in slots if slot.status != 'free']
+        if busy:
+            raise ValidationError(f"Уже забронированы слоты: {', '.join(map(str, busy))}")
+
+        # Брони пользователя в охватывающем интервале - одним запросом, пересечения - в памяти
+        first_start = min(slot.start_time for slot in slots)
+        last_end = max(slot.end_time for slot in slots)
+        own = TableIntervals(
+            Booking.objects.filter(
+                user_id=user.pk, timeslot__start_time__lt=last_end, timeslot__end_time__gt=first_start,
+            ).values_list('timeslot__start_time', 'timeslot__end_time', 'timeslot_id')
+        )
+        overlapping = [slot.pk for slot in slots if own.overlaps(slot.start_time, slot.end_time)]
+        if overlapping:
+            raise ValidationError(
+                f"У вас уже есть бронирование на время слотов: {', '.join(map(str, overlapping))}"
+            )
+
+        updated = TimeSlot.objects.filter(pk__in=timeslot_ids, status='free').update(status='reserved')
+        if updated != len(slots):
+            raise ValidationError("Часть слотов уже забронирована")
+        for slot in slots:
+            slot.status = 'reserved'
+        bookings = Booking.objects.bulk_create([
+            Booking(user_id=user.pk, table_id=slot.table_id, timeslot_id=slot.pk) for slot in slots
+        ])
+
+        # update()/bulk_create() сигналов не шлют: сводка, лента и кэш - одним пакетом
+        timeslots_bulk_changed.send(
+            sender=TimeSlot, table_ids=sorted({slot.table_id for slot in slots}),
+            date_from=timezone.localdate(first_start),
+            date_to=max(timezone.localdate(slot.start_time) for slot in slots),
+            timeslots=slots,
+        )
+        bump_version_on_commit('booking')
+    return bookings
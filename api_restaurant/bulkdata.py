@@ -0,0 +1,355 @@
+"""
+Потоковые импорт и выгрузка ресторанов, столиков, слотов и броней
+(manage.py import_restaurants / export_restaurants).
+
+loaddata разбирает фикстуру целиком в память и сохраняет объекты по одному -
+у каждого слота TimeSlot.save() с full_clean() и сигналами. Здесь файл читается
+построчно (NDJSON или CSV), пересечения слотов проверяются в памяти по столику,
+запись пачками по batch_size записей (bulk_create, слоты - executemany), каждая пачка
+в своей транзакции.
+
+Запись на строку, тип - поле model; родитель идёт раньше детей (выгрузка так и пишет):
+  restaurant  id, name, address
+  table       id, restaurant, table_number, capacity
+  timeslot    table, start_time, end_time, status
+  booking     user (username), table, start_time (начало слота)
+id ресторанов и столиков - ссылки внутри файла: импорт всегда создаёт новые объекты.
+Слот брони ищется по столику и началу. Пользователи не переносятся (пароли) и
+должны уже существовать; created_at брони - время импорта.
+Времена - ISO 8601, без смещения - в TIME_ZONE проекта.
+В CSV все типы в одной таблице: колонки - объединение полей, лишние пусты.
+
+Неверные записи (пересечение слотов столика, неизвестный родитель, ...) пропускаются
+с ошибкой по номеру строки, остальные импортируются. После каждой пачки рассылается
+то же, что при обычной записи: timeslots_bulk_changed (сводка, лента
+изменений), поисковые документы, версии кэша.
+"""
+import csv
+import json
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from .caching import bump_version
+from .export import EXPORT_CHUNK_SIZE
+from .models import Booking, Restaurant, Table, TimeSlot, User
+from .rows import iso_datetime
+from .search import index_created
+from .signals import timeslots_bulk_changed
+
+BATCH_SIZE = 5000
+MAX_ERRORS = 100
+
+FIELDS = {
+    'restaurant': ('id', 'name', 'address'),
+    'table': ('id', 'restaurant', 'table_number', 'capacity'),
+    'timeslot': ('table', 'start_time', 'end_time', 'status'),
+    'booking': ('user', 'table', 'start_time'),
+}
+CSV_HEADER = ['model'] + list(dict.fromkeys(field for fields in FIELDS.values() for field in fields))
+
+
+class RecordError(ValueError):
+    pass
+
+
+# --- Выгрузка ---
+
+def export_records(restaurant_ids=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Записи всех (или только restaurant_ids) ресторанов в порядке родитель -> дети."""
+    restaurants = Restaurant.objects.order_by('pk')
+    tables = Table.objects.order_by('pk')
+    slots = TimeSlot.objects.order_by('pk')
+    bookings = Booking.objects.order_by('pk')
+    if restaurant_ids is not None:
+        restaurants = restaurants.filter(pk__in=restaurant_ids)
+        tables = tables.filter(restaurant_id__in=restaurant_ids)
+        slots = slots.filter(table__restaurant_id__in=restaurant_ids)
+        bookings = bookings.filter(table__restaurant_id__in=restaurant_ids)
+
+    for pk, name, address in restaurants.values_list('pk', 'name', 'address').iterator(chunk_size):
+        yield {'model': 'restaurant', 'id': pk, 'name': name, 'address': address}
+    for pk, restaurant_id, number, capacity in tables.values_list(
+        'pk', 'restaurant_id', 'table_number', 'capacity'
+    ).iterator(chunk_size):
+        yield {'model': 'table', 'id': pk, 'restaurant': restaurant_id, 'table_number': number, 'capacity': capacity}
+    for table_id, start, end, status in slots.values_list(
+        'table_id', 'start_time', 'end_time', 'status'
+    ).iterator(chunk_size):
+        yield {
+            'model': 'timeslot', 'table': table_id,
+            'start_time': iso_datetime(start), 'end_time': iso_datetime(end), 'status': status,
+        }
+    for username, table_id, start in bookings.values_list(
+        'user__username', 'table_id', 'timeslot__start_time'
+    ).iterator(chunk_size):
+        yield {'model': 'booking', 'user': username, 'table': table_id, 'start_time': iso_datetime(start)}
+
+
+def write_records(records, file, fmt, progress=None, progress_every=100000):
+    """Записать записи в file построчно. Возвращает их число."""
+    if fmt == 'csv':
+        writer = csv.DictWriter(file, CSV_HEADER, restval='')
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        def write(record):
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
+    count = 0
+    for record in records:
+        write(record)
+        count += 1
+        if progress and count % progress_every == 0:
+            progress(count)
+    return count
+
+
+# --- Импорт ---
+
+def read_records(file, fmt):
+    """(номер строки, запись) по одной; нечитаемая строка NDJSON - запись None."""
+    if fmt == 'csv':
+        reader = csv.DictReader(file)
+        for record in reader:
+            yield reader.line_num, {key: value for key, value in record.items() if value not in ('', None)}
+        return
+    for number, line in enumerate(file, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+class _Intervals:
+    """
+    Непересекающиеся интервалы столика (секунды epoch). Раз интервалы не пересекаются,
+    концы упорядочены так же, как начала, и хватает проверить ближайший слева.
+    TableIntervals здесь не подходит: вставка пересчитывает его целиком.
+    """
+
+    def __init__(self):
+        self.starts = array('d')
+        self.ends = array('d')
+
+    def add(self, start, end):
+        index = bisect_left(self.starts, end)
+        if index and self.ends[index - 1] > start:
+            return False
+        self.starts.insert(index, start)
+        self.ends.insert(index, end)
+        return True
+
+    def has_start(self, start):
+        index = bisect_left(self.starts, start)
+        return index < len(self.starts) and self.starts[index] == start
+
+
+def _text(record, field, max_length):
+    value = record.get(field)
+    if value is None or str(value).strip() == '':
+        raise RecordError(f'нет поля {field}')
+    value = str(value)
+    if len(value) > max_length:
+        raise RecordError(f'{field} длиннее {max_length} символов')
+    return value
+
+
+def _datetime(record, field):
+    try:
+        value = datetime.fromisoformat(record[field])
+    except (KeyError, TypeError, ValueError):
+        raise RecordError(f'{field}: нужна дата и время ISO 8601')
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def _reference(record, field, objects):
+    key = str(record.get(field))
+    if key not in objects:
+        raise RecordError(f'{field} {key} не найден выше в файле')
+    return key, objects[key]
+
+
+def _insert_slots(slots):
+    """
+    Слоты (столик, начало, конец, статус) одним executemany. Слотов в файле больше всего,
+    а bulk_create тратит основное время на экземпляры модели и подготовку каждого значения.
+    """
+    if not slots:
+        return
+    connection = connections[router.db_for_write(TimeSlot)]
+    adapt = connection.ops.adapt_datetimefield_value
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}, {}, {}, {}) VALUES (%s, %s, %s, %s)'.format(
+        quote(TimeSlot._meta.db_table), quote('table_id'), quote('start_time'), quote('end_time'), quote('status'),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, [(table.pk, adapt(start), adapt(end), status) for table, start, end, status in slots])
+
+
+class Importer:
+    """Принимает записи по одной (add), пишет пачками (flush)."""
+
+    def __init__(self, batch_size=BATCH_SIZE, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        # Ключи - id из файла строкой: в CSV все значения строки
+        self.restaurants = {}
+        self.tables = {}
+        self.table_numbers = set()
+        self.intervals = {}
+        self.booked = set()
+        self.users = {}
+        self.pending = {kind: [] for kind in FIELDS}
+        self.pending_count = 0
+        self.counts = dict.fromkeys(FIELDS, 0)
+        self.errors = []
+        self.error_count = 0
+
+    def error(self, number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f'строка {number}: {message}')
+
+    def add(self, number, record):
+        try:
+            kind = record.get('model') if isinstance(record, dict) else None
+            if kind not in FIELDS:
+                raise RecordError('ожидался объект с model: ' + ', '.join(FIELDS))
+            self.pending[kind].append(getattr(self, f'_parse_{kind}')(number, record))
+            self.pending_count += 1
+        except RecordError as error:
+            self.error(number, error)
+        if self.pending_count >= self.batch_size:
+            self.flush()
+
+    def _parse_restaurant(self, number, record):
+        key = str(record.get('id'))
+        if record.get('id') is None or key in self.restaurants:
+            raise RecordError('нет id ресторана или он повторяется')
+        restaurant = Restaurant(name=_text(record, 'name', 255), address=str(record.get('address') or ''))
+        self.restaurants[key] = restaurant
+        return restaurant
+
+    def _parse_table(self, number, record):
+        key = str(record.get('id'))
+        if record.get('id') is None or key in self.tables:
+            raise RecordError('нет id столика или он повторяется')
+        restaurant_key, restaurant = _reference(record, 'restaurant', self.restaurants)
+        table_number = _text(record, 'table_number', 40)
+        try:
+            capacity = int(record.get('capacity'))
+        except (TypeError, ValueError):
+            capacity = 0
+        if capacity <= 0:
+            raise RecordError('capacity - целое больше нуля')
+        if (restaurant_key, table_number) in self.table_numbers:
+            raise RecordError(f'столик {table_number} в ресторане уже есть')
+        self.table_numbers.add((restaurant_key, table_number))
+        table = Table(restaurant=restaurant, table_number=table_number, capacity=capacity)
+        self.tables[key] = table
+        self.intervals[key] = _Intervals()
+        return table
+
+    def _parse_timeslot(self, number, record):
+        table_key, table = _reference(record, 'table', self.tables)
+        start, end = _datetime(record, 'start_time'), _datetime(record, 'end_time')
+        if start >= end:
+            raise RecordError('end_time должно быть после start_time')
+        status = record.get('status') or 'free'
+        if status not in ('free', 'reserved'):
+            raise RecordError('status - free или reserved')
+        if not self.intervals[table_key].add(start.timestamp(), end.timestamp()):
+            raise RecordError('слот пересекается с другим слотом столика')
+        return table, start, end, status
+
+    def _parse_booking(self, number, record):
+        table_key, table = _reference(record, 'table', self.tables)
+        start = _datetime(record, 'start_time')
+        if not self.intervals[table_key].has_start(start.timestamp()):
+            raise RecordError('у столика нет слота с таким началом')
+        if (table_key, start) in self.booked:
+            raise RecordError('слот уже забронирован')
+        self.booked.add((table_key, start))
+        return number, _text(record, 'user', 150), table, start
+
+    def _create_bookings(self, pending):
+        """
+        Брони пачки: пользователи и слоты ищутся двумя запросами, слоты занимаются одним UPDATE.
+        Возвращает созданные брони и (столик, начало) их слотов.
+        """
+        unknown = {username for _, username, _, _ in pending if username not in self.users}
+        if unknown:
+            self.users.update(dict.fromkeys(unknown))
+            self.users.update(User.objects.filter(username__in=unknown).values_list('username', 'pk'))
+
+        slots = {}
+        if pending:
+            rows = TimeSlot.objects.filter(
+                table_id__in={table.pk for _, _, table, _ in pending},
+                start_time__in={start for _, _, _, start in pending},
+            ).values_list('table_id', 'start_time', 'pk')
+            slots = {(table_id, start): pk for table_id, start, pk in rows}
+
+        bookings = []
+        booked = []
+        for number, username, table, start in pending:
+            if self.users[username] is None:
+                self.error(number, f'пользователь {username} не найден')
+                continue
+            bookings.append(Booking(user_id=self.users[username], table=table, timeslot_id=slots[(table.pk, start)]))
+            booked.append((table.pk, start))
+        TimeSlot.objects.filter(pk__in=[booking.timeslot_id for booking in bookings], status='free').update(
+            status='reserved',
+        )
+        return Booking.objects.bulk_create(bookings, batch_size=1000), booked
+
+    def flush(self):
+        restaurants, tables, slots, pending_bookings = (self.pending[kind] for kind in FIELDS)
+        if not self.pending_count:
+            return
+        with transaction.atomic():
+            # Порядок важен: bulk_create берёт id родителя из уже сохранённого объекта
+            Restaurant.objects.bulk_create(restaurants, batch_size=1000)
+            Table.objects.bulk_create(tables, batch_size=1000)
+            _insert_slots(slots)
+            bookings, booked = self._create_bookings(pending_bookings)
+            index_created(restaurants, tables)
+
+            # Только пары (столик, день) пачки: диапазон [min, max] на все столики
+            # дал бы столики x дни строк ленты и пересчёта сводки
+            days = {(table.pk, timezone.localdate(start)) for table, start, _, _ in slots}
+            days.update((table_id, timezone.localdate(start)) for table_id, start in booked)
+            if days:
+                timeslots_bulk_changed.send(
+                    sender=TimeSlot, table_ids=sorted({table_id for table_id, _ in days}),
+                    date_from=min(day for _, day in days), date_to=max(day for _, day in days), days=days,
+                )
+        if restaurants:
+            bump_version('restaurant')
+        if tables:
+            bump_version('table')
+        if bookings:
+            bump_version('booking')
+
+        for kind, created in zip(FIELDS, (restaurants, tables, slots, bookings)):
+            self.counts[kind] += len(created)
+        self.pending = {kind: [] for kind in FIELDS}
+        self.pending_count = 0
+        if self.progress:
+            self.progress(self.counts, self.error_count)
+
+
+def import_records(records, batch_size=BATCH_SIZE, progress=None):
+    """Импортировать (номер строки, запись). Возвращает Importer с counts, error_count и errors."""
+    importer = Importer(batch_size, progress)
+    for number, record in records:
+        importer.add(number, record)
+    importer.flush()
+    return importer
@@ -0,0 +1,122 @@
+"""
+Кэш ответов для публичных read-эндпоинтов (list/retrieve/available).
+
+Бэкенд - любой из CACHES (locmem, file, redis), алиас задаётся в API_CACHE['ALIAS'].
+Инвалидация версиями: у каждой модели свой счётчик, он растёт на каждом
+сохранении/удалении после коммита (см. signals.py). Версии зависимостей входят в ключ, поэтому
+после записи старые ключи просто перестают запрашиваться.
+С locmem кэш и версии у каждого процесса свои - записи из других процессов
+станут видны не позже чем через API_CACHE['TIMEOUT'] секунд. Для общего кэша
+на несколько процессов нужен file или redis.
+
+Кэшируются только 200-ответы, ETag строится из ключа, так что на
+If-None-Match ответ 304 отдаётся без обращения к БД и без чтения данных.
+"""
+import hashlib
+import time
+from functools import partial, wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+DEFAULTS = {
+    'ENABLED': True,
+    'ALIAS': 'default',
+    'TIMEOUT': 60,
+}
+
+
+def api_cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'API_CACHE', {})}
+
+
+def get_cache():
+    return caches[api_cache_settings()['ALIAS']]
+
+
+def _version_key(model_name):
+    return f'api:version:{model_name}'
+
+
+def bump_version(model_name):
+    cache = get_cache()
+    key = _version_key(model_name)
+    # add ничего не делает, если ключ уже есть; версия не должна протухать
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # ключ успели вытеснить между add и incr
+        cache.set(key, 1, timeout=None)
+
+
+def bump_version_on_commit(model_name, using=None):
+    """
+    bump_version после коммита текущей транзакции (вне транзакции - сразу).
+    Если поднять версию до коммита, параллельный GET успеет прочитать ещё старые
+    строки и закэширует их под новой версией до истечения TIMEOUT.
+    """
+    transaction.on_commit(partial(bump_version, model_name), using=using)
+
+
+def get_versions(model_names):
+    found = get_cache().get_many([_version_key(name) for name in model_names])
+    return tuple(found.get(_version_key(name), 0) for name in model_names)
+
+
+def cached_response(method):
+    """Декоратор для list/retrieve/action: отдаёт ответ из кэша или кладёт его туда."""
+    @wraps(method)
+    def wrapper(self, request, *args, **kwargs):
+        config = api_cache_settings()
+        if not config['ENABLED'] or request.method not in ('GET', 'HEAD'):
+            return method(self, request, *args, **kwargs)
+
+        timeout = config['TIMEOUT']
+        # Слоты фильтруются по timezone.now(), поэтому ключ меняется раз в timeout секунд
+        time_bucket = int(time.time() // timeout) if timeout else 0
+        raw_key = repr((
+            request.get_host(),
+            self.basename,
+            self.action,
+            sorted(kwargs.items()),
+            sorted(request.query_params.lists()),
+            bool(request.user and request.user.is_staff),
+            get_versions(self.cache_depends_on),
+            time_bucket,
+        ))
+        digest = hashlib.md5(raw_key.encode()).hexdigest()
+        etag = f'"{digest}"'
+
+        if etag in request.headers.get('If-None-Match', ''):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        cache = get_cache()
+        key = f'api:response:{digest}'
+        data = cache.get(key)
+        if data is None:
+            response = method(self, request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            cache.set(key, response.data, timeout)
+        else:
+            response = Response(data)
+        response['ETag'] = etag
+        return response
+    return wrapper
+
+
+class CachedReadMixin:
+    """Кэширует list и retrieve. cache_depends_on - модели, от которых зависит ответ."""
+    cache_depends_on = ()
+
+    @cached_response
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cached_response
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
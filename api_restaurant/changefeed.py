@@ -0,0 +1,246 @@
+"""
+Лента изменений слотов: вместо опроса /api/timeslots/available/ каждые несколько
+секунд клиент подписывается один раз и получает только изменения.
+
+Каждое изменение слота (создание, бронь, отмена, перенос, удаление, массовые
+операции) пишется строкой SlotChange - в той же транзакции, что и само изменение
+(см. signals.py). id строки - курсор: клиент запоминает последний полученный id и
+продолжает с него, в том числе после переподключения.
+
+Курсор работает, только если строки становятся видны в порядке id. На SQLite это так:
+пишущие транзакции выполняются по одной. На PostgreSQL параллельные транзакции
+фиксируются в любом порядке, и подписчик, уже прочитавший id N+1, не увидел бы id N.
+Поэтому строки журнала пишутся под транзакционной advisory-блокировкой (FEED_LOCK_ID):
+от вставки до фиксации её держит одна транзакция, и id фиксируются по возрастанию.
+Для других СУБД порядок не гарантируется.
+
+Эндпоинты (async_views.py, рассчитаны на ASGI):
+  /api/async/timeslots/changes/?restaurant=&date=&after=         - long-poll, JSON;
+  /api/async/timeslots/changes/stream/?restaurant=&date=&after=  - Server-Sent Events,
+      курсор можно передать и заголовком Last-Event-ID (EventSource делает это сам).
+
+Брокер только будит ждущих подписчиков ("появились изменения новее id N"),
+данные всегда читаются из журнала. Брокер задаётся CHANGE_FEED['BROKER']:
+  InProcessBroker - в памяти процесса (по умолчанию). Изменения из других процессов
+                    подписчик увидит не позже чем через POLL_INTERVAL секунд;
+  CacheBroker     - последний id в кэше CHANGE_FEED['CACHE_ALIAS'] (file, redis, ...),
+                    общий для всех процессов.
+Журнал старше RETENTION_HOURS чистит фоновая задача prune_slot_changes (jobs.py).
+"""
+import asyncio
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.db import connections, router, transaction
+from django.db.models import Max
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import SlotChange
+from .rows import Computed, RowSpec
+
+DEFAULTS = {
+    'ENABLED': True,
+    'BROKER': 'api_restaurant.changefeed.InProcessBroker',
+    'CACHE_ALIAS': 'default',
+    'POLL_INTERVAL': 2,
+    'LONG_POLL_TIMEOUT': 25,
+    'STREAM_SECONDS': 300,
+    'HEARTBEAT': 15,
+    'RETENTION_HOURS': 24,
+    'MAX_CHANGES': 500,
+}
+
+CHANGE_ROW = RowSpec({
+    'id': None,
+    'kind': None,
+    'table': 'table_id',
+    'timeslot': 'timeslot_id',
+    'date': Computed(('date',), lambda values: values['date'].isoformat()),
+    'start_time': None,
+    'end_time': None,
+    'status': None,
+}, datetimes=('start_time', 'end_time'))
+
+
+def feed_settings():
+    return {**DEFAULTS, **getattr(settings, 'CHANGE_FEED', {})}
+
+
+class InProcessBroker:
+    """Последний опубликованный id и ожидающие его корутины (в любых event loop)."""
+
+    def __init__(self, **options):
+        self._lock = threading.Lock()
+        self._latest = 0
+        self._waiters = set()
+
+    def publish(self, change_id):
+        with self._lock:
+            self._latest = max(self._latest, change_id)
+            waiters = list(self._waiters)
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # event loop подписчика уже закрыт
+                pass
+
+    async def latest(self):
+        return self._latest
+
+    async def wait(self, after_id, timeout):
+        """Дождаться id новее after_id не дольше timeout секунд. True - дождались."""
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self._lock:
+            if self._latest > after_id:
+                return True
+            self._waiters.add(waiter)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+        return self._latest > after_id
+
+
+class CacheBroker:
+    """Последний id в общем кэше; ждущие проверяют его каждые check_interval секунд."""
+    key = 'changefeed:latest'
+
+    def __init__(self, alias='default', check_interval=0.2, **options):
+        self.alias = alias
+        self.check_interval = check_interval
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def publish(self, change_id):
+        # Не атомарно, но ошибка лишь будит подписчиков позже: данные они читают из журнала
+        if self.cache.get(self.key, 0) < change_id:
+            self.cache.set(self.key, change_id, timeout=None)
+
+    async def latest(self):
+        return await self.cache.aget(self.key, 0)
+
+    async def wait(self, after_id, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            if await self.latest() > after_id:
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(self.check_interval, remaining))
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            config = feed_settings()
+            _broker = import_string(config['BROKER'])(alias=config['CACHE_ALIAS'])
+        return _broker
+
+
+@receiver(setting_changed)
+def _reset_broker(setting, **kwargs):
+    global _broker
+    if setting == 'CHANGE_FEED':
+        with _broker_lock:
+            _broker = None
+
+
+# Ключ pg_advisory_xact_lock для записи журнала (произвольная константа приложения)
+FEED_LOCK_ID = 0x51075C4A
+
+
+def _write(changes):
+    """Записать строки журнала и разбудить подписчиков после фиксации."""
+    using = router.db_for_write(SlotChange)
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        # atomic - чтобы и в autocommit блокировка и вставка были в одной транзакции.
+        # Блокировка держится до конца внешней транзакции: следующие строки получат id
+        # только после её фиксации
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)', [FEED_LOCK_ID])
+            changes = SlotChange.objects.using(using).bulk_create(changes, batch_size=1000)
+    else:
+        changes = SlotChange.objects.using(using).bulk_create(changes, batch_size=1000)
+    if changes:
+        last_id = max(change.pk for change in changes)
+        transaction.on_commit(lambda: get_broker().publish(last_id), using=using)
+
+
+def _slot_change(slot, kind, date=None):
+    return SlotChange(
+        table_id=slot.table_id, timeslot_id=slot.pk, kind=kind,
+        date=date or timezone.localdate(slot.start_time),
+        start_time=slot.start_time, end_time=slot.end_time, status=slot.status,
+    )
+
+
+def record_slot_saved(slot, previous_day=None):
+    """Слот создан или изменён; при переносе на другой день старый день получает 'deleted'."""
+    if not feed_settings()['ENABLED']:
+        return
+    changes = [_slot_change(slot, 'saved')]
+    if previous_day and previous_day != changes[0].date:
+        changes.insert(0, _slot_change(slot, 'deleted', previous_day))
+    _write(changes)
+
+
+def record_slot_deleted(slot):
+    if not feed_settings()['ENABLED']:
+        return
+    _write([_slot_change(slot, 'deleted')])
+
+
+def record_bulk_change(table_ids, date_from, date_to, timeslots=None, days=None):
+    """
+    Массовое изменение: известные слоты пишутся с их новым состоянием, известные
+    пары (столик, день) - 'reset' на каждую, иначе - 'reset' на каждый день каждого столика.
+    """
+    if not feed_settings()['ENABLED']:
+        return
+    if timeslots is not None:
+        changes = [_slot_change(slot, 'saved') for slot in timeslots]
+    elif days is not None:
+        changes = [SlotChange(table_id=table_id, kind='reset', date=day) for table_id, day in sorted(set(days))]
+    else:
+        days = [date_from + timedelta(days=n) for n in range((date_to - date_from).days + 1)]
+        changes = [SlotChange(table_id=table_id, kind='reset', date=day) for table_id in table_ids for day in days]
+    _write(changes)
+
+
+def changes_queryset(restaurant_id, date=None):
+    queryset = SlotChange.objects.filter(table__restaurant_id=restaurant_id)
+    if date is not None:
+        queryset = queryset.filter(date=date)
+    return queryset
+
+
+async def fetch_changes(queryset, after_id):
+    """Изменения новее after_id (не больше MAX_CHANGES) строками CHANGE_ROW."""
+    limit = feed_settings()['MAX_CHANGES']
+    rows = CHANGE_ROW.values(queryset.filter(id__gt=after_id).order_by('id'))[:limit]
+    return [CHANGE_ROW.build(values) async for values in rows]
+
+
+async def latest_change_id():
+    result = await SlotChange.objects.aaggregate(latest=Max('id'))
+    return result['latest'] or 0
@@ -0,0 +1,94 @@
+"""
+Компактное представление дня ресторана для виджета бронирования.
+
+Вместо объекта на каждый свободный слот (с названием ресторана, номером столика
+и полными датами) - столики один раз и по каждому столику отрезки
+свободных и занятых ячеек фиксированной длины (step минут от начала дня):
+[[первая ячейка, число ячеек], ...].
+
+Ячейки считаются битовыми масками на int: слот - это сдвинутая маска
+((1 << n) - 1) << first, день столика - OR масок, отрезки достаются из маски
+операциями над битами, без цикла по ячейкам. Ячейка свободна, только если
+целиком лежит внутри свободного слота, и занята, если хоть как-то
+пересекается с забронированным (занятость важнее).
+"""
+from datetime import timedelta
+
+from .availability import day_bounds
+from .models import Restaurant, Table
+from .rows import iso_datetime
+
+ALLOWED_STEPS = (5, 10, 15, 20, 30, 60)
+
+
+def runs(mask):
+    """Отрезки единичных битов маски: [[начало, длина], ...] по возрастанию."""
+    result = []
+    position = 0
+    while mask:
+        skip = (mask & -mask).bit_length() - 1  # нули до ближайшей единицы
+        mask >>= skip
+        position += skip
+        length = (~mask & (mask + 1)).bit_length() - 1  # единицы подряд
+        result.append([position, length])
+        mask >>= length
+        position += length
+    return result
+
+
+def _cells(start, end, day_start, step, outer):
+    """Маска ячеек слота: outer - задетые хоть как-то, иначе - покрытые целиком."""
+    first, first_rest = divmod((start - day_start) // timedelta(seconds=1), step)
+    last, last_rest = divmod((end - day_start) // timedelta(seconds=1), step)
+    if outer:
+        last += bool(last_rest)
+    else:
+        first += bool(first_rest)
+    first = max(first, 0)
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def slot_grid(restaurant_id, date, slots, step_minutes=30):
+    """
+    slots - queryset слотов (уже с ограничениями доступа), из него берутся слоты
+    столиков ресторана за день. Возвращает None, если ресторана нет.
+    """
+    restaurant = Restaurant.objects.filter(pk=restaurant_id).values('id', 'name').first()
+    if restaurant is None:
+        return None
+
+    day_start, day_end = day_bounds(date)
+    step = step_minutes * 60
+    cells = (day_end - day_start) // timedelta(seconds=step)
+    day_mask = (1 << cells) - 1
+
+    free = {}
+    reserved = {}
+    rows = slots.filter(
+        table__restaurant_id=restaurant_id, start_time__lt=day_end, end_time__gt=day_start,
+    ).values_list('table_id', 'start_time', 'end_time', 'status').order_by()
+    for table_id, start, end, slot_status in rows:
+        if slot_status == 'free':
+            free[table_id] = free.get(table_id, 0) | _cells(start, end, day_start, step, outer=False)
+        else:
+            reserved[table_id] = reserved.get(table_id, 0) | _cells(start, end, day_start, step, outer=True)
+
+    tables = []
+    tables_qs = Table.objects.filter(restaurant_id=restaurant_id).order_by('table_number')
+    for table in tables_qs.values('id', 'table_number', 'capacity'):
+        busy = reserved.get(table['id'], 0) & day_mask
+        table['free'] = runs(free.get(table['id'], 0) & ~busy & day_mask)
+        table['reserved'] = runs(busy)
+        tables.append(table)
+
+    return {
+        'restaurant': restaurant['id'],
+        'restaurant_name': restaurant['name'],
+        'date': date.isoformat(),
+        'start': iso_datetime(day_start),
+        'step_minutes': step_minutes,
+        'cells': cells,
+        'tables': tables,
+    }
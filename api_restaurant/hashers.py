@@ -0,0 +1,105 @@
+"""
+Хешеры паролей с параметрами стоимости из настроек и ограниченным пулом потоков.
+
+Хеширование занимает CPU на десятки-сотни миллисекунд. Если каждый поток
+запросов считает хеш сам, во время волны регистраций/входов все потоки
+заняты хешами и остальные запросы ждут. Поэтому encode/verify выполняются
+в пуле из PASSWORD_HASHING_POOL['WORKERS'] потоков (scrypt, PBKDF2 и argon2
+отпускают GIL, так что потоки реально работают параллельно), а ждать
+воркера могут не больше PASSWORD_HASHING_POOL['QUEUE'] вызовов - остальные
+сразу получают 503 вместо очереди, растущей без ограничений.
+
+Имена алгоритмов совпадают со стандартными хешерами Django, так что уже
+сохранённые хеши проверяются без изменений.
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from project.passwords import PARAMS
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Сервис перегружен, повторите попытку позже.'
+    default_code = 'hashing_busy'
+
+
+_pool = None
+_slots = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+
+def _get_pool():
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is None:
+            config = {'WORKERS': 1, 'QUEUE': 4, **getattr(settings, 'PASSWORD_HASHING_POOL', {})}
+            _pool = ThreadPoolExecutor(max_workers=config['WORKERS'], thread_name_prefix='hashing')
+            _slots = threading.BoundedSemaphore(config['WORKERS'] + config['QUEUE'])
+        return _pool, _slots
+
+
+@receiver(setting_changed)
+def _reset_pool(setting, **kwargs):
+    global _pool
+    if setting == 'PASSWORD_HASHING_POOL':
+        with _pool_lock:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            _pool = None
+
+
+def _in_pool(func, args):
+    _local.in_pool = True
+    return func(*args)
+
+
+def run_hashing(func, *args):
+    """Выполнить func в пуле хеширования и дождаться результата."""
+    # verify некоторых хешеров вызывает encode - внутри пула считаем на месте
+    if getattr(_local, 'in_pool', False):
+        return func(*args)
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        return pool.submit(_in_pool, func, args).result()
+    finally:
+        slots.release()
+
+
+def _param(name):
+    return property(lambda self: getattr(settings, 'PASSWORD_HASHER_PARAMS', {}).get(name, PARAMS[name]))
+
+
+class PooledHashingMixin:
+    def encode(self, password, salt, *args, **kwargs):
+        return run_hashing(partial(super().encode, password, salt, *args, **kwargs))
+
+    def verify(self, password, encoded):
+        return run_hashing(super().verify, password, encoded)
+
+
+class ScryptPasswordHasher(PooledHashingMixin, hashers.ScryptPasswordHasher):
+    work_factor = _param('SCRYPT_WORK_FACTOR')
+    block_size = _param('SCRYPT_BLOCK_SIZE')
+    parallelism = _param('SCRYPT_PARALLELISM')
+
+
+class Argon2PasswordHasher(PooledHashingMixin, hashers.Argon2PasswordHasher):
+    time_cost = _param('ARGON2_TIME_COST')
+    memory_cost = _param('ARGON2_MEMORY_COST')
+    parallelism = _param('ARGON2_PARALLELISM')
+
+
+class PBKDF2PasswordHasher(PooledHashingMixin, hashers.PBKDF2PasswordHasher):
+    iterations = _param('PBKDF2_ITERATIONS')
@@ -0,0 +1,227 @@
+"""
+Инструментация запросов: где тратится время по эндпоинтам.
+
+Включается настройкой API_INSTRUMENTATION['ENABLED']. Выключенный middleware
+поднимает MiddlewareNotUsed и вообще не попадает в цепочку - нулевая цена.
+Включённый обрабатывает долю запросов SAMPLE_RATE (остальные - один random()).
+
+Для каждого учтённого запроса по имени маршрута (view_name: 'timeslot-available', ...)
+копятся гистограммы:
+  latency_ms    - весь запрос с middleware;
+  db_ms         - время SQL (execute_wrapper на всех соединениях, DEBUG не нужен);
+  queries       - число запросов к БД;
+  serialize_ms  - время вьюхи без SQL плюс рендеринг ответа, то есть сериализация
+                  и остальная Python-работа над данными.
+Запросы, сделавшие больше QUERY_BUDGET запросов к БД, пишутся в лог
+api_restaurant.instrumentation и считаются в over_budget.
+Ответ получает заголовок Server-Timing с тем же разбиением.
+
+Метрики живут в памяти процесса. Отдаются staff-пользователям на /api/metrics/
+в JSON или в текстовом формате Prometheus (?format=prometheus).
+"""
+import logging
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.renderers import BaseRenderer
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'SAMPLE_RATE': 1.0,
+    'QUERY_BUDGET': 20,
+}
+
+MS_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+METRICS = {
+    'latency_ms': MS_BUCKETS,
+    'db_ms': MS_BUCKETS,
+    'serialize_ms': MS_BUCKETS,
+    'queries': QUERY_BUCKETS,
+}
+
+
+def instrumentation_settings():
+    return {**DEFAULTS, **getattr(settings, 'API_INSTRUMENTATION', {})}
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # Последний счётчик - значения больше всех границ (+Inf)
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """[(граница, число наблюдений <= граница), ..., ('+Inf', всего)] - как в Prometheus."""
+        result = []
+        total = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def as_dict(self):
+        return {'count': self.count, 'sum': round(self.sum, 3), 'buckets': self.cumulative()}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def record(self, view, values, over_budget):
+        with self._lock:
+            entry = self._views.get(view)
+            if entry is None:
+                entry = self._views[view] = {
+                    'histograms': {name: Histogram(buckets) for name, buckets in METRICS.items()},
+                    'over_budget': 0,
+                }
+            for name, value in values.items():
+                entry['histograms'][name].observe(value)
+            entry['over_budget'] += over_budget
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: {
+                    'requests': entry['histograms']['latency_ms'].count,
+                    'over_budget': entry['over_budget'],
+                    **{name: histogram.as_dict() for name, histogram in entry['histograms'].items()},
+                }
+                for view, entry in sorted(self._views.items())
+            }
+
+
+registry = Registry()
+
+
+class QueryTimer:
+    """execute_wrapper: число и суммарное время запросов к БД."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+            self.count += 1
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        config = instrumentation_settings()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = config['SAMPLE_RATE']
+        self.query_budget = config['QUERY_BUDGET']
+
+    def __call__(self, request):
+        if self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        timer = QueryTimer()
+        marks = request._instrumentation = {'timer': timer}
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        finished = time.perf_counter()
+
+        # Без TemplateResponse (стриминг, HttpResponse) рендеринг отдельно не виден:
+        # вьюха считается до конца запроса
+        view_seconds = marks.get('view_end', finished) - marks.get('view_start', started)
+        view_db = marks.get('view_end_db', timer.seconds) - marks.get('view_start_db', 0)
+        serialize_seconds = max(view_seconds - view_db, 0) + marks.get('render', 0)
+        values = {
+            'latency_ms': (finished - started) * 1000,
+            'db_ms': timer.seconds * 1000,
+            'serialize_ms': serialize_seconds * 1000,
+            'queries': timer.count,
+        }
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        over_budget = timer.count > self.query_budget
+        if over_budget:
+            logger.warning('%s %s: %d запросов к БД при бюджете %d', request.method, view, timer.count, self.query_budget)
+        registry.record(view, values, over_budget)
+
+        response['Server-Timing'] = (
+            f'db;dur={values["db_ms"]:.1f};desc="{timer.count} queries", '
+            f'serialize;dur={values["serialize_ms"]:.1f}, '
+            f'total;dur={values["latency_ms"]:.1f}'
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        marks = getattr(request, '_instrumentation', None)
+        if marks is not None:
+            marks['view_start'] = time.perf_counter()
+            marks['view_start_db'] = marks['timer'].seconds
+        return None
+
+    def process_template_response(self, request, response):
+        # DRF Response - это SimpleTemplateResponse: вьюха вернула данные, рендеринг ещё впереди
+        marks = getattr(request, '_instrumentation', None)
+        if marks is None:
+            return response
+        marks['view_end'] = render_start = time.perf_counter()
+        marks['view_end_db'] = marks['timer'].seconds
+
+        def rendered(response):
+            marks['render'] = time.perf_counter() - render_start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class PrometheusRenderer(BaseRenderer):
+    """Текстовый формат Prometheus для снимка Registry.snapshot()."""
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if not isinstance(data, dict) or 'views' not in data:
+            # Ошибки (403 и т.п.) - просто текстом
+            return str(data).encode(self.charset)
+        lines = []
+        for name in METRICS:
+            metric = f'api_request_{name}'
+            lines.append(f'# TYPE {metric} histogram')
+            for view, entry in data['views'].items():
+                histogram = entry[name]
+                for bound, count in histogram['buckets']:
+                    lines.append(f'{metric}_bucket{{view="{view}",le="{bound}"}} {count}')
+                lines.append(f'{metric}_sum{{view="{view}"}} {histogram["sum"]}')
+                lines.append(f'{metric}_count{{view="{view}"}} {histogram["count"]}')
+        lines.append('# TYPE api_request_over_budget_total counter')
+        for view, entry in data['views'].items():
+            lines.append(f'api_request_over_budget_total{{view="{view}"}} {entry["over_budget"]}')
+        return ('\n'.join(lines) + '\n').encode(self.charset)
@@ -0,0 +1,241 @@
+"""
+Фоновые задачи на очереди в БД (модель Job), без внешнего брокера.
+
+Воркер - manage.py run_jobs. Задачу забирает условный UPDATE
+... SET status='running' WHERE id=... AND status='queued', поэтому одну задачу
+не выполнят два воркера (в том числе в разных процессах). Упавшая задача
+повторяется через RETRY_DELAY * 2**(попытка - 1) секунд, пока не кончатся
+max_attempts. Задачи, зависшие в running дольше LOCK_TIMEOUT (воркер умер),
+возвращаются в очередь.
+
+Задачи регистрируются декоратором @job('имя') и ставятся в очередь через
+enqueue('имя', {аргументы}). Периодические (BACKGROUND_JOBS['PERIODIC'],
+имя -> интервал в секундах) воркер ставит сам:
+  archive_expired_slots     - прошедшие слоты без брони переносятся в TimeSlotHistory,
+                              сводка TableAvailability за прошедшие дни удаляется;
+  generate_scheduled_slots  - слоты на SLOT_HORIZON_DAYS дней вперёд по расписаниям
+                              ресторанов (RestaurantSchedule);
+  refresh_availability      - пересчёт сводки TableAvailability; при
+                              AVAILABILITY_REFRESH='queue' сигналы ставят её в очередь
+                              вместо пересчёта внутри запроса;
+  prune_slot_changes        - удаление журнала ленты изменений старше
+                              CHANGE_FEED['RETENTION_HOURS'] (changefeed.py).
+"""
+import logging
+import os
+import socket
+import traceback
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max
+from django.utils import timezone
+
+from .availability import refresh_table_days
+from .caching import bump_version
+from .models import Job, SlotChange, TableAvailability, TimeSlot, TimeSlotHistory, raw_delete
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'POLL_INTERVAL': 5,
+    'LOCK_TIMEOUT': 600,
+    'RETRY_DELAY': 30,
+    'ARCHIVE_BATCH': 1000,
+    'SLOT_HORIZON_DAYS': 30,
+    'AVAILABILITY_REFRESH': 'sync',
+    'PERIODIC': {},
+}
+
+JOBS = {}
+
+
+def jobs_settings():
+    return {**DEFAULTS, **getattr(settings, 'BACKGROUND_JOBS', {})}
+
+
+def job(name):
+    """Зарегистрировать функцию как задачу name; аргументы - ключи payload."""
+    def register(func):
+        JOBS[name] = func
+        return func
+    return register
+
+
+def enqueue(name, payload=None, run_at=None, max_attempts=3):
+    if name not in JOBS:
+        raise LookupError(f'Неизвестная задача: {name}')
+    return Job.objects.create(
+        name=name, payload=payload or {}, run_at=run_at or timezone.now(), max_attempts=max_attempts,
+    )
+
+
+def default_worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def claim(worker):
+    """Забрать следующую готовую задачу или None."""
+    now = timezone.now()
+    candidates = list(
+        Job.objects.filter(status='queued', run_at__lte=now)
+        .order_by('run_at', 'pk').values_list('pk', flat=True)[:10]
+    )
+    for pk in candidates:
+        # Кандидата мог забрать другой воркер - тогда update вернёт 0
+        taken = Job.objects.filter(pk=pk, status='queued').update(
+            status='running', locked_by=worker, locked_at=now, attempts=F('attempts') + 1,
+        )
+        if taken:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def run(job_obj):
+    """Выполнить забранную задачу и записать результат или ошибку."""
+    try:
+        func = JOBS.get(job_obj.name)
+        if func is None:
+            raise LookupError(f'Неизвестная задача: {job_obj.name}')
+        result = func(**job_obj.payload)
+    except Exception:
+        logger.exception('Задача %s упала (попытка %d)', job_obj, job_obj.attempts)
+        job_obj.last_error = traceback.format_exc()
+        job_obj.locked_by = ''
+        job_obj.locked_at = None
+        if job_obj.attempts < job_obj.max_attempts:
+            delay = jobs_settings()['RETRY_DELAY'] * 2 ** (job_obj.attempts - 1)
+            job_obj.status = 'queued'
+            job_obj.run_at = timezone.now() + timedelta(seconds=delay)
+        else:
+            job_obj.status = 'failed'
+            job_obj.finished_at = timezone.now()
+        job_obj.save(update_fields=['status', 'run_at', 'last_error', 'locked_by', 'locked_at', 'finished_at'])
+        return False
+
+    job_obj.status = 'done'
+    job_obj.result = result
+    job_obj.finished_at = timezone.now()
+    job_obj.save(update_fields=['status', 'result', 'finished_at'])
+    return True
+
+
+def requeue_stale():
+    """Вернуть в очередь задачи, которые держит умерший воркер."""
+    deadline = timezone.now() - timedelta(seconds=jobs_settings()['LOCK_TIMEOUT'])
+    return Job.objects.filter(status='running', locked_at__lt=deadline).update(
+        status='queued', locked_by='', locked_at=None,
+    )
+
+
+def schedule_periodic():
+    """Поставить периодические задачи, у которых нет задачи в очереди или в работе."""
+    now = timezone.now()
+    scheduled = 0
+    for name, interval in jobs_settings()['PERIODIC'].items():
+        if Job.objects.filter(name=name, status__in=['queued', 'running']).exists():
+            continue
+        last = Job.objects.filter(name=name).aggregate(last=Max('finished_at'))['last']
+        run_at = max(now, last + timedelta(seconds=interval)) if last else now
+        enqueue(name, run_at=run_at)
+        scheduled += 1
+    return scheduled
+
+
+def work(worker=None, limit=None):
+    """Один проход воркера: выполнить все готовые задачи (не больше limit). Возвращает их число."""
+    worker = worker or default_worker_name()
+    requeue_stale()
+    schedule_periodic()
+    processed = 0
+    while limit is None or processed < limit:
+        job_obj = claim(worker)
+        if job_obj is None:
+            break
+        run(job_obj)
+        processed += 1
+    return processed
+
+
+def refresh_days(table_ids, date_from, date_to=None):
+    """Пересчёт сводки доступности: сразу или фоновой задачей (AVAILABILITY_REFRESH)."""
+    if jobs_settings()['AVAILABILITY_REFRESH'] != 'queue':
+        refresh_table_days(table_ids, date_from, date_to)
+        return
+    # Задача пишется в той же транзакции, что и изменение слотов: откат отменит и её
+    enqueue('refresh_availability', {
+        'table_ids': list(table_ids),
+        'date_from': date_from.isoformat(),
+        'date_to': (date_to or date_from).isoformat(),
+    })
+
+
+@job('refresh_availability')
+def refresh_availability(table_ids, date_from, date_to):
+    rows = refresh_table_days(table_ids, date.fromisoformat(date_from), date.fromisoformat(date_to))
+    bump_version('timeslot')
+    return {'rows': rows}
+
+
+@job('archive_expired_slots')
+def archive_expired_slots(batch=None):
+    """
+    Перенести закончившиеся слоты в TimeSlotHistory. Слоты с бронью остаются:
+    Booking ссылается на слот с CASCADE, и удаление стёрло бы историю броней.
+    """
+    from .signals import timeslots_bulk_changed
+
+    batch = batch or jobs_settings()['ARCHIVE_BATCH']
+    now = timezone.now()
+    today = timezone.localdate(now)
+    archived = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                TimeSlot.objects.filter(end_time__lte=now, bookings__isnull=True)
+                .order_by('end_time', 'pk').values('pk', 'table_id', 'start_time', 'end_time', 'status')[:batch]
+            )
+            if not rows:
+                break
+            TimeSlotHistory.objects.bulk_create([
+                TimeSlotHistory(
+                    slot_id=row['pk'], table_id=row['table_id'], start_time=row['start_time'],
+                    end_time=row['end_time'], status=row['status'],
+                )
+                for row in rows
+            ])
+            # Без сигналов на каждый слот: каскадов нет (броней у слотов нет), сводка
+            # за прошедшие дни удаляется ниже, за сегодня - пересчитывается пакетом
+            raw_delete(TimeSlot.objects.filter(pk__in=[row['pk'] for row in rows]))
+            days = {(row['table_id'], today) for row in rows if timezone.localdate(row['start_time']) == today}
+            if days:
+                timeslots_bulk_changed.send(
+                    sender=TimeSlot, table_ids=sorted({table_id for table_id, _ in days}),
+                    date_from=today, date_to=today, days=days,
+                )
+        archived += len(rows)
+
+    summary = TableAvailability.objects.filter(date__lt=today).delete()[0]
+    if archived:
+        bump_version('timeslot')
+    return {'archived': archived, 'summary_deleted': summary}
+
+
+@job('generate_scheduled_slots')
+def generate_scheduled_slots(days=None):
+    """Слоты с завтрашнего дня на days (SLOT_HORIZON_DAYS) дней вперёд по расписаниям."""
+    from .schedule import generate_from_schedules
+
+    days = days or jobs_settings()['SLOT_HORIZON_DAYS']
+    date_from = timezone.localdate() + timedelta(days=1)
+    return generate_from_schedules(date_from, date_from + timedelta(days=days - 1))
+
+
+@job('prune_slot_changes')
+def prune_slot_changes(hours=None):
+    from .changefeed import feed_settings
+
+    hours = hours or feed_settings()['RETENTION_HOURS']
+    deleted = SlotChange.objects.filter(created_at__lt=timezone.now() - timedelta(hours=hours)).delete()[0]
+    return {'deleted': deleted}
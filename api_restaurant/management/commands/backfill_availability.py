@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from api_restaurant.availability import refresh_table_days
+from api_restaurant.models import Table, TimeSlot
+
+
+class Command(BaseCommand):
+    help = 'Пересчитать сводку доступности столиков (TableAvailability) по существующим слотам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='Первый день, YYYY-MM-DD (по умолчанию - самый ранний слот)')
+        parser.add_argument('--to', dest='date_to', help='Последний день, YYYY-MM-DD (по умолчанию - самый поздний слот)')
+        parser.add_argument('--batch', type=int, default=100, help='Столиков за один пересчёт')
+
+    def handle(self, *args, **options):
+        bounds = TimeSlot.objects.aggregate(first=Min('start_time'), last=Max('start_time'))
+        if bounds['first'] is None:
+            self.stdout.write('Слотов нет, пересчитывать нечего')
+            return
+
+        try:
+            date_from = self._parse(options['date_from']) or timezone.localdate(bounds['first'])
+            date_to = self._parse(options['date_to']) or timezone.localdate(bounds['last'])
+        except ValueError:
+            raise CommandError('Неверный формат даты. Нужно: YYYY-MM-DD.')
+
+        table_ids = list(Table.objects.order_by('pk').values_list('pk', flat=True))
+        rows = 0
+        for i in range(0, len(table_ids), options['batch']):
+            batch = table_ids[i:i + options['batch']]
+            rows += refresh_table_days(batch, date_from, date_to)
+            self.stdout.write(f'Столиков: {i + len(batch)}/{len(table_ids)}, строк сводки: {rows}')
+
+        self.stdout.write(self.style.SUCCESS(f'Готово: {date_from} - {date_to}, строк сводки: {rows}'))
+
+    @staticmethod
+    def _parse(value):
+        if not value:
+            return None
+        return timezone.datetime.strptime(value, '%Y-%m-%d').date()
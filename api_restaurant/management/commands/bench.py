@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api_restaurant.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    help = 'Запуск бенчмарков на временной тестовой БД'
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Сценарии (по умолчанию - все): ' + ', '.join(BENCHMARKS))
+        parser.add_argument('--database-file', help='Тестовая БД SQLite в этом файле, а не в памяти')
+
+    def handle(self, *args, **options):
+        names = options['names'] or list(BENCHMARKS)
+        unknown = [name for name in names if name not in BENCHMARKS]
+        if unknown:
+            raise CommandError(f"Неизвестные сценарии: {', '.join(unknown)}")
+
+        # Тестовое окружение нужно сценариям, которые ходят через тестовый клиент
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        if options['database_file']:
+            connection.settings_dict['TEST']['NAME'] = options['database_file']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for name in names:
+                self.stdout.write(self.style.MIGRATE_HEADING(f'== {name}'))
+                BENCHMARKS[name](self.stdout.write)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
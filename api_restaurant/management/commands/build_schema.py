@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api_restaurant.schema import build
+
+
+class Command(BaseCommand):
+    help = 'Сгенерировать схему OpenAPI и сохранить на диск для /api/schema/ (api_restaurant/schema.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', help="Файл схемы (по умолчанию API_SCHEMA['PATH'])")
+
+    def handle(self, *args, **options):
+        path, size = build(options['path'])
+        self.stdout.write(self.style.SUCCESS(f'Готово: {path} ({size} байт)'))
@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api_restaurant.bulkdata import export_records, write_records
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка ресторанов, столиков, слотов и броней в NDJSON/CSV для import_restaurants'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .ndjson или .csv; - писать в stdout')
+        parser.add_argument('--format', choices=['ndjson', 'csv'], help='По умолчанию - по расширению файла')
+        parser.add_argument('--restaurant', type=int, action='append', help='id ресторана (можно несколько раз), по умолчанию - все')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or ('csv' if options['path'].endswith('.csv') else 'ndjson')
+        to_stdout = options['path'] == '-'
+
+        def progress(count):
+            # В stdout идут сами данные
+            (self.stderr if to_stdout else self.stdout).write(f'Записей: {count}')
+
+        try:
+            file = sys.stdout if to_stdout else open(options['path'], 'w', encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(f'Не удалось открыть файл: {error}')
+        try:
+            count = write_records(export_records(options['restaurant']), file, fmt, progress)
+        finally:
+            if not to_stdout:
+                file.close()
+        (self.stderr if to_stdout else self.stdout).write(self.style.SUCCESS(f'Готово, записей: {count}'))
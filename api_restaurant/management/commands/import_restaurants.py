@@ -0,0 +1,41 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api_restaurant.bulkdata import BATCH_SIZE, import_records, read_records
+
+
+class Command(BaseCommand):
+    help = 'Потоковый импорт ресторанов, столиков, слотов и броней из NDJSON/CSV (api_restaurant/bulkdata.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл .ndjson или .csv; - читать из stdin')
+        parser.add_argument('--format', choices=['ndjson', 'csv'], help='По умолчанию - по расширению файла')
+        parser.add_argument('--batch', type=int, default=BATCH_SIZE, help='Записей в одной транзакции')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or ('csv' if options['path'].endswith('.csv') else 'ndjson')
+
+        def progress(counts, errors):
+            self.stdout.write(', '.join(f'{kind}: {count}' for kind, count in counts.items()) + f', ошибок: {errors}')
+
+        from_stdin = options['path'] == '-'
+        try:
+            file = sys.stdin if from_stdin else open(options['path'], encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(f'Не удалось открыть файл: {error}')
+        try:
+            importer = import_records(read_records(file, fmt), options['batch'], progress)
+        finally:
+            if not from_stdin:
+                file.close()
+
+        for message in importer.errors:
+            self.stderr.write(message)
+        if importer.error_count > len(importer.errors):
+            self.stderr.write(f'... и ещё ошибок: {importer.error_count - len(importer.errors)}')
+        created = sum(importer.counts.values())
+        if importer.error_count:
+            self.stdout.write(self.style.WARNING(f'Импортировано записей: {created}, пропущено с ошибками: {importer.error_count}'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Готово, импортировано записей: {created}'))
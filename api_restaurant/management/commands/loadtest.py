@@ -0,0 +1,87 @@
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api_restaurant.perfsuite import percentile
+
+
+def run_load(url, concurrency, duration):
+    """Гоняет GET url из concurrency потоков duration секунд, по keep-alive соединению на поток."""
+    parts = urlsplit(url)
+    if parts.scheme != 'http':
+        raise CommandError(f'Поддерживается только http: {url}')
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        local, failed = [], 0
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 400:
+                    failed += 1
+                    continue
+            except (OSError, http.client.HTTPException):
+                failed += 1
+                connection.close()
+                connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+                continue
+            local.append(time.perf_counter() - started)
+        connection.close()
+        with lock:
+            latencies.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'rps': len(latencies) / elapsed,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'mean': (statistics.fmean(latencies) if latencies else 0.0) * 1000,
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон GET-эндпоинтов запущенного сервера: запросы/с и p50/p99. '
+        'Например, сравнить WSGI и ASGI:\n'
+        '  gunicorn project.wsgi -b 127.0.0.1:8000 -w 4\n'
+        '  uvicorn project.asgi:application --port 8001 --workers 4\n'
+        '  python manage.py loadtest http://127.0.0.1:8000/api/timeslots/available/ '
+        'http://127.0.0.1:8001/api/async/timeslots/available/'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10.0, help='Секунд на каждый URL')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'url':<60} {'req':>7} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+        for url in options['urls']:
+            result = run_load(url, options['concurrency'], options['duration'])
+            self.stdout.write(
+                f"{url:<60} {result['requests']:>7} {result['errors']:>5} {result['rps']:>8.0f} "
+                f"{result['p50']:>8.1f} {result['p99']:>8.1f}"
+            )
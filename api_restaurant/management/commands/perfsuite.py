@@ -0,0 +1,141 @@
+import json
+import os
+import socket
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import modify_settings
+from django.test.testcases import LiveServerThread, _StaticFilesHandler
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api_restaurant import perfsuite
+
+
+class NoDelayLiveServerThread(LiveServerThread):
+    """
+    Сервер пишет заголовки и тело ответа отдельными send: без TCP_NODELAY каждый
+    keep-alive запрос ждёт отложенного ACK (~40 мс) и замеры показывают его, а не API.
+    Принятые соединения наследуют опцию от слушающего сокета.
+    """
+
+    def _create_server(self, connections_override=None):
+        server = super()._create_server(connections_override)
+        server.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return server
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный набор на временной тестовой БД: синтетические данные, прогон смеси запросов '
+        '(в процессе или по HTTP), p50/p90/p99 и запросы/с по эндпоинтам, сравнение с базовой линией.\n'
+        '  python manage.py perfsuite --save-baseline perf-baseline.json\n'
+        '  python manage.py perfsuite --baseline perf-baseline.json   # код выхода 1 при регрессии'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=5)
+        parser.add_argument('--tables', type=int, default=8, help='Столиков в ресторане')
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--slots-per-day', type=int, default=6)
+        parser.add_argument('--booked', type=float, default=0.3, help='Доля забронированных слотов')
+        parser.add_argument('--requests', type=int, default=1000, help='Размер синтетической смеси')
+        parser.add_argument('--mix', help='Прогнать смесь из JSONL-файла вместо синтетической')
+        parser.add_argument('--save-mix', help='Сохранить синтетическую смесь в JSONL')
+        parser.add_argument('--http', action='store_true', help='Прогон по HTTP через локальный сервер')
+        parser.add_argument('--concurrency', type=int, default=8, help='Потоков для --http')
+        parser.add_argument(
+            '--database-file',
+            help='Тестовая БД SQLite в этом файле, а не в памяти (для --http - временный файл по умолчанию)',
+        )
+        parser.add_argument('--save-baseline', help='Сохранить результаты как базовую линию (JSON)')
+        parser.add_argument('--baseline', help='Сравнить с базовой линией (JSON)')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Допустимое ухудшение, доля')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            database_file = options['database_file']
+            if options['http'] and not database_file and connection.vendor == 'sqlite':
+                # БД в памяти видна серверу только через одно общее соединение, а его
+                # потоки сервера не могут использовать параллельно (см. replay_http)
+                database_file = os.path.join(directory, 'perfsuite.sqlite3')
+            setup_test_environment()
+            old_name = connection.settings_dict['NAME']
+            if database_file:
+                connection.settings_dict['TEST']['NAME'] = database_file
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                report = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+                teardown_test_environment()
+
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(f"Базовая линия сохранена: {options['save_baseline']}")
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                regressions = perfsuite.compare(report, json.load(file), options['tolerance'])
+            if regressions:
+                raise CommandError('Регрессии:\n  ' + '\n  '.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def run(self, options):
+        dataset = perfsuite.generate_dataset(
+            options['restaurants'], options['tables'], options['days'],
+            options['slots_per_day'], options['booked'],
+        )
+        self.stdout.write(
+            f"Данные: {len(dataset['restaurants'])} ресторанов, {dataset['slots']} слотов, "
+            f"{dataset['bookings']} броней"
+        )
+        if options['mix']:
+            mix = perfsuite.load_mix(options['mix'])
+        else:
+            mix = perfsuite.synthetic_mix(dataset, options['requests'])
+            if options['save_mix']:
+                perfsuite.save_mix(mix, options['save_mix'])
+
+        if options['http']:
+            results, elapsed = self.replay_http(mix, options['concurrency'])
+        else:
+            results, elapsed = perfsuite.replay_inprocess(mix)
+
+        report = perfsuite.summarize(results, elapsed)
+        self.stdout.write(
+            f"{'endpoint':<20} {'req':>6} {'err':>5} {'req/s':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8}"
+        )
+        for name, row in report.items():
+            self.stdout.write(
+                f"{name:<20} {row['requests']:>6} {row['errors']:>5} {row['rps']:>8.1f} "
+                f"{row['p50']:>8.2f} {row['p90']:>8.2f} {row['p99']:>8.2f}"
+            )
+        return report
+
+    def replay_http(self, mix, concurrency):
+        # Как LiveServerTestCase: SQLite в памяти видна серверу только через общее соединение
+        shared = {
+            alias: conn for alias, conn in ((conn.alias, conn) for conn in connections.all())
+            if conn.vendor == 'sqlite' and conn.is_in_memory_db()
+        }
+        if shared and concurrency > 1:
+            # Одно соединение на все потоки: запросы виснут или падают на savepoint
+            raise CommandError(
+                f"SQLite в памяти ({', '.join(shared)}) с --http работает только с --concurrency 1"
+            )
+        for conn in shared.values():
+            conn.inc_thread_sharing()
+        server = NoDelayLiveServerThread('127.0.0.1', _StaticFilesHandler, connections_override=shared)
+        server.daemon = True
+        server.start()
+        server.is_ready.wait()
+        if server.error:
+            raise server.error
+        try:
+            with modify_settings(ALLOWED_HOSTS={'append': '127.0.0.1'}):
+                return perfsuite.replay_http(mix, f'http://127.0.0.1:{server.port}', concurrency)
+        finally:
+            server.terminate()
+            for conn in shared.values():
+                conn.dec_thread_sharing()
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api_restaurant.search import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Пересоздать поисковые документы ресторанов и столиков (api_restaurant/search.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=1000, help='Документов за одну вставку')
+
+    def handle(self, *args, **options):
+        count = rebuild(options['batch'])
+        self.stdout.write(self.style.SUCCESS(f'Готово, документов: {count}'))
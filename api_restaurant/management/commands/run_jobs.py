@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api_restaurant.jobs import default_worker_name, jobs_settings, work
+
+
+class Command(BaseCommand):
+    help = 'Воркер фоновых задач (api_restaurant/jobs.py): выполняет задачи из очереди в БД'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Выполнить готовые задачи и выйти')
+        parser.add_argument('--poll', type=float, help='Пауза между проходами, секунд (по умолчанию POLL_INTERVAL)')
+        parser.add_argument('--worker', help='Имя воркера в Job.locked_by (по умолчанию host:pid)')
+
+    def handle(self, *args, **options):
+        worker = options['worker'] or default_worker_name()
+        poll = options['poll'] if options['poll'] is not None else jobs_settings()['POLL_INTERVAL']
+        while True:
+            processed = work(worker)
+            if processed or options['once']:
+                self.stdout.write(f'{worker}: выполнено задач: {processed}')
+            if options['once']:
+                return
+            if not processed:
+                time.sleep(poll)
@@ -0,0 +1,34 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+
+class Command(BaseCommand):
+    help = (
+        'Скопировать основную SQLite-БД в файлы реплик (backup API SQLite). '
+        'Для локальной проверки чтения с реплик: DB_REPLICAS=/tmp/replica.sqlite3'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', help='Файлы реплик (по умолчанию - NAME реплик из DB_REPLICAS)')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда только для SQLite; у PostgreSQL реплики обновляет сам сервер')
+
+        targets = options['targets'] or [
+            str(connections[alias].settings_dict['NAME']) for alias in settings.DATABASE_REPLICAS
+        ]
+        if not targets:
+            raise CommandError('Реплики не настроены: укажите файлы или задайте DB_REPLICAS')
+
+        connection.ensure_connection()
+        for target in targets:
+            replica = sqlite3.connect(target)
+            try:
+                connection.connection.backup(replica)
+            finally:
+                replica.close()
+            self.stdout.write(f'{target}: обновлена')
@@ -0,0 +1,144 @@
+import gzip
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'primary_pin'
+
+COMPRESSION_DEFAULTS = {
+    'ENABLED': True,
+    # Меньше этого (байт) не сжимается: выигрыш меньше заголовков и времени на сжатие
+    'MIN_SIZE': 1024,
+    # По предпочтению сервера; br - только если установлен пакет brotli
+    'ENCODINGS': ('br', 'gzip'),
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 5,
+    'CONTENT_TYPES': ('application/json', 'application/x-ndjson', 'text/csv', 'application/vnd.oai.openapi',
+                      'application/vnd.oai.openapi+json'),
+}
+
+
+class SyncAndAsyncMiddleware:
+    """
+    Основа middleware, которые только обрабатывают готовый ответ (process_response).
+    Под ASGI цепочка остаётся асинхронной: без async_capable Django оборачивает
+    middleware в sync_to_async, и каждый запрос (async-вьюхи, long-poll, SSE)
+    уходит в поток. В отличие от MiddlewareMixin, process_response вызывается
+    прямо в event loop - он не ходит в БД и не блокирует.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        raise NotImplementedError
+
+
+class PrimaryPinMiddleware(SyncAndAsyncMiddleware):
+    """
+    После изменяющего запроса закрепляет клиента за основной БД на REPLICA_PIN_SECONDS
+    секунд (cookie), чтобы он сразу видел свою запись, даже если реплика отстаёт.
+    Cookie читает ReplicaReadMixin (routers.py).
+    """
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS:
+            pin_seconds = getattr(settings, 'REPLICA_PIN_SECONDS', 5)
+            response.set_cookie(PIN_COOKIE, '1', max_age=pin_seconds, httponly=True, samesite='Lax')
+        return response
+
+
+def compression_settings():
+    return {**COMPRESSION_DEFAULTS, **getattr(settings, 'API_COMPRESSION', {})}
+
+
+def accepted_encodings(header):
+    """Кодировка -> q из Accept-Encoding."""
+    qualities = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip().lower()] = quality
+    return qualities
+
+
+class CompressionMiddleware(SyncAndAsyncMiddleware):
+    """
+    Сжатие ответов API по Accept-Encoding: brotli (пакет brotli из requirements.txt;
+    без него - только gzip) или gzip. Сжимаются только типы из API_COMPRESSION['CONTENT_TYPES'] - JSON, NDJSON,
+    CSV, схема; Server-Sent Events и HTML - нет. Обычные ответы - от MIN_SIZE байт
+    и только если сжатое короче, потоковые (выгрузки) - gzip по мере отдачи.
+    Сильный ETag становится слабым, как в GZipMiddleware Django: 304 по нему
+    работает (caching.py сравнивает вхождение).
+    """
+
+    def process_response(self, request, response):
+        config = compression_settings()
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if (
+            not config['ENABLED'] or response.has_header('Content-Encoding')
+            or content_type not in config['CONTENT_TYPES']
+        ):
+            return response
+        if response.streaming and getattr(response, 'is_async', False):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        qualities = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+        encodings = [
+            coding for coding in config['ENCODINGS']
+            if qualities.get(coding, qualities.get('*', 0)) > 0 and (coding != 'br' or brotli is not None)
+        ]
+        if response.streaming:
+            # Потоком - только gzip
+            if 'gzip' not in encodings:
+                return response
+            response.streaming_content = compress_sequence(response.streaming_content)
+            del response.headers['Content-Length']
+            encoding = 'gzip'
+        else:
+            if not encodings or len(response.content) < config['MIN_SIZE']:
+                return response
+            encoding = encodings[0]
+            if encoding == 'br':
+                compressed = brotli.compress(response.content, quality=config['BROTLI_QUALITY'])
+            else:
+                compressed = gzip.compress(response.content, compresslevel=config['GZIP_LEVEL'], mtime=0)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-17 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_restaurant', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='timeslot',
+            index=models.Index(fields=['table', 'status', 'start_time', 'end_time'], name='timeslot_table_status_time'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2 on 2026-10-17 19:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_restaurant', '0002_timeslot_table_status_time'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TableAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('free_slots', models.PositiveIntegerField()),
+                ('earliest_free_start', models.DateTimeField()),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api_restaurant.restaurant')),
+                ('table', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability', to='api_restaurant.table')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['restaurant', 'date'], name='availability_restaurant_date'), models.Index(fields=['date'], name='availability_date')],
+                'unique_together': {('table', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2 on 2026-10-17 20:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_restaurant', '0005_background_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlotChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timeslot_id', models.BigIntegerField(blank=True, null=True)),
+                ('kind', models.CharField(choices=[('saved', 'Saved'), ('deleted', 'Deleted'), ('reset', 'Reset')], max_length=10)),
+                ('date', models.DateField()),
+                ('start_time', models.DateTimeField(blank=True, null=True)),
+                ('end_time', models.DateTimeField(blank=True, null=True)),
+                ('status', models.CharField(blank=True, choices=[('reserved', 'Reserved'), ('free', 'Free')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('table', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api_restaurant.table')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='slotchange_created_at')],
+            },
+        ),
+    ]
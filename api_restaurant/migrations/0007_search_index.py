@@ -0,0 +1,93 @@
+# Generated by Django 5.2 on 2026-10-17 20:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+SQLITE_INDEX = [
+    # external content: текст хранится только в api_restaurant_searchentry,
+    # FTS5 держит индекс и обновляется триггерами
+    "CREATE VIRTUAL TABLE api_restaurant_searchentry_fts USING fts5("
+    "text, content='api_restaurant_searchentry', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE VIRTUAL TABLE api_restaurant_searchentry_vocab USING fts5vocab(api_restaurant_searchentry_fts, 'row')",
+    "CREATE TRIGGER api_restaurant_searchentry_ai AFTER INSERT ON api_restaurant_searchentry BEGIN "
+    "INSERT INTO api_restaurant_searchentry_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER api_restaurant_searchentry_ad AFTER DELETE ON api_restaurant_searchentry BEGIN "
+    "INSERT INTO api_restaurant_searchentry_fts(api_restaurant_searchentry_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER api_restaurant_searchentry_au AFTER UPDATE ON api_restaurant_searchentry BEGIN "
+    "INSERT INTO api_restaurant_searchentry_fts(api_restaurant_searchentry_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "INSERT INTO api_restaurant_searchentry_fts(rowid, text) VALUES (new.id, new.text); END",
+]
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS api_restaurant_searchentry_ai",
+    "DROP TRIGGER IF EXISTS api_restaurant_searchentry_ad",
+    "DROP TRIGGER IF EXISTS api_restaurant_searchentry_au",
+    "DROP TABLE IF EXISTS api_restaurant_searchentry_vocab",
+    "DROP TABLE IF EXISTS api_restaurant_searchentry_fts",
+]
+
+POSTGRES_INDEX = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX api_restaurant_searchentry_tsv ON api_restaurant_searchentry "
+    "USING gin (to_tsvector('simple', text))",
+    "CREATE INDEX api_restaurant_searchentry_trgm ON api_restaurant_searchentry "
+    "USING gin (text gin_trgm_ops)",
+]
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS api_restaurant_searchentry_tsv",
+    "DROP INDEX IF EXISTS api_restaurant_searchentry_trgm",
+]
+
+
+def _execute(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def create_index(apps, schema_editor):
+    _execute(schema_editor, {'sqlite': SQLITE_INDEX, 'postgresql': POSTGRES_INDEX})
+
+    # Документы для уже существующих ресторанов и столиков
+    Restaurant = apps.get_model('api_restaurant', 'Restaurant')
+    Table = apps.get_model('api_restaurant', 'Table')
+    SearchEntry = apps.get_model('api_restaurant', 'SearchEntry')
+    db = schema_editor.connection.alias
+    SearchEntry.objects.using(db).bulk_create([
+        SearchEntry(kind='restaurant', object_id=pk, restaurant_id=pk, text=f'{name} {address}')
+        for pk, name, address in Restaurant.objects.using(db).values_list('pk', 'name', 'address').iterator()
+    ], batch_size=1000)
+    SearchEntry.objects.using(db).bulk_create([
+        SearchEntry(kind='table', object_id=pk, restaurant_id=restaurant_id, text=f'{number} {name}')
+        for pk, restaurant_id, number, name in Table.objects.using(db)
+        .values_list('pk', 'restaurant_id', 'table_number', 'restaurant__name').iterator()
+    ], batch_size=1000)
+
+
+def drop_index(apps, schema_editor):
+    _execute(schema_editor, {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_restaurant', '0006_slot_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('restaurant', 'Restaurant'), ('table', 'Table')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('text', models.TextField()),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api_restaurant.restaurant')),
+            ],
+            options={
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 21:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api_restaurant', '0007_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='claims_valid_after',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -2,10 +2,16 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from django.db import router, transaction
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from .availability import reserved_overlap_exists
 
 # Пользователь
 class User(AbstractUser):
-    pass
+    # Клеймы токенов, выданных раньше, устарели (authentication.invalidate_user)
+    claims_valid_after = models.DateTimeField(null=True, blank=True, editable=False)
 
 # Ресторан
 class Restaurant(models.Model):
@@ -38,6 +44,14 @@ class TimeSlot(models.Model):
     end_time = models.DateTimeField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='free')
 
+    class Meta:
+        indexes = [
+            # Покрывает проверку пересечений и выборку свободных слотов столика
+            models.Index(fields=['table', 'status', 'start_time', 'end_time'], name='timeslot_table_status_time'),
+            # Курсорная пагинация ленты слотов
+            models.Index(fields=['start_time', 'id'], name='timeslot_start_time'),
+        ]
+
     def __str__(self):
         return f"{self.table} - {self.start_time.strftime('%Y-%m-%d %H:%M')} to {self.end_time.strftime('%H:%M')} ({self.status})"
 
@@ -48,12 +62,9 @@ class TimeSlot(models.Model):
 
             # Проверка на пересечение с существующими забронированными слотами
             if self.status == 'free':
-                overlapping = TimeSlot.objects.filter(
-                    table=self.table,
-                    start_time__lt=self.end_time,
-                    end_time__gt=self.start_time,
-                    status='reserved'
-                ).exclude(pk=self.pk).exists()
+                overlapping = reserved_overlap_exists(
+                    self.table_id, self.start_time, self.end_time, exclude_pk=self.pk
+                )
 
                 if overlapping:
                     raise ValidationError("Время недоступно для бронирования")
@@ -62,6 +73,48 @@ class TimeSlot(models.Model):
         self.full_clean()
         super().save(*args, **kwargs)
 
+    def reserve(self):
+        """
+        Атомарно занять слот: UPDATE ... WHERE status='free'.
+        Если слот уже занят (в том числе параллельным запросом) - ValidationError.
+        """
+        updated = TimeSlot.objects.filter(pk=self.pk, status='free').update(status='reserved')
+        if not updated:
+            raise ValidationError("Это время уже забронировано")
+        self.status = 'reserved'
+        self._send_status_saved()
+
+    def release(self):
+        TimeSlot.objects.filter(pk=self.pk).update(status='free')
+        self.status = 'free'
+        self._send_status_saved()
+
+    def _send_status_saved(self):
+        # update() не шлёт сигналов - оповещаем подписчиков (сводка, кэш) сами
+        post_save.send(
+            sender=TimeSlot, instance=self, created=False, update_fields=frozenset(['status']),
+            raw=False, using=self._state.db or 'default'
+        )
+
+# Сводка доступности столика на день; поддерживается сигналами (см. availability.py).
+# Строка есть только для дней, где у столика остались свободные слоты
+class TableAvailability(models.Model):
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='+')
+    table = models.ForeignKey(Table, on_delete=models.CASCADE, related_name='availability')
+    date = models.DateField()
+    free_slots = models.PositiveIntegerField()
+    earliest_free_start = models.DateTimeField()
+
+    class Meta:
+        unique_together = ['table', 'date']
+        indexes = [
+            models.Index(fields=['restaurant', 'date'], name='availability_restaurant_date'),
+            models.Index(fields=['date'], name='availability_date'),
+        ]
+
+    def __str__(self):
+        return f"{self.table_id} {self.date}: {self.free_slots}"
+
 # Бронирование
 class Booking(models.Model):
     user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, related_name='bookings')
@@ -74,19 +127,157 @@ class Booking(models.Model):
 
     class Meta:
         unique_together = ['timeslot']  # Один слот - одно бронирование
+        indexes = [
+            # Курсорная пагинация: вся лента для персонала и брони одного пользователя
+            models.Index(fields=['-created_at'], name='booking_created_at'),
+            models.Index(fields=['user', '-created_at'], name='booking_user_created_at'),
+        ]
 
     def clean(self):
         if self.timeslot.status != 'free':
             raise ValidationError("Это время уже забронировано")
 
     def save(self, *args, **kwargs):
-        if not self.pk:  # Только при создании
-            self.timeslot.status = 'reserved'
-            self.timeslot.save()
-        super().save(*args, **kwargs)
+        if self.pk:
+            return super().save(*args, **kwargs)
+        # При создании слот занимается и бронь вставляется в одной транзакции
+        with transaction.atomic(savepoint=False):
+            self.timeslot.reserve()
+            super().save(*args, **kwargs)
 
     def delete(self, *args, **kwargs):
         # Освобождаем слот при удалении брони
-        self.timeslot.status = 'free'
-        self.timeslot.save()
-        super().delete(*args, **kwargs)
\ No newline at end of file
+        with transaction.atomic(savepoint=False):
+            self.timeslot.release()
+            return super().delete(*args, **kwargs)
+
+
+# Часы работы ресторана по дням недели - по ним фоновая задача генерирует слоты наперёд (schedule.py)
+class RestaurantSchedule(models.Model):
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    ]
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='schedules')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    opens_at = models.TimeField()
+    closes_at = models.TimeField()
+    slot_minutes = models.PositiveIntegerField(default=60)
+
+    class Meta:
+        unique_together = ['restaurant', 'weekday']
+
+    def __str__(self):
+        return f"{self.restaurant.name}: {self.get_weekday_display()} {self.opens_at}-{self.closes_at}"
+
+    def clean(self):
+        if self.opens_at and self.closes_at and self.opens_at >= self.closes_at:
+            raise ValidationError("closes_at должно быть после opens_at")
+
+# Прошедшие слоты, перенесённые из TimeSlot фоновой задачей (jobs.py)
+class TimeSlotHistory(models.Model):
+    slot_id = models.BigIntegerField()  # id слота в TimeSlot до переноса
+    table = models.ForeignKey(Table, on_delete=models.CASCADE, related_name='+')
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=TimeSlot.STATUS_CHOICES)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['table', 'start_time'], name='timeslot_history_table_start'),
+        ]
+
+    def __str__(self):
+        return f"{self.table_id} - {self.start_time.strftime('%Y-%m-%d %H:%M')} ({self.status})"
+
+# Фоновая задача. Очередь живёт в БД, брокер не нужен (jobs.py, manage.py run_jobs)
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Выборка следующей задачи: WHERE status='queued' AND run_at <= now ORDER BY run_at
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at'),
+            models.Index(fields=['name', 'status'], name='job_name_status'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+# Журнал изменений слотов для ленты изменений (changefeed.py). id растёт монотонно
+# и служит курсором подписчика
+class SlotChange(models.Model):
+    KIND_CHOICES = [
+        ('saved', 'Saved'),      # слот создан или изменён, в строке - его новое состояние
+        ('deleted', 'Deleted'),  # слот удалён (или перенесён на другой день)
+        ('reset', 'Reset'),      # день столика изменён массово - перечитать его целиком
+    ]
+    table = models.ForeignKey(Table, on_delete=models.CASCADE, related_name='+')
+    timeslot_id = models.BigIntegerField(null=True, blank=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    date = models.DateField()
+    start_time = models.DateTimeField(null=True, blank=True)
+    end_time = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=TimeSlot.STATUS_CHOICES, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='slotchange_created_at'),
+        ]
+
+    def __str__(self):
+        return f"#{self.pk} {self.kind} {self.table_id} {self.date}"
+
+# Поисковый документ ресторана или столика (search.py). Над text построен
+# полнотекстовый индекс: FTS5 на SQLite, tsvector + триграммы на PostgreSQL
+class SearchEntry(models.Model):
+    KIND_CHOICES = [
+        ('restaurant', 'Restaurant'),
+        ('table', 'Table'),
+    ]
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='+')
+    text = models.TextField()
+
+    class Meta:
+        unique_together = ['kind', 'object_id']
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.text}"
+
+# Массовое удаление для фоновых задач и действий админки
+def raw_delete(queryset):
+    """
+    Удалить выборку одним DELETE, не загружая строки: QuerySet.delete() сначала
+    читает все объекты (и связанные - ради каскадов и pre/post_delete).
+    Ни сигналов, ни каскадов: зависимые строки вызывающий удаляет сам, а сводку,
+    ленту изменений и кэш обновляет через timeslots_bulk_changed.
+    Возвращает число удалённых строк.
+    """
+    # queryset.db для выборки без using() - БД чтения, а удаляем в БД записи
+    return queryset.order_by()._raw_delete(queryset._db or router.db_for_write(queryset.model))
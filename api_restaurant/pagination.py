@@ -0,0 +1,37 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Курсорная (keyset) пагинация: WHERE поле > последнее_значение ORDER BY поле LIMIT n.
+    Нет COUNT(*) и OFFSET, поэтому глубокие страницы стоят столько же, сколько первая.
+    Поле сортировки должно быть покрыто индексом.
+    К сортировке всегда добавляется id в том же направлении: курсор хранит только
+    первое поле и смещение среди равных значений, и без id строки с одинаковым
+    значением идут в произвольном порядке - на границе страниц они дублируются
+    или теряются. Индекс (поле, id) покрывает такую сортировку целиком.
+    Поле должно быть полем или аннотацией самой строки: пути через __ курсор
+    не читает (getattr), их надо аннотировать во вьюсете.
+    """
+    page_size = settings.REST_FRAMEWORK.get('PAGE_SIZE', 10)
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering[-1].lstrip('-') in ('id', 'pk'):
+            return ordering
+        return ordering + ('-id' if ordering[0].startswith('-') else 'id',)
+
+
+class TimeSlotPagination(KeysetPagination):
+    ordering = 'start_time'
+
+
+class BookingPagination(KeysetPagination):
+    ordering = '-created_at'
+
+
+class TablePagination(KeysetPagination):
+    ordering = 'table_number'
@@ -0,0 +1,260 @@
+"""
+Нагрузочный набор: синтетические данные, смесь запросов, прогон и сравнение с базовой линией.
+Запуск: python manage.py perfsuite (см. management/commands/perfsuite.py).
+
+  generate_dataset  - N ресторанов по M столиков и слоты на days дней вперёд,
+                      доля booked из них забронирована (Booking + сводка TableAvailability);
+  synthetic_mix     - смесь запросов к api/ по весам MIX_WEIGHTS; смесь можно сохранить
+                      в JSONL (save_mix) и потом прогонять её же (load_mix), в том числе
+                      записанную вручную;
+  replay_inprocess  - прогон через тестовый клиент, без сети (брони создаются
+                      по-настоящему, поэтому смесь прогоняется один раз);
+  replay_http       - прогон по HTTP против локального сервера, по keep-alive
+                      соединению на поток;
+  summarize         - запросы/с и p50/p90/p99 по каждому эндпоинту;
+  compare           - регрессии относительно сохранённой базовой линии.
+
+Строка смеси: {"name": "timeslot-available", "method": "GET", "path": "/api/...",
+"auth": null | "user" | "booker" | "staff", "body": {...}}.
+"""
+import http.client
+import json
+import random
+import threading
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+MIX_WEIGHTS = {
+    'restaurant-list': 15,
+    'table-available': 15,
+    'timeslot-available': 30,
+    'timeslot-grid': 15,
+    'booking-list': 15,
+    'booking-create': 10,
+}
+
+PERCENTILES = (('p50', 0.50), ('p90', 0.90), ('p99', 0.99))
+
+
+def percentile(sorted_values, share):
+    """Перцентиль по ближайшему рангу из отсортированных значений; общий для perfsuite и loadtest."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(share * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def generate_dataset(restaurants=5, tables=8, days=365, slots_per_day=6, booked=0.3, users=20, seed=1):
+    """Синтетические данные в обход сигналов (bulk_create), сводка обновляется в конце."""
+    from .availability import day_bounds, refresh_table_days
+    from .caching import get_cache
+    from .models import Booking, Restaurant, Table, TimeSlot, User
+
+    rng = random.Random(seed)
+    people = User.objects.bulk_create([User(username=f'perf-user{i}') for i in range(users)])
+    User.objects.create(username='perf-staff', is_staff=True)
+    # Бронирует в смеси: своих броней нет, пересечений по времени не будет
+    User.objects.create(username='perf-booker')
+    Restaurant.objects.bulk_create([
+        Restaurant(name=f'Perf {i}', address=f'Street {i}') for i in range(restaurants)
+    ])
+    restaurant_ids = list(Restaurant.objects.filter(name__startswith='Perf ').values_list('pk', flat=True))
+    Table.objects.bulk_create([
+        Table(restaurant_id=restaurant_id, table_number=str(number + 1), capacity=2 + number % 6)
+        for restaurant_id in restaurant_ids for number in range(tables)
+    ])
+    table_ids = list(Table.objects.filter(restaurant_id__in=restaurant_ids).values_list('pk', flat=True))
+
+    first_day = timezone.localdate() + timedelta(days=1)
+    opens = day_bounds(first_day)[0] + timedelta(hours=12)
+    slots = []
+    for table_id in table_ids:
+        for day in range(days):
+            for i in range(slots_per_day):
+                start = opens + timedelta(days=day, hours=i)
+                status = 'reserved' if rng.random() < booked else 'free'
+                slots.append(TimeSlot(table_id=table_id, start_time=start, end_time=start + timedelta(hours=1), status=status))
+                if len(slots) >= 5000:
+                    TimeSlot.objects.bulk_create(slots)
+                    slots = []
+    TimeSlot.objects.bulk_create(slots)
+
+    reserved = TimeSlot.objects.filter(table_id__in=table_ids, status='reserved').values_list('pk', 'table_id').iterator()
+    bookings = []
+    for number, (slot_id, table_id) in enumerate(reserved):
+        bookings.append(Booking(user=people[number % users], table_id=table_id, timeslot_id=slot_id))
+        if len(bookings) >= 5000:
+            Booking.objects.bulk_create(bookings)
+            bookings = []
+    Booking.objects.bulk_create(bookings)
+
+    last_day = first_day + timedelta(days=days - 1)
+    for restaurant_id in restaurant_ids:
+        refresh_table_days(
+            list(Table.objects.filter(restaurant_id=restaurant_id).values_list('pk', flat=True)), first_day, last_day
+        )
+    get_cache().clear()
+    return {
+        'restaurants': restaurant_ids,
+        'first_day': first_day,
+        'days': days,
+        'slots': TimeSlot.objects.filter(table_id__in=table_ids).count(),
+        'bookings': Booking.objects.filter(table_id__in=table_ids).count(),
+    }
+
+
+def synthetic_mix(dataset, size=500, seed=1):
+    """Смесь из size запросов по весам MIX_WEIGHTS к данным из generate_dataset."""
+    from .models import TimeSlot
+
+    rng = random.Random(seed)
+    names = rng.choices(list(MIX_WEIGHTS), weights=list(MIX_WEIGHTS.values()), k=size)
+    # Свободные слоты одного столика идут в разное время - бронирующий не пересечётся сам с собой
+    free_slots = iter(
+        TimeSlot.objects.filter(table__restaurant_id=dataset['restaurants'][0], status='free')
+        .order_by('table_id', 'start_time').values_list('pk', flat=True)[:names.count('booking-create')]
+    )
+
+    mix = []
+    for name in names:
+        restaurant = rng.choice(dataset['restaurants'])
+        date = dataset['first_day'] + timedelta(days=rng.randrange(dataset['days']))
+        entry = {'name': name, 'method': 'GET', 'auth': None, 'body': None}
+        if name == 'restaurant-list':
+            entry['path'] = '/api/restaurants/'
+        elif name == 'table-available':
+            entry['path'] = f'/api/tables/available/?restaurant={restaurant}&date={date}&capacity={rng.randint(2, 6)}'
+        elif name == 'timeslot-available':
+            entry['path'] = f'/api/timeslots/available/?restaurant={restaurant}&date={date}'
+        elif name == 'timeslot-grid':
+            entry['path'] = f'/api/timeslots/available/?layout=grid&restaurant={restaurant}&date={date}'
+        elif name == 'booking-list':
+            entry.update(path='/api/bookings/', auth='user')
+        else:
+            slot_id = next(free_slots, None)
+            if slot_id is None:
+                continue
+            entry.update(method='POST', path='/api/bookings/', auth='booker', body={'timeslot': slot_id})
+        mix.append(entry)
+    return mix
+
+
+def save_mix(mix, path):
+    with open(path, 'w', encoding='utf-8') as file:
+        for entry in mix:
+            file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+def load_mix(path):
+    with open(path, encoding='utf-8') as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def auth_headers():
+    """Заголовки Authorization для значений "auth" в смеси."""
+    from .authentication import ClaimsRefreshToken
+    from .models import User
+
+    headers = {None: {}}
+    for auth, username in (('user', 'perf-user0'), ('booker', 'perf-booker'), ('staff', 'perf-staff')):
+        user = User.objects.filter(username=username).first()
+        if user is not None:
+            headers[auth] = {'Authorization': f'Bearer {ClaimsRefreshToken.for_user(user).access_token}'}
+    return headers
+
+
+def replay_inprocess(mix):
+    """Последовательный прогон смеси. Возвращает ([(эндпоинт, статус, секунды)], общее время)."""
+    from django.test import Client
+
+    client = Client()
+    headers = auth_headers()
+    results = []
+    started = time.perf_counter()
+    for entry in mix:
+        body = json.dumps(entry['body']) if entry['body'] is not None else None
+        request_started = time.perf_counter()
+        response = client.generic(
+            entry['method'], entry['path'], body or '', content_type='application/json',
+            headers=headers.get(entry['auth'], {}),
+        )
+        if getattr(response, 'streaming', False):
+            b''.join(response.streaming_content)
+        results.append((entry['name'], response.status_code, time.perf_counter() - request_started))
+    return results, time.perf_counter() - started
+
+
+def replay_http(mix, base_url, concurrency=8):
+    """Прогон смеси по HTTP: concurrency потоков разбирают её запросы по очереди."""
+    from urllib.parse import urlsplit
+
+    parts = urlsplit(base_url)
+    headers = auth_headers()
+    results = []
+    lock = threading.Lock()
+    entries = iter(mix)
+
+    def worker():
+        local = []
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+        for entry in entries:
+            body = json.dumps(entry['body']) if entry['body'] is not None else None
+            request_headers = {'Content-Type': 'application/json', **headers.get(entry['auth'], {})}
+            request_started = time.perf_counter()
+            try:
+                connection.request(entry['method'], entry['path'], body=body, headers=request_headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                status = 0
+                connection.close()
+                connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+            local.append((entry['name'], status, time.perf_counter() - request_started))
+        connection.close()
+        with lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - started
+
+
+def summarize(results, elapsed):
+    """{эндпоинт: {requests, errors, rps, p50, p90, p99}}, времена в мс; 'total' - по всем."""
+    groups = {}
+    for name, status, seconds in results:
+        groups.setdefault(name, []).append((status, seconds))
+    groups['total'] = [(status, seconds) for _, status, seconds in results]
+
+    report = {}
+    for name, items in sorted(groups.items()):
+        latencies = sorted(seconds for _, seconds in items)
+        report[name] = {
+            'requests': len(items),
+            'errors': sum(1 for status, _ in items if not 200 <= status < 400),
+            'rps': round(len(items) / elapsed, 1),
+            **{key: round(percentile(latencies, share) * 1000, 2) for key, share in PERCENTILES},
+        }
+    return report
+
+
+def compare(report, baseline, tolerance=0.2):
+    """Регрессии: p50/p99 выросли или rps упал больше чем на tolerance."""
+    regressions = []
+    for name, current in report.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key in ('p50', 'p99'):
+            if base[key] and current[key] > base[key] * (1 + tolerance):
+                regressions.append(f'{name}: {key} {base[key]} -> {current[key]} ms')
+        if base['rps'] and current['rps'] < base['rps'] * (1 - tolerance):
+            regressions.append(f"{name}: rps {base['rps']} -> {current['rps']}")
+    return regressions
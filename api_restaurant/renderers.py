@@ -0,0 +1,80 @@
+"""
+Быстрые JSON-рендерер и парсер для DRF на orjson, с откатом на стандартные.
+
+Настройка API_JSON['BACKEND']:
+  'auto'    - orjson, если пакет установлен, иначе стандартный json (по умолчанию);
+  'orjson'  - только orjson (без пакета - ImproperlyConfigured при первом запросе);
+  'stdlib'  - стандартный json, как у JSONRenderer/JSONParser DRF.
+
+Ответ совпадает с JSONRenderer байт в байт: компактные разделители, UTF-8 без
+экранирования, \\u2028/\\u2029 экранируются. Типы, которые orjson не знает
+(Decimal, lazy-строки, ...), отдаются JSONEncoder DRF, даты и время - тоже ему,
+чтобы формат не отличался. Запросы с отступами (?indent, браузерный API) и
+значения, которые orjson не кодирует (целые больше 64 бит), рендерятся стандартно.
+Отличие одно: NaN/Infinity orjson пишет как null, а JSONRenderer падает.
+
+orjson (и brotli для CompressionMiddleware) есть в requirements.txt; при установке
+без них 'auto' молча работает на стандартном json, а сжатие - только gzip.
+"""
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULTS = {
+    'BACKEND': 'auto',
+}
+
+
+def json_settings():
+    return {**DEFAULTS, **getattr(settings, 'API_JSON', {})}
+
+
+def use_orjson():
+    backend = json_settings()['BACKEND']
+    if backend == 'orjson' and orjson is None:
+        raise ImproperlyConfigured("API_JSON['BACKEND'] = 'orjson' требует пакет orjson")
+    return orjson is not None and backend in ('auto', 'orjson')
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            data is None or not use_orjson() or not self.compact or self.ensure_ascii
+            or self.get_indent(accepted_media_type or '', renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(
+                data, default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как JSONRenderer: эти символы допустимы в JSON, но не в JavaScript
+        return content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', settings.DEFAULT_CHARSET)
+        if not use_orjson() or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+def json_response(data, status=200):
+    """Замена JsonResponse для async-вьюх (async_views.py) - тот же рендерер, что у DRF."""
+    return HttpResponse(FastJSONRenderer().render(data), content_type='application/json', status=status)
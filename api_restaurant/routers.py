@@ -0,0 +1,54 @@
+"""
+Маршрутизация чтения на реплики.
+
+ReplicaReadMixin включает чтение с реплики только для безопасных методов
+во вьюсетах, где он подмешан (рестораны, столики, слоты).
+Всё остальное - записи, BookingViewSet, проверки пересечений при создании
+слотов и броней - идёт в 'default'.
+После любого изменяющего запроса клиент на REPLICA_PIN_SECONDS секунд
+закрепляется за основной БД (cookie от PrimaryPinMiddleware), чтобы сразу видеть свою бронь,
+даже если реплика ещё не догнала основную.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .middleware import PIN_COOKIE, SAFE_METHODS
+
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+def replica_reads_enabled():
+    return _read_from_replica.get()
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if replicas and _read_from_replica.get():
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная БД
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
+
+
+class ReplicaReadMixin:
+    """Чтение с реплики на время GET/HEAD/OPTIONS-запроса, если клиент не закреплён за основной БД."""
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES:
+            return super().dispatch(request, *args, **kwargs)
+        token = _read_from_replica.set(True)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_from_replica.reset(token)
@@ -0,0 +1,143 @@
+"""
+Быстрый путь чтения: строки ответа строятся из .values() без ModelSerializer.
+
+Формат совпадает с RestaurantSerializer/TableSerializer/TimeSlotSerializer/BookingSerializer
+поле в поле и после рендеринга байт в байт (проверяется в tests.FastReadPathTests),
+поэтому эти строки можно отдавать там же, где отдаются данные сериализаторов.
+Связанные поля берутся тем же запросом через JOIN, в Python остаётся только
+переименование ключей и форматирование дат. time_slot_display тоже форматируется
+в Python: переносимое выражение Concat/LPad/Extract на SQLite оказалось в разы
+медленнее strftime.
+Выключается настройкой API_FAST_READ_PATH = False.
+"""
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.response import Response
+
+
+def iso_datetime(value):
+    """То же, что DateTimeField.to_representation в DRF: текущая таймзона, ISO 8601, 'Z' для UTC."""
+    if value is None:
+        return None
+    value = value.astimezone(timezone.get_current_timezone()).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+class Computed:
+    """Значение, вычисляемое из нескольких полей строки .values()."""
+
+    def __init__(self, paths, func):
+        self.paths = paths
+        self.func = func
+
+
+class RowSpec:
+    """
+    fields - ключ ответа -> источник: None (одноимённое поле модели), путь к полю
+    ('table__table_number') или Computed.
+    datetimes - ключи, которые форматируются как DateTimeField DRF.
+    Порядок fields - порядок ключей в ответе.
+    """
+
+    def __init__(self, fields, datetimes=()):
+        self.fields = fields
+        self.datetimes = datetimes
+        self._paths = []
+        self._computed = {}
+        # ключ ответа -> ключ в словаре из .values()
+        self._sources = {}
+        for name, source in fields.items():
+            if isinstance(source, Computed):
+                self._computed[name] = source.func
+                self._paths.extend(path for path in source.paths if path not in self._paths)
+            else:
+                self._sources[name] = source or name
+                self._paths.append(source or name)
+
+    def values(self, queryset, extra_paths=()):
+        # extra_paths - например, поле сортировки, нужное курсорной пагинации
+        paths = self._paths + [path for path in extra_paths if path not in self._paths]
+        return queryset.values(*paths)
+
+    def build(self, values):
+        row = {}
+        for name in self.fields:
+            if name in self._computed:
+                row[name] = self._computed[name](values)
+            else:
+                row[name] = values[self._sources[name]]
+        for name in self.datetimes:
+            row[name] = iso_datetime(row[name])
+        return row
+
+    def rows(self, queryset):
+        return [self.build(values) for values in self.values(queryset)]
+
+
+def _time_slot_display(values):
+    # Как BookingSerializer.get_time_slot_display
+    return (
+        f"{values['timeslot__start_time'].strftime('%Y-%m-%d %H:%M')} - "
+        f"{values['timeslot__end_time'].strftime('%H:%M')}"
+    )
+
+
+RESTAURANT_ROW = RowSpec({'id': None, 'name': None, 'address': None})
+
+TABLE_ROW = RowSpec({
+    'id': None,
+    'restaurant_name': 'restaurant__name',
+    'table_number': None,
+    'capacity': None,
+    'restaurant': 'restaurant_id',
+})
+
+TIMESLOT_ROW = RowSpec({
+    'id': None,
+    'table_info': 'table__table_number',
+    'restaurant_name': 'table__restaurant__name',
+    'start_time': None,
+    'end_time': None,
+    'status': None,
+    'table': 'table_id',
+}, datetimes=('start_time', 'end_time'))
+
+BOOKING_ROW = RowSpec({
+    'id': None,
+    'user_name': 'user__username',
+    'table_info': 'table__table_number',
+    'restaurant_name': 'table__restaurant__name',
+    'time_slot_display': Computed(('timeslot__start_time', 'timeslot__end_time'), _time_slot_display),
+    'created_at': None,
+    'user': 'user_id',
+    'table': 'table_id',
+    'timeslot': 'timeslot_id',
+}, datetimes=('created_at',))
+
+
+class FastReadMixin:
+    """
+    list (и действия, вызывающие fast_rows_response) отдают строки read_row
+    вместо serializer_class. Пагинация работает прямо по .values().
+    """
+    read_row = None
+
+    def fast_read_enabled(self):
+        return self.read_row is not None and getattr(settings, 'API_FAST_READ_PATH', True)
+
+    def fast_rows_response(self, queryset):
+        ordering = []
+        if self.paginator is not None and hasattr(self.paginator, 'get_ordering'):
+            ordering = [field.lstrip('-') for field in self.paginator.get_ordering(self.request, queryset, self)]
+        values = self.read_row.values(queryset, ordering)
+        page = self.paginate_queryset(values)
+        if page is not None:
+            return self.get_paginated_response([self.read_row.build(item) for item in page])
+        return Response([self.read_row.build(item) for item in values])
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_read_enabled():
+            return super().list(request, *args, **kwargs)
+        return self.fast_rows_response(self.filter_queryset(self.get_queryset()))
@@ -0,0 +1,88 @@
+"""
+Генерация свободных слотов: ручная (POST /api/timeslots/generate/) и по расписаниям
+ресторанов (RestaurantSchedule) фоновой задачей generate_scheduled_slots (jobs.py).
+"""
+from datetime import datetime, timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .availability import TableIntervals
+from .models import RestaurantSchedule, Table, TimeSlot
+from .signals import timeslots_bulk_changed
+
+
+def day_intervals(day, opens_at, closes_at, slot_minutes):
+    """Интервалы [start, end) по slot_minutes минут с opens_at до closes_at дня day."""
+    step = timedelta(minutes=slot_minutes)
+    start = timezone.make_aware(datetime.combine(day, opens_at))
+    closes = timezone.make_aware(datetime.combine(day, closes_at))
+    while start + step <= closes:
+        yield start, start + step
+        start += step
+
+
+def create_free_slots(table_ids, intervals, date_from, date_to):
+    """
+    Создать свободные слоты столикам по интервалам (отсортированным по началу).
+    Пересекающиеся с существующими (свободными или занятыми) слотами пропускаются,
+    поэтому повторный вызов за тот же период ничего не создаёт.
+    """
+    if not intervals or not table_ids:
+        return {"created": 0, "skipped": 0}
+
+    # Один запрос за всеми существующими слотами в диапазоне
+    existing = {table_id: [] for table_id in table_ids}
+    rows = TimeSlot.objects.filter(
+        table_id__in=table_ids,
+        start_time__lt=intervals[-1][1],
+        end_time__gt=intervals[0][0],
+    ).values_list('table_id', 'start_time', 'end_time', 'pk')
+    for table_id, start, end, pk in rows:
+        existing[table_id].append((start, end, pk))
+
+    new_slots = []
+    skipped = 0
+    for table_id in table_ids:
+        busy = TableIntervals(existing[table_id])
+        for start, end in intervals:
+            if busy.overlaps(start, end):
+                skipped += 1
+            else:
+                new_slots.append(TimeSlot(table_id=table_id, start_time=start, end_time=end, status='free'))
+
+    with transaction.atomic():
+        TimeSlot.objects.bulk_create(new_slots, batch_size=1000)
+        timeslots_bulk_changed.send(
+            sender=TimeSlot, table_ids=table_ids, date_from=date_from, date_to=date_to,
+            timeslots=new_slots,
+        )
+    return {"created": len(new_slots), "skipped": skipped}
+
+
+def generate_from_schedules(date_from, date_to, restaurant_ids=None):
+    """Слоты на дни [date_from, date_to] по расписаниям ресторанов; по ресторану за проход."""
+    schedules = RestaurantSchedule.objects.order_by('restaurant_id', 'weekday')
+    if restaurant_ids is not None:
+        schedules = schedules.filter(restaurant_id__in=restaurant_ids)
+    by_restaurant = {}
+    for schedule in schedules:
+        by_restaurant.setdefault(schedule.restaurant_id, {})[schedule.weekday] = schedule
+
+    tables = {}
+    for table_id, restaurant_id in Table.objects.filter(restaurant_id__in=by_restaurant).values_list('pk', 'restaurant_id'):
+        tables.setdefault(restaurant_id, []).append(table_id)
+
+    total = {"created": 0, "skipped": 0}
+    for restaurant_id, week in by_restaurant.items():
+        intervals = []
+        day = date_from
+        while day <= date_to:
+            schedule = week.get(day.weekday())
+            if schedule is not None:
+                intervals.extend(day_intervals(day, schedule.opens_at, schedule.closes_at, schedule.slot_minutes))
+            day += timedelta(days=1)
+        result = create_free_slots(tables.get(restaurant_id, []), intervals, date_from, date_to)
+        total["created"] += result["created"]
+        total["skipped"] += result["skipped"]
+    return total
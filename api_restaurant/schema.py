@@ -0,0 +1,140 @@
+"""
+Готовая схема OpenAPI вместо разбора всех вьюсетов и сериализаторов на каждый запрос.
+
+SpectacularAPIView строит схему заново на каждый GET /api/schema/, а его часто
+дёргают health-check'и и генераторы клиентов. Здесь схема строится один раз:
+  - manage.py build_schema (шаг деплоя) генерирует её и пишет JSON в API_SCHEMA['PATH'];
+  - при старте приложения (AppConfig.ready) файл читается в память;
+  - PrecomputedSchemaView отдаёт её из памяти: YAML/JSON по тем же правилам
+    согласования, что у SpectacularAPIView, каждый формат рендерится один раз,
+    с ETag и 304 на If-None-Match.
+Если файла нет (разработка), схема генерируется при первом запросе и дальше тоже
+отдаётся из памяти процесса. В файле рядом со схемой лежит отпечаток кода, из
+которого она собрана (fingerprint: модули приложения и URLconf, версии и настройки
+DRF и drf-spectacular). Если код изменился, а build_schema не перезапустили, файл
+не читается: в лог пишется предупреждение, и схема генерируется как без файла.
+Запросы с ?lang= / ?version= и API_SCHEMA['PRECOMPUTED'] = False обслуживаются
+обычным SpectacularAPIView.
+"""
+import hashlib
+import json
+import logging
+import threading
+from importlib import import_module
+from pathlib import Path
+
+import drf_spectacular
+import rest_framework
+from django.apps import apps
+from django.conf import settings
+from django.http import HttpResponse
+from drf_spectacular.renderers import OpenApiJsonRenderer
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+DEFAULTS = {
+    'PRECOMPUTED': True,
+    'PATH': None,  # по умолчанию BASE_DIR / 'openapi-schema.json'
+}
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_state = {'schema': None, 'digest': None, 'rendered': {}}
+
+
+def schema_settings():
+    return {**DEFAULTS, **getattr(settings, 'API_SCHEMA', {})}
+
+
+def schema_path():
+    return Path(schema_settings()['PATH'] or Path(settings.BASE_DIR) / 'openapi-schema.json')
+
+
+def generate():
+    """Схема в байтах JSON - то же, что отдал бы SpectacularAPIView без параметров."""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema = generator.get_schema(request=None, public=spectacular_settings.SERVE_PUBLIC)
+    return OpenApiJsonRenderer().render(schema, renderer_context={})
+
+
+def fingerprint():
+    """Отпечаток того, из чего строится схема: код приложения и URLconf, версии и настройки DRF и drf-spectacular."""
+    digest = hashlib.sha256(repr((
+        rest_framework.VERSION, drf_spectacular.__version__,
+        sorted(getattr(settings, 'REST_FRAMEWORK', {}).items(), key=repr),
+        sorted(getattr(settings, 'SPECTACULAR_SETTINGS', {}).items(), key=repr),
+    )).encode())
+    app_path = Path(apps.get_app_config('api_restaurant').path)
+    files = [path for path in sorted(app_path.rglob('*.py')) if path.name != 'tests.py']
+    files.append(Path(import_module(settings.ROOT_URLCONF).__file__))
+    for path in files:
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:32]
+
+
+def _store(content):
+    _state.update(schema=json.loads(content), digest=hashlib.sha256(content).hexdigest()[:32], rendered={})
+
+
+def build(path=None):
+    """Сгенерировать схему, записать на диск с отпечатком и подменить в памяти. Возвращает (путь, байт)."""
+    path = Path(path or schema_path())
+    content = generate()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'{"fingerprint": "%s", "schema": %s}' % (fingerprint().encode(), content))
+    with _lock:
+        _store(content)
+    return path, len(content)
+
+
+def load(path=None):
+    """Прочитать готовую схему с диска в память; False, если файла нет или он собран из другого кода."""
+    path = Path(path or schema_path())
+    try:
+        data = json.loads(path.read_bytes())
+    except FileNotFoundError:
+        return False
+    if not isinstance(data, dict) or data.get('fingerprint') != fingerprint():
+        logger.warning('Схема %s собрана из другой версии кода, генерируется заново; перезапустите build_schema', path)
+        return False
+    with _lock:
+        _store(OpenApiJsonRenderer().render(data['schema'], renderer_context={}))
+    return True
+
+
+def reset():
+    with _lock:
+        _state.update(schema=None, digest=None, rendered={})
+
+
+def rendered(renderer):
+    """(байты, ETag) схемы в формате renderer; без схемы в памяти - генерация один раз."""
+    with _lock:
+        if _state['schema'] is None:
+            _store(generate())
+        key = renderer.media_type
+        if key not in _state['rendered']:
+            _state['rendered'][key] = renderer.render(_state['schema'], renderer_context={})
+        return _state['rendered'][key], f'"{_state["digest"]}-{renderer.format}"'
+
+
+class PrecomputedSchemaView(SpectacularAPIView):
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        if (
+            not schema_settings()['PRECOMPUTED'] or self.custom_settings or self.api_version
+            or request.GET.get('lang') or request.GET.get('version')
+        ):
+            return super().get(request, *args, **kwargs)
+        renderer = request.accepted_renderer
+        content, etag = rendered(renderer)
+        if etag in request.headers.get('If-None-Match', ''):
+            return HttpResponse(status=304, headers={'ETag': etag})
+        content_type = f'{renderer.media_type}; charset={renderer.charset}' if renderer.charset else renderer.media_type
+        return HttpResponse(content, content_type=content_type, headers={
+            'ETag': etag,
+            'Content-Disposition': f'inline; filename="{self._get_filename(request, None)}"',
+        })
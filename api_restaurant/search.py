@@ -0,0 +1,312 @@
+"""
+Полнотекстовый поиск ресторанов и столиков.
+
+SearchFilter превращает ?search= в LIKE '%слово%' по всей таблице - индекс
+не используется, время растёт с каталогом. Здесь у каждого ресторана и столика
+есть документ SearchEntry (ресторан - название и адрес, столик - номер и название
+ресторана), над которым построен полнотекстовый индекс (см. миграцию 0007):
+  SQLite      - FTS5 (external content, синхронизируется триггерами), ранжирование bm25;
+  PostgreSQL  - GIN по to_tsvector('simple', text) и триграммный GIN (pg_trgm),
+                ранжирование ts_rank / similarity;
+  остальные   - LIKE по SearchEntry, как раньше.
+
+Каждое слово запроса ищется как префикс ("пиц" найдёт "пиццерия"), все слова
+должны встретиться. Ранжируются только запросы, у которых не больше MAX_RESULTS
+совпадений: у широкого запроса ("cafe" на сотнях тысяч ресторанов) ранжирование
+стоило бы столько же, сколько LIKE, поэтому такие совпадения отбираются подзапросом
+к индексу целиком, без ранжирования и без лимита. Если так ничего не нашлось, запрос
+повторяется с исправлением опечаток: на SQLite слова заменяются близкими по написанию словами из словаря
+индекса (fts5vocab), на PostgreSQL - поиск по триграммному сходству.
+
+Документы обновляются сигналами на запись Restaurant/Table (signals.py);
+пересобрать индекс целиком (например, после loaddata - фикстуры сигналами
+не индексируются) - manage.py rebuild_search_index.
+Во вьюсетах индекс подключается фильтром FullTextSearchFilter; при
+SEARCH['ENABLED'] = False фильтр работает как обычный SearchFilter.
+"""
+import difflib
+import re
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, IntegerField, When
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+from rest_framework.settings import api_settings
+
+from .models import Restaurant, SearchEntry, Table
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MAX_RESULTS': 500,
+    'MAX_TERMS': 8,
+    'TYPO_MIN_LENGTH': 4,
+}
+
+FTS_TABLE = 'api_restaurant_searchentry_fts'
+VOCAB_TABLE = 'api_restaurant_searchentry_vocab'
+
+
+def search_settings():
+    return {**DEFAULTS, **getattr(settings, 'SEARCH', {})}
+
+
+def terms(query):
+    return re.findall(r'\w+', query.lower())[:search_settings()['MAX_TERMS']]
+
+
+# --- Документы ---
+
+def restaurant_text(name, address):
+    return f'{name} {address}'
+
+
+def table_text(table_number, restaurant_name):
+    return f'{table_number} {restaurant_name}'
+
+
+def _upsert(entries):
+    SearchEntry.objects.bulk_create(
+        entries, batch_size=1000, update_conflicts=True,
+        unique_fields=['kind', 'object_id'], update_fields=['restaurant', 'text'],
+    )
+
+
+def index_restaurant(restaurant):
+    """Документ ресторана и документы его столиков (в них входит название ресторана)."""
+    entries = [SearchEntry(
+        kind='restaurant', object_id=restaurant.pk, restaurant_id=restaurant.pk,
+        text=restaurant_text(restaurant.name, restaurant.address),
+    )]
+    entries.extend(
+        SearchEntry(kind='table', object_id=pk, restaurant_id=restaurant.pk, text=table_text(number, restaurant.name))
+        for pk, number in Table.objects.filter(restaurant_id=restaurant.pk).values_list('pk', 'table_number')
+    )
+    _upsert(entries)
+
+
+def index_table(table):
+    _upsert([SearchEntry(
+        kind='table', object_id=table.pk, restaurant_id=table.restaurant_id,
+        text=table_text(table.table_number, table.restaurant.name),
+    )])
+
+
+def index_created(restaurants=(), tables=()):
+    """Документы объектов, созданных bulk_create в обход сигналов; у столиков должен быть загружен restaurant."""
+    _upsert([
+        SearchEntry(kind='restaurant', object_id=restaurant.pk, restaurant_id=restaurant.pk,
+                    text=restaurant_text(restaurant.name, restaurant.address))
+        for restaurant in restaurants
+    ] + [
+        SearchEntry(kind='table', object_id=table.pk, restaurant_id=table.restaurant_id,
+                    text=table_text(table.table_number, table.restaurant.name))
+        for table in tables
+    ])
+
+
+def remove_table(table_id):
+    SearchEntry.objects.filter(kind='table', object_id=table_id).delete()
+
+
+def rebuild(batch=1000):
+    """Пересоздать все документы. Возвращает их число."""
+    SearchEntry.objects.all().delete()
+    restaurants = (
+        SearchEntry(kind='restaurant', object_id=pk, restaurant_id=pk, text=restaurant_text(name, address))
+        for pk, name, address in Restaurant.objects.values_list('pk', 'name', 'address').iterator(chunk_size=batch)
+    )
+    tables = (
+        SearchEntry(kind='table', object_id=pk, restaurant_id=restaurant_id, text=table_text(number, name))
+        for pk, restaurant_id, number, name in Table.objects.values_list(
+            'pk', 'restaurant_id', 'table_number', 'restaurant__name'
+        ).iterator(chunk_size=batch)
+    )
+    count = 0
+    for entries in (restaurants, tables):
+        while True:
+            chunk = list(islice(entries, batch))
+            if not chunk:
+                break
+            SearchEntry.objects.bulk_create(chunk)
+            count += len(chunk)
+    return count
+
+
+# --- Поиск ---
+
+class Matches:
+    """
+    Совпадения запроса: sql/params выбирают object_id всех совпадений (без лимита),
+    order_by - ранжирование (ORDER BY ... и его параметры).
+    """
+
+    def __init__(self, connection, sql, params, order_by, order_params=()):
+        self.connection = connection
+        self.sql = sql
+        self.params = list(params)
+        self.order_by = order_by
+        self.order_params = list(order_params)
+
+    def _ids(self, sql, params):
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def ranked(self, limit):
+        """id по убыванию релевантности или None, если совпадений больше limit (ранжировать дорого)."""
+        ids = self._ids(self.sql + ' LIMIT %s', self.params + [limit + 1])
+        if len(ids) > limit:
+            return None
+        if len(ids) < 2:
+            return ids
+        return self._ids(f'{self.sql} {self.order_by} LIMIT %s', self.params + self.order_params + [limit])
+
+    def first(self, limit):
+        return self._ids(self.sql + ' LIMIT %s', self.params + [limit])
+
+    def subquery(self):
+        """Все совпадения для queryset.filter(pk__in=...) - без лимита и без ранжирования."""
+        return RawSQL(self.sql, self.params)
+
+
+class SQLiteBackend:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def _sql(self, groups, kind):
+        # groups - на каждое слово запроса список вариантов; внутри группы OR, между группами AND
+        match = ' AND '.join(
+            '(' + ' OR '.join(f'"{variant}"*' for variant in group) + ')' for group in groups
+        )
+        # CROSS JOIN фиксирует порядок: сначала индекс FTS, потом документы по rowid
+        sql = (
+            f'SELECT e.object_id FROM {FTS_TABLE} f '
+            f'CROSS JOIN api_restaurant_searchentry e ON e.id = f.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s AND e.kind = %s'
+        )
+        return sql, [match, kind]
+
+    def _exists(self, groups, kind):
+        sql, params = self._sql(groups, kind)
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql + ' LIMIT 1', params)
+            return cursor.fetchone() is not None
+
+    def _corrections(self, term):
+        # Кандидаты - слова словаря на ту же букву и близкой длины
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT term FROM {VOCAB_TABLE} WHERE term >= %s AND term < %s '
+                f'AND length(term) BETWEEN %s AND %s',
+                [term[0], chr(ord(term[0]) + 1), len(term) - 2, len(term) + 2],
+            )
+            vocabulary = [row[0] for row in cursor.fetchall()]
+        return difflib.get_close_matches(term, vocabulary, n=3, cutoff=0.75)
+
+    def matches(self, kind, words):
+        groups = [[word] for word in words]
+        if not self._exists(groups, kind):
+            min_length = search_settings()['TYPO_MIN_LENGTH']
+            groups = [
+                [word] + (self._corrections(word) if len(word) >= min_length else [])
+                for word in words
+            ]
+            if all(len(group) == 1 for group in groups):
+                return None
+        sql, params = self._sql(groups, kind)
+        return Matches(self.connection, sql, params, f'ORDER BY bm25({FTS_TABLE})')
+
+
+class PostgresBackend:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def matches(self, kind, words):
+        tsquery = ' & '.join(f"{word}:*" for word in words)
+        sql = (
+            "SELECT object_id FROM api_restaurant_searchentry "
+            "WHERE kind = %s AND to_tsvector('simple', text) @@ to_tsquery('simple', %s)"
+        )
+        with self.connection.cursor() as cursor:
+            cursor.execute(sql + " LIMIT 1", [kind, tsquery])
+            found = cursor.fetchone() is not None
+        if found:
+            return Matches(
+                self.connection, sql, [kind, tsquery],
+                "ORDER BY ts_rank(to_tsvector('simple', text), to_tsquery('simple', %s)) DESC, id", [tsquery],
+            )
+        # Опечатки: триграммное сходство (оператор % использует индекс gin_trgm_ops)
+        query = ' '.join(words)
+        return Matches(
+            self.connection,
+            "SELECT object_id FROM api_restaurant_searchentry WHERE kind = %s AND text %% %s", [kind, query],
+            "ORDER BY similarity(text, %s) DESC, id", [query],
+        )
+
+
+class LikeBackend:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def matches(self, kind, words):
+        queryset = SearchEntry.objects.using(self.connection.alias).filter(kind=kind)
+        for word in words:
+            queryset = queryset.filter(text__icontains=word)
+        sql, params = queryset.order_by().values('object_id').query.get_compiler(self.connection.alias).as_sql()
+        return Matches(self.connection, sql, params, 'ORDER BY 1')
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend,
+    'postgresql': PostgresBackend,
+}
+
+
+def matching(kind, query, using=None):
+    """Совпадения ресторанов или столиков (kind) с запросом (Matches) или None, если совпадений нет."""
+    words = terms(query)
+    if not words:
+        return None
+    connection = connections[using or SearchEntry.objects.db]
+    return BACKENDS.get(connection.vendor, LikeBackend)(connection).matches(kind, words)
+
+
+def search(kind, query, using=None, limit=None):
+    """
+    Первые limit (MAX_RESULTS) id ресторанов или столиков по убыванию релевантности;
+    если совпадений больше limit - первые limit без ранжирования.
+    """
+    matches = matching(kind, query, using)
+    if matches is None:
+        return []
+    limit = limit or search_settings()['MAX_RESULTS']
+    ids = matches.ranked(limit)
+    return matches.first(limit) if ids is None else ids
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    ?search= через полнотекстовый индекс. Вьюсет задаёт search_kind ('restaurant'/'table').
+    Без явного ?ordering= результаты упорядочены по релевантности, если совпадений не
+    больше MAX_RESULTS; иначе и с ?ordering= - все совпадения подзапросом, без ранжирования.
+    Фильтр ставится после OrderingFilter.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if not search_settings()['ENABLED']:
+            return super().filter_queryset(request, queryset, view)
+        query = request.query_params.get(self.search_param, '')
+        if not terms(query):
+            return queryset
+
+        matches = matching(view.search_kind, query, using=queryset.db)
+        if matches is None:
+            return queryset.none()
+        if not request.query_params.get(api_settings.ORDERING_PARAM):
+            ids = matches.ranked(search_settings()['MAX_RESULTS'])
+            if ids is not None:
+                rank = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)], output_field=IntegerField())
+                return queryset.filter(pk__in=ids).order_by(rank, 'pk') if ids else queryset.none()
+        return queryset.filter(pk__in=matches.subquery())
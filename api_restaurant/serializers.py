@@ -1,6 +1,12 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from .models import Restaurant, Table, Booking, TimeSlot
+from .availability import reserved_overlap_exists
+from .booking import book_timeslot, book_timeslots
+from .schedule import create_free_slots, day_intervals
 
 class RestaurantSerializer(serializers.ModelSerializer):
     class Meta:
@@ -46,25 +52,55 @@ class TimeSlotSerializer(serializers.ModelSerializer):
 
         # Проверка на пересечение с существующими ЗАБРОНИРОВАННЫМИ слотами
         if table and start_time and end_time:
-            # Создаем queryset для поиска пересечений
-            overlapping_query = TimeSlot.objects.filter(
-                table=table,
-                start_time__lt=end_time,
-                end_time__gt=start_time,
-                status='reserved'  # Проверяем только занятые слоты
-            )
-
-            # Исключаем текущий instance при обновлении
-            if instance and instance.pk:
-                overlapping_query = overlapping_query.exclude(pk=instance.pk)
-
-            if overlapping_query.exists():
+            exclude_pk = instance.pk if instance and instance.pk else None
+            overlapping = reserved_overlap_exists(table.pk, start_time, end_time, exclude_pk=exclude_pk)
+
+            if overlapping:
                 raise serializers.ValidationError({
                     "table": "This time slot overlaps with an existing reservation"
                 })
 
         return data
 
+class TimeSlotGenerateSerializer(serializers.Serializer):
+    """Массовая генерация слотов по часам работы для ресторана или набора столиков"""
+    MAX_DAYS = 366
+
+    restaurant = serializers.PrimaryKeyRelatedField(queryset=Restaurant.objects.all(), required=False)
+    tables = serializers.PrimaryKeyRelatedField(queryset=Table.objects.all(), many=True, required=False)
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    opens_at = serializers.TimeField()
+    closes_at = serializers.TimeField()
+    slot_minutes = serializers.IntegerField(min_value=60)
+
+    def validate(self, data):
+        if not data.get('restaurant') and not data.get('tables'):
+            raise serializers.ValidationError("Нужно указать restaurant или tables")
+        if data['date_from'] > data['date_to']:
+            raise serializers.ValidationError({"date_to": "date_to должно быть не раньше date_from"})
+        if (data['date_to'] - data['date_from']).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({"date_to": f"Не больше {self.MAX_DAYS} дней за раз"})
+        if data['opens_at'] >= data['closes_at']:
+            raise serializers.ValidationError({"closes_at": "closes_at должно быть после opens_at"})
+        return data
+
+    def create(self, validated_data):
+        if validated_data.get('tables'):
+            table_ids = [table.pk for table in validated_data['tables']]
+        else:
+            table_ids = list(validated_data['restaurant'].tables.values_list('pk', flat=True))
+
+        intervals = []
+        day = validated_data['date_from']
+        while day <= validated_data['date_to']:
+            intervals.extend(day_intervals(
+                day, validated_data['opens_at'], validated_data['closes_at'], validated_data['slot_minutes']
+            ))
+            day += timedelta(days=1)
+        return create_free_slots(table_ids, intervals, validated_data['date_from'], validated_data['date_to'])
+
+
 class BookingSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.username', read_only=True)
     table_info = serializers.CharField(source='table.table_number', read_only=True)
@@ -74,41 +110,65 @@ class BookingSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = '__all__'
-        read_only_fields = ('user', 'created_at')
+        read_only_fields = ('user', 'table', 'created_at')
 
     def get_time_slot_display(self, obj):
-        return f"{obj.time_slot.start_time.strftime('%Y-%m-%d %H:%M')} - {obj.time_slot.end_time.strftime('%H:%M')}"
+        return f"{obj.timeslot.start_time.strftime('%Y-%m-%d %H:%M')} - {obj.timeslot.end_time.strftime('%H:%M')}"
 
     def validate(self, data):
         request = self.context.get('request')
-        time_slot = data.get('time_slot')
+        timeslot = data.get('timeslot')
 
         if not request or not request.user.is_authenticated:
             raise serializers.ValidationError("Пользователь должен быть авторизован")
 
-        if time_slot and time_slot.status != 'free':
+        # Быстрый отказ; окончательная проверка - условный UPDATE в book_timeslot
+        if timeslot.status != 'free':
             raise serializers.ValidationError({
-                "time_slot": "Данное время недоступно"
+                "timeslot": "Данное время недоступно"
             })
 
         # Проверка, что пользователь не имеет брони в это же время
         user_overlapping = Booking.objects.filter(
-            user=request.user,
-            time_slot__start_time__lt=time_slot.end_time,
-            time_slot__end_time__gt=time_slot.start_time
+            user_id=request.user.pk,
+            timeslot__start_time__lt=timeslot.end_time,
+            timeslot__end_time__gt=timeslot.start_time
         ).exists()
 
         if user_overlapping:
             raise serializers.ValidationError({
-                "time_slot": "У вас уже есть бронирование на это время"
+                "timeslot": "У вас уже есть бронирование на это время"
             })
 
         return data
 
     def create(self, validated_data):
         request = self.context.get('request')
-        validated_data['user'] = request.user
-        return super().create(validated_data)
+        try:
+            return book_timeslot(request.user, validated_data['timeslot'].pk)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({"timeslot": exc.messages})
+
+
+class BookingBatchSerializer(serializers.Serializer):
+    """Несколько слотов одним запросом: брони создаются все или ни одной"""
+    MAX_SLOTS = 50
+
+    timeslots = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1, max_length=MAX_SLOTS
+    )
+
+    def validate_timeslots(self, value):
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError("Слоты не должны повторяться")
+        return value
+
+    def create(self, validated_data):
+        request = self.context.get('request')
+        try:
+            return book_timeslots(request.user, validated_data['timeslots'])
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({"timeslots": exc.messages})
 
 class RegisterSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
@@ -0,0 +1,131 @@
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from .authentication import invalidate_user
+from .caching import bump_version_on_commit
+from .changefeed import record_bulk_change, record_slot_deleted, record_slot_saved
+from .jobs import refresh_days
+from .models import Booking, Restaurant, Table, TableAvailability, TimeSlot, User
+from .search import index_restaurant, index_table, remove_table
+
+# Слоты изменены в обход save() (bulk_create / update).
+# Аргументы: table_ids, date_from, date_to - затронутые столики и дни;
+# необязательный timeslots - сами слоты в новом состоянии, если они известны (для ленты изменений);
+# необязательный days - пары (столик, день), которые действительно изменились: сводка и лента
+# тогда обновляются только по ним, а не по всем дням диапазона для всех столиков
+timeslots_bulk_changed = Signal()
+
+
+@receiver(pre_save, sender=TimeSlot)
+def timeslot_pre_save(sender, instance, update_fields=None, **kwargs):
+    # Запоминаем прежний день, чтобы при переносе слота пересчитать и его
+    instance._previous_day = None
+    if instance.pk and not (update_fields and set(update_fields) == {'status'}):
+        previous = TimeSlot.objects.filter(pk=instance.pk).values_list('start_time', flat=True).first()
+        if previous:
+            instance._previous_day = timezone.localdate(previous)
+
+
+@receiver(post_save, sender=TimeSlot)
+def timeslot_saved(sender, instance, **kwargs):
+    day = timezone.localdate(instance.start_time)
+    refresh_days([instance.table_id], day)
+    previous_day = getattr(instance, '_previous_day', None)
+    if previous_day and previous_day != day:
+        refresh_days([instance.table_id], previous_day)
+    record_slot_saved(instance, previous_day)
+
+
+@receiver(post_delete, sender=TimeSlot)
+def timeslot_deleted(sender, instance, **kwargs):
+    refresh_days([instance.table_id], timezone.localdate(instance.start_time))
+    record_slot_deleted(instance)
+
+
+def _table_ranges(days):
+    """(первый день, последний день) -> столики: у каждого столика свой диапазон, одинаковые - одним пересчётом."""
+    ranges = {}
+    for table_id, day in days:
+        first, last = ranges.get(table_id, (day, day))
+        ranges[table_id] = (min(first, day), max(last, day))
+    grouped = {}
+    for table_id, bounds in ranges.items():
+        grouped.setdefault(bounds, []).append(table_id)
+    return grouped
+
+
+@receiver(timeslots_bulk_changed)
+def timeslots_bulk_changed_handler(sender, table_ids, date_from, date_to, timeslots=None, days=None, **kwargs):
+    if days is None:
+        refresh_days(table_ids, date_from, date_to)
+    else:
+        for (first, last), range_tables in _table_ranges(days).items():
+            refresh_days(range_tables, first, last)
+    record_bulk_change(table_ids, date_from, date_to, timeslots, days)
+    bump_version_on_commit('timeslot')
+
+
+@receiver(post_save, sender=Table)
+def table_saved(sender, instance, created, **kwargs):
+    # Столик могли перенести в другой ресторан
+    if not created:
+        TableAvailability.objects.filter(table=instance).exclude(
+            restaurant_id=instance.restaurant_id
+        ).update(restaurant_id=instance.restaurant_id)
+
+
+@receiver(post_save, sender=Restaurant)
+def restaurant_search_document(sender, instance, raw=False, **kwargs):
+    # Документы удалённого ресторана и его столиков удаляются каскадом
+    if not raw:
+        index_restaurant(instance)
+
+
+@receiver(post_save, sender=Table)
+def table_search_document(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_table(instance)
+
+
+@receiver(post_delete, sender=Table)
+def table_search_document_deleted(sender, instance, **kwargs):
+    remove_table(instance.pk)
+
+
+@receiver(post_save, sender=Restaurant)
+@receiver(post_delete, sender=Restaurant)
+@receiver(post_save, sender=Table)
+@receiver(post_delete, sender=Table)
+@receiver(post_save, sender=TimeSlot)
+@receiver(post_delete, sender=TimeSlot)
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def bump_api_cache_version(sender, using=None, **kwargs):
+    bump_version_on_commit(sender._meta.model_name, using=using)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Сбросить кэш пользователя и клеймы в уже выданных токенах (authentication.py)
+    invalidate_user(instance.pk)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_permissions_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action.startswith('post_'):
+            invalidate_user(instance.pk)
+        return
+    # group.user_set.add(...): instance - группа или право, pk_set - пользователи.
+    # Для clear() pk_set пуст, поэтому пользователей запоминаем до очистки
+    if action == 'pre_clear':
+        instance._cleared_user_ids = list(instance.user_set.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        for user_id in getattr(instance, '_cleared_user_ids', ()):
+            invalidate_user(user_id)
+    elif action.startswith('post_'):
+        for user_id in pk_set:
+            invalidate_user(user_id)
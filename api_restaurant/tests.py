@@ -1,3 +1,1504 @@
-from django.test import TestCase
+import asyncio
+import base64
+import gzip
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from io import BytesIO, StringIO
+from datetime import time as datetime_time, timedelta
+from pathlib import Path
+from unittest.mock import patch
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from project.database import database_config
+from project.passwords import password_hasher_params, password_hashers
+
+from . import jobs, perfsuite, schema
+from .authentication import ClaimsRefreshToken, ClaimsTokenObtainPairSerializer, ClaimsUser
+from .availability import TableIntervals, day_bounds, refresh_table_days, reserved_overlap_exists
+from .booking import book_timeslot, book_timeslots
+from .caching import get_cache
+from .changefeed import FEED_LOCK_ID, CacheBroker, InProcessBroker, get_broker
+from .grid import runs
+from .hashers import run_hashing
+from .instrumentation import registry
+from .middleware import PIN_COOKIE, CompressionMiddleware, PrimaryPinMiddleware
+from .models import (
+    Booking, Job, Restaurant, RestaurantSchedule, SearchEntry, SlotChange, Table, TableAvailability, TimeSlot, TimeSlotHistory, User,
+)
+from .routers import PrimaryReplicaRouter, replica_reads_enabled
+from .search import search
+from .serializers import BookingSerializer, TimeSlotSerializer
+
+
+def hour(n):
+    base = timezone.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    return base + timedelta(hours=n)
+
+
+class TableIntervalsTests(TestCase):
+    def test_overlaps(self):
+        intervals = TableIntervals([(hour(0), hour(2), 1), (hour(5), hour(6), 2)])
+        self.assertTrue(intervals.overlaps(hour(1), hour(3)))
+        self.assertFalse(intervals.overlaps(hour(2), hour(5)))
+        self.assertTrue(intervals.overlaps(hour(4), hour(7)))
+        self.assertFalse(intervals.overlaps(hour(1), hour(3), exclude_pk=1))
+
+    def test_long_interval_found_behind_short_ones(self):
+        intervals = TableIntervals([(hour(0), hour(10), 1), (hour(1), hour(2), 2), (hour(3), hour(4), 3)])
+        self.assertTrue(intervals.overlaps(hour(6), hour(7)))
+        intervals.remove(1)
+        self.assertFalse(intervals.overlaps(hour(6), hour(7)))
+
+
+class OverlapCheckTests(TestCase):
+    def setUp(self):
+        restaurant = Restaurant.objects.create(name='R', address='A')
+        self.table = Table.objects.create(restaurant=restaurant, table_number='1', capacity=2)
+
+    def test_check_follows_saves_and_deletes(self):
+        self.assertFalse(reserved_overlap_exists(self.table.pk, hour(0), hour(1)))
+
+        slot = TimeSlot.objects.create(table=self.table, start_time=hour(0), end_time=hour(1), status='reserved')
+        self.assertTrue(reserved_overlap_exists(self.table.pk, hour(0), hour(1)))
+        self.assertFalse(reserved_overlap_exists(self.table.pk, hour(0), hour(1), exclude_pk=slot.pk))
+
+        free_slot = TimeSlot(table=self.table, start_time=hour(0), end_time=hour(1))
+        with self.assertRaises(ValidationError):
+            free_slot.save()
+
+        slot.status = 'free'
+        slot.save()
+        self.assertFalse(reserved_overlap_exists(self.table.pk, hour(0), hour(1)))
+
+    def test_sees_writes_without_signals(self):
+        # Бронь другого процесса или bulk_create: сигналов нет, проверка всё равно её видит
+        TimeSlot.objects.bulk_create([TimeSlot(table=self.table, start_time=hour(0), end_time=hour(1), status='reserved')])
+        with self.assertRaises(ValidationError):
+            TimeSlot(table=self.table, start_time=hour(0), end_time=hour(1)).save()
+
+
+class TimeSlotGenerateTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user('admin', password='pass', is_staff=True)
+        self.restaurant = Restaurant.objects.create(name='R', address='A')
+        self.tables = Table.objects.bulk_create([
+            Table(restaurant=self.restaurant, table_number=str(i), capacity=4) for i in range(3)
+        ])
+        self.client.force_authenticate(self.admin)
+
+    def test_generate_for_restaurant(self):
+        day = hour(0).date()
+        midnight = timezone.make_aware(timezone.datetime.combine(day, timezone.datetime.min.time()))
+        reserved = TimeSlot.objects.create(
+            table=self.tables[0],
+            start_time=midnight + timedelta(hours=12),
+            end_time=midnight + timedelta(hours=13),
+            status='reserved',
+        )
+        payload = {
+            'restaurant': self.restaurant.pk,
+            'date_from': day.isoformat(),
+            'date_to': (day + timedelta(days=1)).isoformat(),
+            'opens_at': '10:00',
+            'closes_at': '22:00',
+            'slot_minutes': 120,
+        }
+        # restaurant + столики + существующие слоты + вставка, пересчёт сводки (3)
+        # и запись в ленту изменений в savepoint
+        with self.assertNumQueries(10):
+            response = self.client.post('/api/timeslots/generate/', payload, format='json')
+
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data, {'created': 3 * 6 * 2 - 1, 'skipped': 1})
+        self.assertEqual(TimeSlot.objects.filter(table=self.tables[0], start_time=reserved.start_time).count(), 1)
+
+    def test_generate_requires_target_and_admin(self):
+        payload = {'date_from': '2030-01-01', 'date_to': '2030-01-02',
+                   'opens_at': '10:00', 'closes_at': '22:00', 'slot_minutes': 60}
+        response = self.client.post('/api/timeslots/generate/', payload, format='json')
+        self.assertEqual(response.status_code, 400)
+
+        self.client.force_authenticate(None)
+        response = self.client.post('/api/timeslots/generate/', dict(payload, restaurant=self.restaurant.pk), format='json')
+        self.assertEqual(response.status_code, 401)
+
+
+class BookingEngineTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('user', password='pass')
+        restaurant = Restaurant.objects.create(name='R', address='A')
+        self.table = Table.objects.create(restaurant=restaurant, table_number='1', capacity=2)
+        self.slot = TimeSlot.objects.create(table=self.table, start_time=hour(0), end_time=hour(1))
+        self.client.force_authenticate(self.user)
+
+    def test_book_reserves_slot_in_bounded_queries(self):
+        # SELECT FOR UPDATE, UPDATE, пересчёт сводки дня (свободных не осталось - без вставки),
+        # запись в ленту изменений, INSERT + savepoint тестовой транзакции
+        with self.assertNumQueries(8):
+            booking = book_timeslot(self.user, self.slot.pk)
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.status, 'reserved')
+        self.assertEqual(booking.table_id, self.table.pk)
+
+        with self.assertRaises(ValidationError):
+            book_timeslot(self.user, self.slot.pk)
+
+        booking.delete()
+        self.slot.refresh_from_db()
+        self.assertEqual(self.slot.status, 'free')
+
+    def test_booking_api(self):
+        response = self.client.post('/api/bookings/', {'timeslot': self.slot.pk}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['table'], self.table.pk)
+
+        response = self.client.post('/api/bookings/', {'timeslot': self.slot.pk}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_batch_booking(self):
+        other = Table.objects.create(restaurant=self.table.restaurant, table_number='2', capacity=4)
+        # Два столика на одно время и следующий слот первого
+        slots = [
+            self.slot,
+            TimeSlot.objects.create(table=other, start_time=hour(0), end_time=hour(1)),
+            TimeSlot.objects.create(table=self.table, start_time=hour(1), end_time=hour(2)),
+        ]
+        response = self.client.post('/api/bookings/batch/', {'timeslots': [slot.pk for slot in slots]}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual([row['timeslot'] for row in response.data], [slot.pk for slot in slots])
+        self.assertEqual(TimeSlot.objects.filter(status='reserved').count(), 3)
+        self.assertFalse(reserved_overlap_exists(self.table.pk, hour(3), hour(4)))
+        self.assertTrue(reserved_overlap_exists(other.pk, hour(0), hour(1)))
+
+        # Пересечение с уже имеющейся бронью или занятый слот - ничего не создаётся
+        later = [TimeSlot.objects.create(table=other, start_time=hour(n), end_time=hour(n + 1)) for n in (1, 2)]
+        response = self.client.post('/api/bookings/batch/', {'timeslots': [slot.pk for slot in later]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(str(later[0].pk), response.data['timeslots'][0])
+        response = self.client.post('/api/bookings/batch/', {'timeslots': [later[1].pk, self.slot.pk]}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Booking.objects.count(), 3)
+        self.assertEqual(TimeSlot.objects.get(pk=later[1].pk).status, 'free')
+
+    def test_batch_booking_queries_do_not_grow_with_slots(self):
+        def queries(count, offset):
+            slots = [
+                TimeSlot.objects.create(table=self.table, start_time=hour(offset + n), end_time=hour(offset + n + 1))
+                for n in range(count + 1)
+            ]
+            # Последний слот остаётся свободным - пересчёт сводки одинаковый в обоих случаях
+            with CaptureQueriesContext(connection) as context:
+                book_timeslots(self.user, [slot.pk for slot in slots[:-1]])
+            return len(context.captured_queries)
+
+        self.assertEqual(queries(2, 2), queries(8, 30))
+
+
+class BookingConcurrencyTests(TransactionTestCase):
+    def test_no_double_booking_under_concurrency(self):
+        users = [User.objects.create(username=f'user{i}') for i in range(8)]
+        restaurant = Restaurant.objects.create(name='R', address='A')
+        table = Table.objects.create(restaurant=restaurant, table_number='1', capacity=2)
+        slots = [
+            TimeSlot.objects.create(table=table, start_time=hour(i), end_time=hour(i + 1))
+            for i in range(5)
+        ]
+
+        barrier = threading.Barrier(len(users))
+        booked = []
+
+        def worker(user):
+            barrier.wait()
+            try:
+                for slot in slots:
+                    # SQLite в тестах отвечает "table is locked" вместо ожидания - повторяем
+                    for _ in range(200):
+                        try:
+                            booked.append(book_timeslot(user, slot.pk).timeslot_id)
+                        except ValidationError:
+                            pass
+                        except OperationalError:
+                            time.sleep(0.001)
+                            continue
+                        break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(user,)) for user in users]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(booked), [slot.pk for slot in slots])
+        self.assertEqual(Booking.objects.count(), len(booked))
+        self.assertEqual(TimeSlot.objects.filter(status='reserved').count(), len(booked))
+
+
+class QueryCountTests(APITestCase):
+    """
+    Число запросов на list/retrieve не должно зависеть от числа строк.
+    Каждый эндпоинт вызывается до и после добавления данных - счётчики обязаны совпасть.
+    """
+
+    def setUp(self):
+        self.staff = User.objects.create(username='staff', is_staff=True)
+        self.user = User.objects.create(username='user')
+        self.restaurants = 0
+        get_cache().clear()
+        self.grow()
+
+    def grow(self, count=3):
+        day = hour(24)
+        # Версии кэша поднимаются после коммита (caching.bump_version_on_commit)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._grow(day, count)
+        self.date = day.date().isoformat()
+
+    def _grow(self, day, count):
+        for _ in range(count):
+            self.restaurants += 1
+            restaurant = Restaurant.objects.create(name=f'R{self.restaurants}', address='A')
+            table = Table.objects.create(restaurant=restaurant, table_number='1', capacity=4)
+            free = TimeSlot.objects.create(table=table, start_time=day, end_time=day + timedelta(hours=1))
+            booked = TimeSlot.objects.create(table=table, start_time=day + timedelta(hours=2), end_time=day + timedelta(hours=3))
+            Booking.objects.create(user=self.user, table=table, timeslot=booked)
+        self.ids = {'restaurant': restaurant.pk, 'table': table.pk, 'timeslot': free.pk,
+                    'booking': Booking.objects.latest('pk').pk}
+
+    def count_queries(self, url, user=None):
+        self.client.force_authenticate(user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        return len(ctx.captured_queries)
+
+    def assertConstantQueries(self, url, user=None):
+        before = self.count_queries(url, user)
+        self.grow()
+        after = self.count_queries(url, user)
+        self.assertEqual(before, after, f'{url}: {before} -> {after} запросов, похоже на N+1')
+
+    def test_restaurants(self):
+        self.assertConstantQueries('/api/restaurants/')
+        self.assertConstantQueries(f"/api/restaurants/{self.ids['restaurant']}/")
+
+    def test_tables(self):
+        self.assertConstantQueries('/api/tables/')
+        self.assertConstantQueries(f"/api/tables/{self.ids['table']}/")
+        self.assertConstantQueries(f'/api/tables/available/?date={self.date}')
+
+    def test_timeslots(self):
+        self.assertConstantQueries('/api/timeslots/')
+        self.assertConstantQueries(f"/api/timeslots/{self.ids['timeslot']}/")
+        self.assertConstantQueries('/api/timeslots/available/')
+        self.assertConstantQueries('/api/timeslots/', self.staff)
+
+    def test_bookings(self):
+        self.assertConstantQueries('/api/bookings/', self.user)
+        self.assertConstantQueries('/api/bookings/', self.staff)
+        self.assertConstantQueries(f"/api/bookings/{self.ids['booking']}/", self.user)
+
+
+class ResponseCacheTests(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        restaurant = Restaurant.objects.create(name='R', address='A')
+        Table.objects.create(restaurant=restaurant, table_number='1', capacity=4)
+
+    def test_cached_list_and_invalidation(self):
+        first = self.client.get('/api/tables/')
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/tables/')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+        # Другие параметры запроса - другой ключ
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/tables/?capacity=4')
+        self.assertTrue(ctx.captured_queries)
+
+        Restaurant.objects.update(name='X')  # update() не инвалидирует
+        with self.captureOnCommitCallbacks(execute=True):
+            Restaurant.objects.get().save()
+            # До коммита версия прежняя: незакоммиченные строки не попадут в кэш под новой
+            self.assertEqual(self.client.get('/api/tables/')['ETag'], first['ETag'])
+        third = self.client.get('/api/tables/')
+        self.assertEqual(third.data['results'][0]['restaurant_name'], 'X')
+        self.assertNotEqual(third['ETag'], first['ETag'])
+
+    def test_etag_not_modified(self):
+        etag = self.client.get('/api/restaurants/')['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/restaurants/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+
+class TableAvailabilityTests(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create(username='user')
+        restaurant = Restaurant.objects.create(name='R', address='A')
+        self.small = Table.objects.create(restaurant=restaurant, table_number='1', capacity=2)
+        self.big = Table.objects.create(restaurant=restaurant, table_number='2', capacity=6)
+        self.slot = TimeSlot.objects.create(table=self.small, start_time=hour(0), end_time=hour(1))
+        TimeSlot.objects.create(table=self.small, start_time=hour(2), end_time=hour(3))
+        TimeSlot.objects.create(table=self.big, start_time=hour(0), end_time=hour(1), status='reserved')
+        self.day = timezone.localdate(hour(0))
+
+    def summary(self, table):
+        return TableAvailability.objects.filter(table=table, date=self.day).first()
+
+    def test_summary_follows_slot_and_booking_writes(self):
+        summary = self.summary(self.small)
+        self.assertEqual(summary.free_slots, 2)
+        self.assertEqual(summary.earliest_free_start, hour(0))
+        self.assertIsNone(self.summary(self.big))
+
+        booking = book_timeslot(self.user, self.slot.pk)
+        summary = self.summary(self.small)
+        self.assertEqual(summary.free_slots, 1)
+        self.assertEqual(summary.earliest_free_start, hour(2))
+
+        booking.delete()
+        self.assertEqual(self.summary(self.small).free_slots, 2)
+
+        # Перенос слота на другой день пересчитывает оба дня
+        self.slot.start_time += timedelta(days=1)
+        self.slot.end_time += timedelta(days=1)
+        self.slot.save()
+        self.assertEqual(self.summary(self.small).free_slots, 1)
+        self.assertEqual(TableAvailability.objects.get(table=self.small, date=self.day + timedelta(days=1)).free_slots, 1)
+
+    def test_available_tables_and_backfill(self):
+        response = self.client.get(f'/api/tables/available/?date={self.day.isoformat()}')
+        self.assertEqual([row['id'] for row in response.data['results']], [self.small.pk])
+
+        TableAvailability.objects.all().delete()
+        call_command('backfill_availability', stdout=StringIO())
+        self.assertEqual(self.summary(self.small).free_slots, 2)
+
+
+class KeysetPaginationTests(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        restaurant = Restaurant.objects.create(name='R', address='A')
+        table = Table.objects.create(restaurant=restaurant, table_number='1', capacity=2)
+        TimeSlot.objects.bulk_create([
+            TimeSlot(table=table, start_time=hour(i), end_time=hour(i + 1)) for i in range(120)
+        ])
+
+    def walk(self, url):
+        seen = []
+        while url:
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url)
+            sql = ' '.join(query['sql'] for query in ctx.captured_queries)
+            self.assertNotIn('COUNT(', sql)
+            self.assertNotIn('OFFSET', sql)
+            seen.extend(row['id'] for row in response.data['results'])
+            url = response.data['next']
+        return seen
+
+    def test_timeslot_feed_pages_with_cursor(self):
+        ids = self.walk('/api/timeslots/')
+        self.assertEqual(ids, list(TimeSlot.objects.order_by('start_time').values_list('pk', flat=True)))
+
+    def test_available_page_size_is_bounded(self):
+        response = self.client.get('/api/timeslots/available/?page_size=1000')
+        self.assertEqual(len(response.data['results']), 100)
+        response = self.client.get('/api/timeslots/available/')
+        self.assertEqual(len(response.data['results']), 10)
+        self.assertEqual(len(self.walk('/api/timeslots/available/?page_size=50')), 120)
+
+
+class AsyncReadViewsTests(TestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.restaurant = Restaurant.objects.create(name='R', address='A')
+        table = Table.objects.create(restaurant=self.restaurant, table_number='1', capacity=2)
+        TimeSlot.objects.bulk_create([
+            TimeSlot(table=table, start_time=hour(i), end_time=hour(i + 1)) for i in range(15)
+        ])
+        refresh_table_days([table.pk], timezone.localdate(hour(0)), timezone.localdate(hour(15)))
+
+    async def fetch_all(self, url):
+        results = []
+        while url:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            results.extend(data['results'])
+            url = data['next']
+        return results
+
+    async def test_same_rows_as_drf(self):
+        for sync_url, async_url in [
+            ('/api/timeslots/available/?page_size=100', '/api/async/timeslots/available/?page_size=4'),
+            ('/api/tables/available/?date=' + timezone.localdate(hour(0)).isoformat(),
+             '/api/async/tables/available/?date=' + timezone.localdate(hour(0)).isoformat()),
+            ('/api/restaurants/', '/api/async/restaurants/'),
+        ]:
+            expected = (await self.async_client.get(sync_url)).json()['results']
+            self.assertTrue(expected)
+            self.assertEqual(await self.fetch_all(async_url), expected)
+
+    async def test_bad_params(self):
+        response = await self.async_client.get('/api/async/timeslots/available/?date=01.01.2030')
+        self.assertEqual(response.status_code, 400)
+        response = await self.async_client.get('/api/async/timeslots/available/?cursor=xxx')
+        self.assertEqual(response.status_code, 400)
+
+        def cursor(*values):
+            return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+        for url in [
+            '/api/async/timeslots/available/?cursor=' + cursor('2026-01-01T00:00:00', 'x'),
+            '/api/async/timeslots/available/?cursor=' + cursor('2026-01-01T00:00:00', None),
+            '/api/async/timeslots/available/?cursor=' + cursor('2026-01-01T00:00:00', True),
+            '/api/async/restaurants/?cursor=' + cursor(['R'], 1),
+            '/api/async/timeslots/available/?restaurant=x',
+            '/api/async/timeslots/available/?table=1.5',
+            '/api/async/tables/available/?capacity=two',
+            '/api/async/timeslots/changes/?restaurant=1&after=0&timeout=nan',
+        ]:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 400, url)
+        # Размер страницы - как у DRF: нечисло даёт размер по умолчанию
+        response = await self.async_client.get('/api/async/restaurants/?page_size=many')
+        self.assertEqual(response.status_code, 200)
+
+    async def test_middleware_stays_async(self):
+        async def view(request):
+            return HttpResponse(b'[' + b'{"id": 1}, ' * 200 + b'{}]', content_type='application/json')
+
+        request = RequestFactory().post('/', headers={'Accept-Encoding': 'gzip'})
+        for middleware_class in (PrimaryPinMiddleware, CompressionMiddleware):
+            self.assertTrue(iscoroutinefunction(middleware_class(view)))
+        response = await CompressionMiddleware(PrimaryPinMiddleware(view))(request)
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create(username='staff', is_staff=True)
+        restaurant = Restaurant.objects.create(name='R', address='A')
+        self.tables = [
+            Table.objects.create(restaurant=restaurant, table_number=str(i), capacity=2) for i in range(2)
+        ]
+        for i in range(5):
+            TimeSlot.objects.create(table=self.tables[i % 2], start_time=hour(i), end_time=hour(i + 1))
+        book_timeslot(self.staff, TimeSlot.objects.first().pk)
+        self.client.force_authenticate(self.staff)
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_matches_serializers(self):
+        body = self.read(self.client.get(f'/api/timeslots/export/?table={self.tables[0].pk}'))
+        rows = [json.loads(line) for line in body.splitlines()]
+        expected = TimeSlotSerializer(TimeSlot.objects.filter(table=self.tables[0]).order_by('start_time'), many=True).data
+        self.assertEqual(rows, json.loads(json.dumps(expected)))
+
+        body = self.read(self.client.get('/api/bookings/export/'))
+        self.assertEqual([json.loads(line) for line in body.splitlines()],
+                         json.loads(json.dumps(BookingSerializer(Booking.objects.all(), many=True).data)))
+
+    def test_csv(self):
+        response = self.client.get('/api/timeslots/export/?fmt=csv&status=reserved')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        lines = self.read(response).splitlines()
+        self.assertEqual(lines[0], 'id,table_info,restaurant_name,start_time,end_time,status,table')
+        self.assertEqual(len(lines), 2)
+
+    def test_bad_format_and_permissions(self):
+        self.assertEqual(self.client.get('/api/timeslots/export/?fmt=xml').status_code, 400)
+        self.client.force_authenticate(User.objects.create(username='user'))
+        self.assertEqual(self.client.get('/api/bookings/export/').status_code, 403)
+
+
+class FastReadPathTests(APITestCase):
+    def setUp(self):
+        self.staff = User.objects.create(username='staff', is_staff=True)
+        restaurant = Restaurant.objects.create(name='Ресторан "Ё"', address='A')
+        table = Table.objects.create(restaurant=restaurant, table_number='7A', capacity=2)
+        for i in range(15):
+            slot = TimeSlot.objects.create(
+                table=table, start_time=hour(i * 3) + timedelta(microseconds=i * 1000),
+                end_time=hour(i * 3 + 2) + timedelta(minutes=30)
+            )
+            if i % 2:
+                book_timeslot(self.staff, slot.pk)
+        self.client.force_authenticate(self.staff)
+
+    def assertSameBytes(self, url):
+        get_cache().clear()
+        fast = self.client.get(url)
+        get_cache().clear()
+        with self.settings(API_FAST_READ_PATH=False):
+            slow = self.client.get(url)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content)
+
+    def test_identical_json(self):
+        for url in [
+            '/api/timeslots/',
+            '/api/timeslots/?page_size=100&ordering=-end_time',
+            '/api/timeslots/available/?page_size=100',
+            '/api/bookings/',
+            '/api/bookings/?ordering=timeslot_start',
+            '/api/bookings/?ordering=-timeslot_start',
+        ]:
+            self.assertSameBytes(url)
+            with timezone.override('Europe/Moscow'):
+                self.assertSameBytes(url)
+
+    def collect(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [item['id'] for item in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_cursor_pages_by_timeslot_start(self):
+        expected = list(Booking.objects.order_by('timeslot__start_time').values_list('id', flat=True))
+        for fast in (True, False):
+            with self.settings(API_FAST_READ_PATH=fast):
+                get_cache().clear()
+                self.assertEqual(self.collect('/api/bookings/?ordering=timeslot_start&page_size=3'), expected)
+                get_cache().clear()
+                self.assertEqual(
+                    self.collect('/api/bookings/?ordering=-timeslot_start&page_size=3'), expected[::-1]
+                )
+
+    def test_equal_start_times_page_in_id_order(self):
+        table = Table.objects.get()
+        tied = [
+            TimeSlot.objects.create(table=table, start_time=hour(100), end_time=hour(100) + timedelta(minutes=i + 1)).pk
+            for i in range(5)
+        ]
+        ids = self.collect('/api/timeslots/?page_size=2')
+        self.assertEqual(ids, list(TimeSlot.objects.order_by('start_time', 'id').values_list('id', flat=True)))
+        self.assertEqual([pk for pk in ids if pk in tied], sorted(tied))
+
+
+class DatabaseConfigTests(TestCase):
+    def test_env_driven_config(self):
+        base_dir = Path('/srv/app')
+        sqlite = database_config(base_dir, {})['default']
+        self.assertEqual(sqlite['NAME'], base_dir / 'db.sqlite3')
+        self.assertEqual(sqlite['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertIn('journal_mode=WAL', sqlite['OPTIONS']['init_command'])
+        self.assertNotIn('OPTIONS', database_config(base_dir, {'DB_SQLITE_TUNED': '0'})['default'])
+
+        postgres = database_config(base_dir, {'DB_ENGINE': 'postgresql', 'DB_POOL': '1', 'DB_POOL_MAX_SIZE': '8'})
+        self.assertEqual(postgres['default']['CONN_MAX_AGE'], 0)
+        self.assertEqual(postgres['default']['OPTIONS']['pool'], {'min_size': 2, 'max_size': 8})
+
+        with self.assertRaises(ValueError):
+            database_config(base_dir, {'DB_ENGINE': 'oracle'})
+
+        replicas = database_config(base_dir, {'DB_REPLICAS': '/srv/r1.sqlite3, /srv/r2.sqlite3'})
+        self.assertEqual(list(replicas), ['default', 'replica1', 'replica2'])
+        self.assertEqual(replicas['replica2']['NAME'], '/srv/r2.sqlite3')
+        self.assertEqual(replicas['replica1']['TEST'], {'MIRROR': 'default'})
+        self.assertEqual(replicas['replica1']['OPTIONS'], sqlite['OPTIONS'])
+
+    def test_pragmas_applied_on_connection(self):
+        if connection.vendor != 'sqlite' or 'OPTIONS' not in settings.DATABASES['default']:
+            self.skipTest('только для настроенного режима SQLite')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+
+class ReplicaRoutingTests(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create(username='user')
+        restaurant = Restaurant.objects.create(name='R', address='A')
+        table = Table.objects.create(restaurant=restaurant, table_number='1', capacity=2)
+        self.slot = TimeSlot.objects.create(table=table, start_time=hour(0), end_time=hour(1))
+
+    def reads(self, method, url, **kwargs):
+        """На каком флаге чтения с реплики ходили в БД во время запроса."""
+        seen = []
+
+        def db_for_read(router, model, **hints):
+            seen.append(replica_reads_enabled())
+            return 'default'
+
+        with patch.object(PrimaryReplicaRouter, 'db_for_read', autospec=True, side_effect=db_for_read):
+            response = getattr(self.client, method)(url, **kwargs)
+        self.assertLess(response.status_code, 400, getattr(response, 'data', None))
+        return set(seen)
+
+    def test_routing(self):
+        self.assertEqual(self.reads('get', '/api/restaurants/'), {True})
+        self.assertEqual(self.reads('get', '/api/timeslots/available/'), {True})
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.reads('get', '/api/bookings/'), {False})
+        self.assertEqual(self.reads('post', '/api/bookings/', data={'timeslot': self.slot.pk}, format='json'), {False})
+
+        # После записи клиент закреплён за основной БД
+        self.assertIn(PIN_COOKIE, self.client.cookies)
+        get_cache().clear()
+        self.assertEqual(self.reads('get', '/api/restaurants/'), {False})
+
+        self.assertFalse(replica_reads_enabled())
+
+
+class SyncSqliteReplicaTests(TransactionTestCase):
+    # backup API ждёт окончания открытой транзакции, поэтому не TestCase
+    def test_sync_sqlite_replica(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('только для SQLite')
+        restaurant = Restaurant.objects.create(name='R', address='A')
+        table = Table.objects.create(restaurant=restaurant, table_number='1', capacity=2)
+        TimeSlot.objects.create(table=table, start_time=hour(0), end_time=hour(1))
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, 'replica.sqlite3')
+            call_command('sync_sqlite_replica', target, stdout=StringIO())
+            replica = sqlite3.connect(target)
+            try:
+                count = replica.execute('SELECT COUNT(*) FROM api_restaurant_timeslot').fetchone()[0]
+            finally:
+                replica.close()
+        self.assertEqual(count, 1)
+
+
+class ClaimsAuthenticationTests(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create(username='user')
+        other = User.objects.create(username='other')
+        restaurant = Restaurant.objects.create(name='R', address='A')
+        table = Table.objects.create(restaurant=restaurant, table_number='1', capacity=2)
+        for i, owner in enumerate((self.user, other)):
+            slot = TimeSlot.objects.create(table=table, start_time=hour(i), end_time=hour(i + 1))
+            Booking.objects.create(user=owner, table=table, timeslot=slot)
+
+    def get(self, url, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        return response, len(ctx.captured_queries)
+
+    def test_claims_skip_user_query(self):
+        token = ClaimsTokenObtainPairSerializer.get_token(self.user)
+        self.assertEqual((token['username'], token['is_staff']), ('user', False))
+
+        # Первый запрос читает отметку отзыва клеймов из БД, дальше она в кэше
+        self.get('/api/bookings/', token)
+        response, with_claims = self.get('/api/bookings/', token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsInstance(response.wsgi_request.user, ClaimsUser)
+        self.assertEqual(response.data['results'][0]['user'], self.user.pk)
+
+        with override_settings(API_AUTH_TRUST_CLAIMS=False):
+            _, lookup = self.get('/api/bookings/', token)
+            _, cached = self.get('/api/bookings/', token)
+        self.assertEqual(lookup, with_claims + 1)
+        self.assertEqual(cached, with_claims)
+
+    def test_booking_with_claims_user(self):
+        slot = TimeSlot.objects.create(table=Table.objects.get(), start_time=hour(5), end_time=hour(6))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {ClaimsRefreshToken.for_user(self.user).access_token}')
+        response = self.client.post('/api/bookings/', {'timeslot': slot.pk}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual((response.data['user'], response.data['user_name']), (self.user.pk, 'user'))
+
+    def test_user_changes_invalidate_claims(self):
+        token = ClaimsRefreshToken.for_user(self.user)
+        # Токен без клеймов (выдан до включения режима) работает через кэш
+        response, _ = self.get('/api/bookings/', RefreshToken.for_user(self.user))
+        self.assertEqual(len(response.data['results']), 1)
+
+        self.user.is_staff = True
+        self.user.save()
+        response, _ = self.get('/api/bookings/', token)
+        self.assertEqual(len(response.data['results']), 2)
+
+        self.user.is_active = False
+        self.user.save()
+        response, _ = self.get('/api/bookings/', token)
+        self.assertEqual(response.status_code, 401)
+
+    def test_revocation_survives_cache_loss(self):
+        staff = User.objects.create(username='staff', is_staff=True)
+        token = ClaimsRefreshToken.for_user(staff)
+        self.assertEqual(self.get('/api/metrics/', token)[0].status_code, 200)
+
+        staff.is_staff = False
+        staff.save()
+        # Рестарт, вытеснение или другой процесс: отметки в кэше нет, она в БД
+        get_cache().clear()
+        self.assertEqual(self.get('/api/metrics/', token)[0].status_code, 403)
+
+        # Обновление выдаёт access-токен с клеймами из БД
+        response = self.client.post('/api/token/refresh/', {'refresh': str(token)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIs(AccessToken(response.data['access'])['is_staff'], False)
+
+        User.objects.filter(pk=staff.pk).update(is_active=False)
+        get_cache().clear()
+        self.assertEqual(self.get('/api/metrics/', ClaimsRefreshToken.for_user(staff))[0].status_code, 401)
+        response = self.client.post('/api/token/refresh/', {'refresh': str(token)}, format='json')
+        self.assertEqual(response.status_code, 401)
+
+    def test_group_change_invalidates_claims(self):
+        token = ClaimsRefreshToken.for_user(self.user)
+        self.get('/api/bookings/', token)
+        group = Group.objects.create(name='managers')
+        group.user_set.add(self.user)
+        response, _ = self.get('/api/bookings/', token)
+        self.assertNotIsInstance(response.wsgi_request.user, ClaimsUser)
+
+
+@override_settings(PASSWORD_HASHER_PARAMS={'SCRYPT_WORK_FACTOR': 2 ** 10})
+class PasswordHashingTests(APITestCase):
+    def login(self, password='secret-pw-1'):
+        return self.client.post('/api/token/', {'username': 'user', 'password': password}, format='json')
+
+    def test_register_and_rehash_on_login(self):
+        response = self.client.post('/api/register/', {'username': 'user', 'password': 'secret-pw-1'}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        user = User.objects.get(username='user')
+        self.assertTrue(user.password.startswith('scrypt$'))
+
+        # Старый хеш другого алгоритма пересчитывается при входе
+        with override_settings(PASSWORD_HASHERS=settings.PASSWORD_HASHERS + ['django.contrib.auth.hashers.MD5PasswordHasher']):
+            user.password = make_password('secret-pw-1', hasher='md5')
+            user.save()
+            self.assertEqual(self.login().status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$'))
+
+        # И при смене параметров стоимости
+        with override_settings(PASSWORD_HASHER_PARAMS={'SCRYPT_WORK_FACTOR': 2 ** 11}):
+            self.assertEqual(self.login().status_code, 200)
+        user.refresh_from_db()
+        self.assertEqual(user.password.split('$')[1], str(2 ** 11))
+        self.assertEqual(self.login('wrong').status_code, 401)
+
+    @override_settings(PASSWORD_HASHING_POOL={'WORKERS': 1, 'QUEUE': 0})
+    def test_pool_overload_returns_503(self):
+        started, release = threading.Event(), threading.Event()
+
+        def busy():
+            started.set()
+            release.wait(10)
+
+        worker = threading.Thread(target=run_hashing, args=(busy,))
+        worker.start()
+        try:
+            started.wait(10)
+            response = self.client.post('/api/register/', {'username': 'user', 'password': 'secret-pw-1'}, format='json')
+            self.assertEqual(response.status_code, 503)
+        finally:
+            release.set()
+            worker.join()
+        response = self.client.post('/api/register/', {'username': 'user', 'password': 'secret-pw-1'}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    def test_config_from_env(self):
+        self.assertEqual(password_hashers({})[0], 'api_restaurant.hashers.ScryptPasswordHasher')
+        self.assertEqual(password_hashers({'PASSWORD_HASHER': 'pbkdf2'})[0], 'api_restaurant.hashers.PBKDF2PasswordHasher')
+        self.assertEqual(password_hasher_params({'SCRYPT_WORK_FACTOR': '1024'})['SCRYPT_WORK_FACTOR'], 1024)
+        with self.assertRaises(ValueError):
+            password_hashers({'PASSWORD_HASHER': 'md5'})
+
+
+class SlotGridTests(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.restaurant = Restaurant.objects.create(name='R', address='A')
+        self.table = Table.objects.create(restaurant=self.restaurant, table_number='1', capacity=2)
+        Table.objects.create(restaurant=self.restaurant, table_number='2', capacity=4)
+        self.date = timezone.localdate() + timedelta(days=1)
+        day_start, _ = day_bounds(self.date)
+        for start, end, slot_status in ((10, 11, 'free'), (11, 12, 'reserved'), (12.25, 13, 'free')):
+            TimeSlot.objects.create(
+                table=self.table, status=slot_status,
+                start_time=day_start + timedelta(hours=start), end_time=day_start + timedelta(hours=end),
+            )
+
+    def test_runs(self):
+        self.assertEqual(runs(0), [])
+        self.assertEqual(runs(0b1110011), [[0, 2], [4, 3]])
+
+    def test_grid(self):
+        url = f'/api/timeslots/available/?layout=grid&restaurant={self.restaurant.pk}&date={self.date}'
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((response.data['step_minutes'], response.data['cells']), (30, 48))
+        first, second = response.data['tables']
+        # 10:00-11:00 свободно, 11:00-12:00 занято, 12:15-13:00 - целиком свободна только 12:30-13:00
+        self.assertEqual(first['free'], [[20, 2], [25, 1]])
+        self.assertEqual(first['reserved'], [[22, 2]])
+        self.assertEqual((second['table_number'], second['free'], second['reserved']), ('2', [], []))
+
+        response = self.client.get(url + '&step=60')
+        self.assertEqual(response.data['tables'][0]['free'], [[10, 1]])
+
+        self.assertEqual(self.client.get(url + '&step=7').status_code, 400)
+        self.assertEqual(self.client.get('/api/timeslots/available/?layout=grid&restaurant=1').status_code, 400)
+        self.assertEqual(self.client.get(url.replace(f'restaurant={self.restaurant.pk}', 'restaurant=999')).status_code, 404)
+
+
+@override_settings(API_INSTRUMENTATION={'ENABLED': True, 'QUERY_BUDGET': 1})
+class InstrumentationTests(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        registry.reset()
+        self.staff = User.objects.create(username='staff', is_staff=True)
+        Restaurant.objects.create(name='R', address='A')
+
+    def test_metrics(self):
+        # count + выборка страницы - два запроса при бюджете в один
+        with self.assertLogs('api_restaurant.instrumentation', 'WARNING'):
+            response = self.client.get('/api/restaurants/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        # Второй раз - из кэша ответов, без запросов
+        self.client.get('/api/restaurants/')
+
+        self.client.force_authenticate(self.staff)
+        views = self.client.get('/api/metrics/').data['views']
+        restaurants = views['restaurant-list']
+        self.assertEqual((restaurants['requests'], restaurants['over_budget']), (2, 1))
+        self.assertEqual(restaurants['queries']['sum'], 2)
+        self.assertEqual(restaurants['queries']['buckets'][0], (0, 1))
+
+        text = self.client.get('/api/metrics/?format=prometheus').content.decode()
+        self.assertIn('api_request_latency_ms_bucket{view="restaurant-list",le="+Inf"} 2', text)
+        self.assertIn('api_request_over_budget_total{view="restaurant-list"} 1', text)
+
+        self.client.force_authenticate(None)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+
+    def test_disabled(self):
+        with override_settings(API_INSTRUMENTATION={'ENABLED': False}):
+            response = self.client_class().get('/api/restaurants/')
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(registry.snapshot(), {})
+
+
+class PerfSuiteTests(TestCase):
+    def test_replay_and_compare(self):
+        dataset = perfsuite.generate_dataset(restaurants=2, tables=2, days=3, slots_per_day=4, users=2)
+        self.assertEqual(dataset['slots'], 2 * 2 * 3 * 4)
+        self.assertEqual(TableAvailability.objects.filter(table__restaurant_id__in=dataset['restaurants']).count(), 12)
+
+        mix = perfsuite.synthetic_mix(dataset, size=40)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'mix.jsonl')
+            perfsuite.save_mix(mix, path)
+            self.assertEqual(perfsuite.load_mix(path), mix)
+
+        results, elapsed = perfsuite.replay_inprocess(mix)
+        report = perfsuite.summarize(results, elapsed)
+        self.assertEqual(report['total']['requests'], len(mix))
+        self.assertEqual(report['total']['errors'], 0, results)
+        self.assertEqual(perfsuite.compare(report, report), [])
+
+        slower = {name: dict(row, p50=row['p50'] * 2 + 1) for name, row in report.items()}
+        self.assertIn('total: p50', perfsuite.compare(slower, report)[-1])
+
+    def test_percentile_shared_with_loadtest(self):
+        from .management.commands import loadtest
+
+        self.assertIs(loadtest.percentile, perfsuite.percentile)
+        values = [float(n) for n in range(1, 101)]
+        self.assertEqual([perfsuite.percentile(values, share) for share in (0.5, 0.99, 1.0)], [51.0, 99.0, 100.0])
+        self.assertEqual(perfsuite.percentile([], 0.5), 0.0)
+
+
+class BackgroundJobsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='user')
+        self.restaurant = Restaurant.objects.create(name='R', address='A')
+        self.table = Table.objects.create(restaurant=self.restaurant, table_number='1', capacity=2)
+
+    @override_settings(BACKGROUND_JOBS={})
+    def test_claim_retry_and_failure(self):
+        calls = []
+
+        @jobs.job('test_flaky')
+        def flaky(fail):
+            calls.append(fail)
+            if fail:
+                raise RuntimeError('boom')
+            return {'ok': True}
+
+        self.addCleanup(jobs.JOBS.pop, 'test_flaky')
+        ok = jobs.enqueue('test_flaky', {'fail': False})
+        bad = jobs.enqueue('test_flaky', {'fail': True}, max_attempts=2)
+        later = jobs.enqueue('test_flaky', {'fail': False}, run_at=timezone.now() + timedelta(hours=1))
+
+        with self.assertLogs('api_restaurant.jobs', 'ERROR'):
+            self.assertEqual(jobs.work('w1'), 2)
+        ok.refresh_from_db()
+        bad.refresh_from_db()
+        self.assertEqual((ok.status, ok.result), ('done', {'ok': True}))
+        # Повтор отложен, отложенная задача ещё не готова
+        self.assertEqual((bad.status, bad.attempts), ('queued', 1))
+        self.assertIn('boom', bad.last_error)
+        self.assertEqual(jobs.work('w1'), 0)
+
+        Job.objects.filter(pk=bad.pk).update(run_at=timezone.now())
+        with self.assertLogs('api_restaurant.jobs', 'ERROR'):
+            self.assertEqual(jobs.work('w1'), 1)
+        bad.refresh_from_db()
+        self.assertEqual((bad.status, bad.attempts), ('failed', 2))
+        self.assertEqual(Job.objects.get(pk=later.pk).status, 'queued')
+
+        # Забранную задачу второй воркер не получит, зависшую - получит после LOCK_TIMEOUT
+        Job.objects.filter(pk=later.pk).update(run_at=timezone.now())
+        claimed = jobs.claim('w1')
+        self.assertIsNone(jobs.claim('w2'))
+        Job.objects.filter(pk=claimed.pk).update(locked_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.claim('w2').locked_by, 'w2')
+
+    def test_archive_keeps_booked_slots(self):
+        past = timezone.now() - timedelta(days=2)
+        free = TimeSlot.objects.create(table=self.table, start_time=past, end_time=past + timedelta(hours=1))
+        booked = TimeSlot.objects.create(table=self.table, start_time=past + timedelta(hours=2), end_time=past + timedelta(hours=3))
+        Booking.objects.create(user=self.user, table=self.table, timeslot=booked)
+        upcoming = TimeSlot.objects.create(table=self.table, start_time=hour(0), end_time=hour(1))
+
+        result = jobs.archive_expired_slots()
+        self.assertEqual(result['archived'], 1)
+        self.assertEqual(set(TimeSlot.objects.values_list('pk', flat=True)), {booked.pk, upcoming.pk})
+        history = TimeSlotHistory.objects.get()
+        self.assertEqual((history.slot_id, history.table_id, history.start_time), (free.pk, self.table.pk, past))
+        self.assertFalse(TableAvailability.objects.filter(date__lt=timezone.localdate()).exists())
+        self.assertEqual(jobs.archive_expired_slots()['archived'], 0)
+
+    def test_archive_refreshes_today_summary(self):
+        now = timezone.now()
+        midnight = timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0)
+        expired = TimeSlot.objects.create(table=self.table, start_time=midnight, end_time=now)
+        self.assertEqual(TableAvailability.objects.get(table=self.table, date=timezone.localdate(now)).free_slots, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(jobs.archive_expired_slots()['archived'], 1)
+        self.assertFalse(TableAvailability.objects.filter(table=self.table, date=timezone.localdate(now)).exists())
+        self.assertTrue(SlotChange.objects.filter(table_id=self.table.pk, date=timezone.localdate(now)).exists())
+        self.assertFalse(TimeSlot.objects.filter(pk=expired.pk).exists())
+
+    @override_settings(BACKGROUND_JOBS={'SLOT_HORIZON_DAYS': 7, 'PERIODIC': {'generate_scheduled_slots': 86400}})
+    def test_periodic_generation_from_schedule(self):
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        RestaurantSchedule.objects.create(
+            restaurant=self.restaurant, weekday=tomorrow.weekday(),
+            opens_at=datetime_time(12), closes_at=datetime_time(15), slot_minutes=60,
+        )
+        call_command('run_jobs', '--once', stdout=StringIO())
+        job = Job.objects.get(name='generate_scheduled_slots')
+        self.assertEqual((job.status, job.result), ('done', {'created': 3, 'skipped': 0}))
+        self.assertEqual(TableAvailability.objects.get(table=self.table, date=tomorrow).free_slots, 3)
+
+        # Следующий запуск - через интервал, а не сразу
+        call_command('run_jobs', '--once', stdout=StringIO())
+        self.assertEqual(Job.objects.filter(name='generate_scheduled_slots', status='done').count(), 1)
+        self.assertGreater(Job.objects.get(status='queued').run_at, timezone.now() + timedelta(hours=23))
+
+    @override_settings(BACKGROUND_JOBS={'AVAILABILITY_REFRESH': 'queue'})
+    def test_queued_availability_refresh(self):
+        TimeSlot.objects.create(table=self.table, start_time=hour(0), end_time=hour(1))
+        day = timezone.localdate(hour(0))
+        self.assertFalse(TableAvailability.objects.exists())
+        self.assertEqual(Job.objects.filter(name='refresh_availability', status='queued').count(), 1)
+
+        jobs.work('w1')
+        self.assertEqual(TableAvailability.objects.get(table=self.table, date=day).free_slots, 1)
+
+
+class ChangeFeedTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='user')
+        self.restaurant = Restaurant.objects.create(name='R', address='A')
+        self.table = Table.objects.create(restaurant=self.restaurant, table_number='1', capacity=2)
+        self.slot = TimeSlot.objects.create(table=self.table, start_time=hour(0), end_time=hour(1))
+        self.day = timezone.localdate(hour(0)).isoformat()
+
+    def changes(self):
+        return list(SlotChange.objects.order_by('id').values_list('kind', 'timeslot_id', 'status'))
+
+    def test_postgres_writes_under_feed_lock(self):
+        # На PostgreSQL строки журнала пишутся под advisory-блокировкой - id фиксируются по порядку
+        locks = []
+        connection.ensure_connection()
+        connection.connection.create_function('pg_advisory_xact_lock', 1, locks.append)
+        with patch.object(connection, 'vendor', 'postgresql'):
+            self.slot.delete()
+        self.assertEqual(locks, [FEED_LOCK_ID])
+        self.assertEqual(self.changes()[-1][0], 'deleted')
+
+    @override_settings(CHANGE_FEED={})
+    def test_mutations_are_logged_and_published(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = book_timeslot(self.user, self.slot.pk)
+        self.assertEqual(get_broker()._latest, SlotChange.objects.latest('id').pk)
+        booking.delete()
+        self.slot.refresh_from_db()
+        self.slot.start_time += timedelta(days=1)
+        self.slot.end_time += timedelta(days=1)
+        self.slot.save()
+        slot_id = self.slot.pk
+        self.slot.delete()
+        self.assertEqual(self.changes(), [
+            ('saved', slot_id, 'free'),
+            ('saved', slot_id, 'reserved'),
+            ('saved', slot_id, 'free'),
+            # перенос на другой день: из старого дня слот пропадает
+            ('deleted', slot_id, 'free'),
+            ('saved', slot_id, 'free'),
+            ('deleted', slot_id, 'free'),
+        ])
+
+        SlotChange.objects.all().delete()
+        slots = [TimeSlot.objects.create(table=self.table, start_time=hour(n), end_time=hour(n + 1)) for n in (3, 4)]
+        SlotChange.objects.all().delete()
+        book_timeslots(self.user, [slot.pk for slot in slots])
+        self.assertEqual(self.changes(), [('saved', slot.pk, 'reserved') for slot in slots])
+
+    async def test_long_poll(self):
+        url = f'/api/async/timeslots/changes/?restaurant={self.restaurant.pk}'
+        latest = (await SlotChange.objects.alatest('id')).pk
+        response = await self.async_client.get(url)
+        self.assertEqual(response.json(), {'cursor': latest, 'changes': []})
+
+        data = (await self.async_client.get(f'{url}&date={self.day}&after=0')).json()
+        self.assertEqual(data['cursor'], latest)
+        self.assertEqual(data['changes'][0]['timeslot'], self.slot.pk)
+        self.assertEqual(data['changes'][0]['start_time'], TimeSlotSerializer(self.slot).data['start_time'])
+
+        # Нет новых изменений - ответ после timeout с тем же курсором
+        data = (await self.async_client.get(f'{url}&after={latest}&timeout=0.05')).json()
+        self.assertEqual(data, {'cursor': latest, 'changes': []})
+        other = await Restaurant.objects.acreate(name='Other', address='B')
+        data = (await self.async_client.get(f'/api/async/timeslots/changes/?restaurant={other.pk}&after=0&timeout=0')).json()
+        self.assertEqual(data['changes'], [])
+        response = await self.async_client.get('/api/async/timeslots/changes/?after=0')
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(CHANGE_FEED={'STREAM_SECONDS': 0.2, 'POLL_INTERVAL': 0.05})
+    async def test_event_stream(self):
+        await TimeSlot.objects.filter(pk=self.slot.pk).aupdate(status='reserved')
+        first = (await SlotChange.objects.alatest('id')).pk
+        await sync_to_async(TimeSlot.objects.create)(table=self.table, start_time=hour(2), end_time=hour(3))
+
+        response = await self.async_client.get(
+            f'/api/async/timeslots/changes/stream/?restaurant={self.restaurant.pk}', headers={'Last-Event-ID': str(first)},
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = ''.join([chunk.decode() async for chunk in response.streaming_content])
+        events = [block for block in body.split('\n\n') if 'event: slot' in block]
+        self.assertEqual(len(events), 1)
+        change = json.loads(events[0].split('data: ', 1)[1])
+        self.assertEqual((change['kind'], change['status']), ('saved', 'free'))
+        self.assertIn(f"id: {change['id']}", events[0])
+
+    async def test_brokers_wake_waiters(self):
+        for broker in (InProcessBroker(), CacheBroker(alias='default', check_interval=0.01)):
+            caches['default'].delete(CacheBroker.key)
+            self.assertFalse(await broker.wait(0, 0.01))
+            waiter = asyncio.create_task(broker.wait(0, 5))
+            await asyncio.sleep(0.02)
+            await sync_to_async(broker.publish)(7)
+            self.assertTrue(await asyncio.wait_for(waiter, 1))
+            self.assertEqual(await broker.latest(), 7)
+
+
+class FullTextSearchTests(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        self.palace = Restaurant.objects.create(name='Pizza Palace', address='Main street 1')
+        self.roma = Restaurant.objects.create(name='Pizzeria Roma', address='Pizza lane 5')
+        self.sushi = Restaurant.objects.create(name='Sushi Bar', address='Ocean avenue 7')
+        self.table = Table.objects.create(restaurant=self.roma, table_number='12', capacity=4)
+        Table.objects.create(restaurant=self.sushi, table_number='12', capacity=2)
+
+    def names(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return [row.get('name') or row['restaurant_name'] for row in response.data['results']]
+
+    def test_prefix_ranked_and_typo_tolerant(self):
+        # "Pizza" в названии и в адресе у Roma - выше по bm25
+        self.assertEqual(search('restaurant', 'pizz'), [self.roma.pk, self.palace.pk])
+        self.assertEqual(self.names('/api/restaurants/?search=pizz'), ['Pizzeria Roma', 'Pizza Palace'])
+        self.assertEqual(self.names('/api/restaurants/?search=pizz&ordering=name'), ['Pizza Palace', 'Pizzeria Roma'])
+        self.assertEqual(self.names('/api/restaurants/?search=sush+oce'), ['Sushi Bar'])
+        self.assertEqual(self.names('/api/restaurants/?search=pizzaria'), ['Pizzeria Roma'])
+        self.assertEqual(self.names('/api/restaurants/?search=xyz'), [])
+        self.assertEqual(self.names('/api/tables/?search=roma+12'), ['Pizzeria Roma'])
+
+        with override_settings(SEARCH={'ENABLED': False}):
+            get_cache().clear()
+            self.assertEqual(self.names('/api/restaurants/?search=pizzaria'), [])
+
+    def test_broad_query_not_truncated(self):
+        # Совпадений больше MAX_RESULTS: все, без ранжирования, и count тоже полный
+        with override_settings(SEARCH={'MAX_RESULTS': 1}):
+            self.assertEqual(len(search('restaurant', 'pizz')), 1)
+            response = self.client.get('/api/restaurants/?search=pizz')
+            self.assertEqual(response.data['count'], 2)
+            self.assertEqual(sorted(row['name'] for row in response.data['results']), ['Pizza Palace', 'Pizzeria Roma'])
+            self.assertEqual(self.names('/api/restaurants/?search=pizzaria'), ['Pizzeria Roma'])
+
+    def test_index_follows_writes(self):
+        self.roma.name = 'Trattoria'
+        self.roma.save()
+        self.assertEqual(search('table', 'trattoria'), [self.table.pk])
+        self.assertEqual(search('restaurant', 'pizzeria'), [])
+
+        self.table.delete()
+        self.assertEqual(search('table', 'trattoria'), [])
+        self.sushi.delete()
+        self.assertEqual(search('table', '12'), [])
+        self.assertEqual(SearchEntry.objects.count(), 2)
+
+        SearchEntry.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(search('restaurant', 'tratt'), [self.roma.pk])
+
+    async def test_async_restaurant_search(self):
+        response = await self.async_client.get('/api/async/restaurants/?search=pizz')
+        self.assertEqual([row['name'] for row in response.json()['results']], ['Pizza Palace', 'Pizzeria Roma'])
+
+
+class ScalableAdminTests(TestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', password='pass')
+        self.user = User.objects.create(username='user')
+        restaurant = Restaurant.objects.create(name='R', address='A')
+        self.table = Table.objects.create(restaurant=restaurant, table_number='1', capacity=2)
+        self.slots = [
+            TimeSlot.objects.create(table=self.table, start_time=hour(n), end_time=hour(n + 1)) for n in range(3)
+        ]
+        self.booking = book_timeslot(self.user, self.slots[0].pk)
+        self.client.force_login(self.admin)
+
+    def action(self, model, action, ids):
+        return self.client.post(f'/admin/api_restaurant/{model}/', {
+            'action': action, '_selected_action': [str(pk) for pk in ids],
+        })
+
+    def changelist_queries(self, model):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(f'/admin/api_restaurant/{model}/').status_code, 200)
+        return len(queries)
+
+    def test_changelists_do_not_grow_with_rows(self):
+        few = [self.changelist_queries(model) for model in ('timeslot', 'booking')]
+        for n in range(3, 13):
+            slot = TimeSlot.objects.create(table=self.table, start_time=hour(n), end_time=hour(n + 1))
+            book_timeslot(self.user, slot.pk)
+        self.assertEqual([self.changelist_queries(model) for model in ('timeslot', 'booking')], few)
+        self.assertNotIn('value="delete_selected"', self.client.get('/admin/api_restaurant/timeslot/').content.decode())
+
+    def test_restaurant_filter_by_id(self):
+        few = self.changelist_queries('timeslot')
+        Restaurant.objects.bulk_create([Restaurant(name=f'R{n}', address='A') for n in range(20)])
+        other = Table.objects.create(restaurant=Restaurant.objects.last(), table_number='1', capacity=2)
+        TimeSlot.objects.create(table=other, start_time=hour(0), end_time=hour(1))
+        # Рестораны в боковую панель не загружаются
+        self.assertEqual(self.changelist_queries('timeslot'), few)
+
+        url = '/admin/api_restaurant/timeslot/'
+        response = self.client.get(url, {'restaurant': other.restaurant_id})
+        self.assertEqual([slot.table_id for slot in response.context['cl'].result_list], [other.pk])
+        self.assertContains(response, f'name="restaurant" value="{other.restaurant_id}"')
+        self.assertEqual(self.client.get(url, {'restaurant': 'x'}).url, f'{url}?e=1')
+
+    def test_paginator_estimates_unfiltered_count(self):
+        from .admin import EstimatedCountPaginator
+
+        with patch.object(EstimatedCountPaginator, 'count_limit', 2):
+            self.assertEqual(EstimatedCountPaginator(TimeSlot.objects.order_by('pk'), 100).count, 3)
+            # С фильтром - точный COUNT до count_limit
+            free = TimeSlot.objects.filter(status='free').order_by('pk')
+            self.assertEqual(EstimatedCountPaginator(free, 100).count, 2)
+
+    def test_slot_actions_are_set_based(self):
+        ids = [slot.pk for slot in self.slots]
+        day = timezone.localdate(hour(0))
+        SlotChange.objects.all().delete()
+
+        self.action('timeslot', 'free_selected', ids)
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(set(TimeSlot.objects.values_list('status', flat=True)), {'free'})
+        self.assertEqual(TableAvailability.objects.get(table=self.table, date=day).free_slots, 3)
+        self.assertEqual(list(SlotChange.objects.values_list('kind', flat=True)), ['reset'])
+
+        # Одно UPDATE на выборку: сигналы save() на каждый слот не шлются
+        with patch('api_restaurant.signals.record_slot_saved') as per_slot:
+            self.action('timeslot', 'reserve_selected', ids[:2])
+        per_slot.assert_not_called()
+        self.assertEqual(TableAvailability.objects.get(table=self.table, date=day).free_slots, 1)
+        self.assertEqual(TimeSlot.objects.filter(status='reserved').count(), 2)
+
+        book_timeslot(self.user, ids[2])
+        self.action('timeslot', 'delete_selected_slots', ids[1:])
+        self.assertEqual(list(TimeSlot.objects.values_list('pk', flat=True)), ids[:1])
+        self.assertFalse(Booking.objects.exists())
+        self.assertFalse(TableAvailability.objects.filter(table=self.table, date=day, free_slots__gt=0).exists())
+
+    def test_booking_cancel_action_frees_slots(self):
+        other = book_timeslot(self.user, self.slots[1].pk)
+        self.action('booking', 'cancel_selected', [self.booking.pk])
+        self.assertEqual(list(Booking.objects.values_list('pk', flat=True)), [other.pk])
+        self.assertEqual(TimeSlot.objects.get(pk=self.slots[0].pk).status, 'free')
+        self.assertEqual(TimeSlot.objects.get(pk=self.slots[1].pk).status, 'reserved')
+
+
+class BulkDataTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='user')
+        self.restaurant = Restaurant.objects.create(name='Roma', address='Main st')
+        self.table = Table.objects.create(restaurant=self.restaurant, table_number='1', capacity=2)
+        self.slots = [
+            TimeSlot.objects.create(table=self.table, start_time=hour(n), end_time=hour(n + 1)) for n in range(3)
+        ]
+        book_timeslot(self.user, self.slots[1].pk)
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def run_command(self, name, *args):
+        out, err = StringIO(), StringIO()
+        call_command(name, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_export_import_round_trip(self):
+        for fmt in ('ndjson', 'csv'):
+            path = os.path.join(self.directory.name, f'data.{fmt}')
+            self.run_command('export_restaurants', path, '--restaurant', str(self.restaurant.pk))
+            with self.assertNumQueries(14):
+                # Пачка: 3 bulk_create, брони (пользователи, слоты, UPDATE, INSERT), поисковые
+                # документы, сводка (агрегат, удаление, вставка), лента изменений + savepoint
+                out, err = self.run_command('import_restaurants', path)
+            self.assertEqual(err, '')
+            self.assertIn('restaurant: 1, table: 1, timeslot: 3, booking: 1', out)
+
+        copies = Restaurant.objects.exclude(pk=self.restaurant.pk)
+        self.assertEqual(copies.count(), 2)
+        for copy in copies:
+            slots = TimeSlot.objects.filter(table__restaurant=copy).order_by('start_time')
+            self.assertEqual(
+                [(slot.start_time, slot.status) for slot in slots],
+                [(slot.start_time, slot.status) for slot in self.slots[:1]] + [(hour(1), 'reserved'), (hour(2), 'free')],
+            )
+            self.assertEqual(Booking.objects.get(table__restaurant=copy).timeslot, slots[1])
+            self.assertEqual(
+                TableAvailability.objects.get(restaurant=copy, date=timezone.localdate(hour(0))).free_slots, 2,
+            )
+        self.assertEqual(sorted(search('restaurant', 'roma')), sorted([self.restaurant.pk, *copies.values_list('pk', flat=True)]))
+
+    def test_batch_touches_only_its_days(self):
+        path = os.path.join(self.directory.name, 'data.ndjson')
+        records = [
+            {'model': 'restaurant', 'id': 7, 'name': 'Chain', 'address': 'A'},
+            {'model': 'table', 'id': 70, 'restaurant': 7, 'table_number': '1', 'capacity': 4},
+            {'model': 'table', 'id': 71, 'restaurant': 7, 'table_number': '2', 'capacity': 4},
+            {'model': 'timeslot', 'table': 70, 'start_time': '2030-01-01T12:00:00', 'end_time': '2030-01-01T13:00:00'},
+            {'model': 'timeslot', 'table': 70, 'start_time': '2030-01-01T14:00:00', 'end_time': '2030-01-01T15:00:00'},
+            {'model': 'timeslot', 'table': 70, 'start_time': '2030-12-31T12:00:00', 'end_time': '2030-12-31T13:00:00'},
+            {'model': 'timeslot', 'table': 71, 'start_time': '2030-06-01T12:00:00', 'end_time': '2030-06-01T13:00:00'},
+        ]
+        with open(path, 'w') as file:
+            file.write('\n'.join(json.dumps(record) for record in records) + '\n')
+        SlotChange.objects.all().delete()
+        self.run_command('import_restaurants', path)
+
+        # Лента - по паре (столик, день), а не столики x дни года
+        self.assertEqual(
+            sorted((change.table.table_number, change.date.isoformat()) for change in SlotChange.objects.all()),
+            [('1', '2030-01-01'), ('1', '2030-12-31'), ('2', '2030-06-01')],
+        )
+        summary = TableAvailability.objects.filter(restaurant__name='Chain')
+        self.assertEqual(sorted((row.date.isoformat(), row.free_slots) for row in summary), [
+            ('2030-01-01', 2), ('2030-06-01', 1), ('2030-12-31', 1),
+        ])
+
+    def test_invalid_records_are_reported_and_skipped(self):
+        path = os.path.join(self.directory.name, 'data.ndjson')
+        records = [
+            {'model': 'restaurant', 'id': 7, 'name': 'Chain', 'address': 'A'},
+            {'model': 'table', 'id': 70, 'restaurant': 7, 'table_number': '1', 'capacity': 4},
+            {'model': 'table', 'id': 71, 'restaurant': 8, 'table_number': '2', 'capacity': 4},
+            {'model': 'timeslot', 'table': 70, 'start_time': '2030-01-01T12:00:00', 'end_time': '2030-01-01T13:00:00'},
+            {'model': 'timeslot', 'table': 70, 'start_time': '2030-01-01T12:30:00', 'end_time': '2030-01-01T13:30:00'},
+            {'model': 'timeslot', 'table': 70, 'start_time': '2030-01-01T11:00:00', 'end_time': '2030-01-01T12:00:00'},
+            {'model': 'booking', 'user': 'nobody', 'table': 70, 'start_time': '2030-01-01T12:00:00'},
+            {'model': 'booking', 'user': 'user', 'table': 70, 'start_time': '2030-01-01T14:00:00'},
+        ]
+        with open(path, 'w') as file:
+            file.write('\n'.join(json.dumps(record) for record in records) + '\nnot json\n')
+        out, err = self.run_command('import_restaurants', path, '--batch', '2')
+
+        self.assertEqual(err.splitlines(), [
+            'строка 3: restaurant 8 не найден выше в файле',
+            'строка 5: слот пересекается с другим слотом столика',
+            'строка 8: у столика нет слота с таким началом',
+            'строка 9: ожидался объект с model: restaurant, table, timeslot, booking',
+            'строка 7: пользователь nobody не найден',
+        ])
+        self.assertIn('пропущено с ошибками: 5', out)
+        table = Table.objects.get(restaurant__name='Chain')
+        self.assertEqual(TimeSlot.objects.filter(table=table, status='free').count(), 2)
+        self.assertFalse(Booking.objects.filter(table=table).exists())
+
+
+class FastJSONAndCompressionTests(APITestCase):
+    def setUp(self):
+        restaurant = Restaurant.objects.create(name='Ресторан', address='A')
+        table = Table.objects.create(restaurant=restaurant, table_number='1', capacity=2)
+        for n in range(40):
+            TimeSlot.objects.create(table=table, start_time=hour(n), end_time=hour(n + 1))
+        self.client.force_authenticate(User.objects.create(username='user'))
+        self.url = f'/api/timeslots/available/?restaurant={restaurant.pk}'
+
+    def test_renderer_matches_stdlib_bytes(self):
+        from decimal import Decimal
+
+        from rest_framework.renderers import JSONRenderer
+
+        from .renderers import FastJSONParser, FastJSONRenderer
+
+        data = {
+            'text': 'Ресторан "Рома" ', 'decimal': Decimal('1.50'), 'at': timezone.now(),
+            'day': timezone.localdate(), 'nested': [{1: None, 'ok': True}, (1.5, 2)], 'big': 2 ** 70,
+        }
+        for payload in (data, {key: value for key, value in data.items() if key != 'big'}):
+            self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+        with override_settings(API_JSON={'BACKEND': 'stdlib'}):
+            self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+        parser = FastJSONParser()
+        self.assertEqual(parser.parse(BytesIO('{"a": [1, "ё"]}'.encode())), {'a': [1, 'ё']})
+        with self.assertRaises(ParseError):
+            parser.parse(BytesIO(b'{"a": '))
+
+    def test_negotiated_compression(self):
+        plain = self.client.get(self.url)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        response = self.client.get(self.url, headers={'Accept-Encoding': 'br;q=1.0, gzip;q=0.5'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(int(response['Content-Length']), len(plain.content))
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        # Слабый ETag по-прежнему даёт 304
+        self.assertEqual(self.client.get(self.url, headers={'If-None-Match': response['ETag']}).status_code, 304)
+
+        self.assertNotIn('Content-Encoding', self.client.get(self.url, headers={'Accept-Encoding': 'gzip;q=0, *'}))
+        with override_settings(API_COMPRESSION={'MIN_SIZE': len(plain.content) + 1}):
+            self.assertNotIn('Content-Encoding', self.client.get(self.url, headers={'Accept-Encoding': 'gzip'}))
+
+    def test_streaming_export_is_gzipped(self):
+        self.client.force_authenticate(User.objects.create(username='staff', is_staff=True))
+        response = self.client.get('/api/timeslots/export/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(len(gzip.decompress(b''.join(response.streaming_content)).splitlines()), 40)
+
+
+class PrecomputedSchemaTests(APITestCase):
+    url = '/api/schema/'
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = Path(self.directory.name) / 'openapi.json'
+        settings_override = override_settings(API_SCHEMA={'PATH': self.path})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        schema.reset()
+        self.addCleanup(schema.reset)
+
+    def test_build_command_and_served_from_memory(self):
+        from drf_spectacular.generators import SchemaGenerator
+
+        call_command('build_schema', stdout=StringIO())
+        stored = json.loads(self.path.read_bytes())
+        self.assertEqual(stored['fingerprint'], schema.fingerprint())
+        built = stored['schema']
+        self.assertIn('/api/restaurants/', built['paths'])
+        self.assertIn('text/plain', built['paths']['/api/metrics/']['get']['responses']['200']['content'])
+        etag = self.client.get(self.url, {'format': 'json'})['ETag']
+
+        schema.reset()
+        self.assertTrue(schema.load())
+        with patch.object(SchemaGenerator, 'get_schema') as get_schema:
+            response = self.client.get(self.url, {'format': 'json'})
+            yaml = self.client.get(self.url)
+            cached = self.client.get(self.url, {'format': 'json'}, headers={'If-None-Match': response['ETag']})
+        get_schema.assert_not_called()
+
+        # Процесс, собравший схему, и процессы, прочитавшие файл, отдают один ETag
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response['Content-Type'], 'application/vnd.oai.openapi+json')
+        self.assertEqual(json.loads(response.content), built)
+        self.assertTrue(yaml['Content-Type'].startswith('application/vnd.oai.openapi;'))
+        self.assertIn(b'/api/restaurants/:', yaml.content)
+        self.assertNotEqual(yaml['ETag'], response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_stale_file_is_not_served(self):
+        self.path.write_text(json.dumps({'fingerprint': 'old', 'schema': {'openapi': '3.0.3', 'paths': {}}}))
+        with self.assertLogs('api_restaurant.schema', 'WARNING'):
+            self.assertFalse(schema.load())
+        response = self.client.get(self.url, {'format': 'json'})
+        self.assertIn('/api/restaurants/', json.loads(response.content)['paths'])
+
+    def test_generated_once_without_file(self):
+        from drf_spectacular.generators import SchemaGenerator
+
+        self.assertFalse(schema.load())
+        with patch.object(SchemaGenerator, 'get_schema', autospec=True, side_effect=SchemaGenerator.get_schema) as get_schema:
+            first = self.client.get(self.url, {'format': 'json'})
+            second = self.client.get(self.url, {'format': 'json'})
+        self.assertEqual(get_schema.call_count, 1)
+        self.assertEqual(first.content, second.content)
+
+        with override_settings(API_SCHEMA={'PRECOMPUTED': False}), \
+                patch.object(SchemaGenerator, 'get_schema', autospec=True, side_effect=SchemaGenerator.get_schema) as get_schema:
+            self.assertEqual(self.client.get(self.url, {'format': 'json'}).status_code, 200)
+        self.assertEqual(get_schema.call_count, 1)
+
+    def test_docs_page(self):
+        response = self.client.get('/api/docs/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '/api/schema/')
@@ -4,8 +4,10 @@ from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
-from .views import RestaurantViewSet, TableViewSet, BookingViewSet, TimeSlotViewSet, RegisterView
+from drf_spectacular.views import SpectacularSwaggerView
+from .views import RestaurantViewSet, TableViewSet, BookingViewSet, TimeSlotViewSet, RegisterView, MetricsView
+from . import async_views
+from .schema import PrecomputedSchemaView
 
 router = DefaultRouter()
 router.register(r'restaurants', RestaurantViewSet, basename='restaurant')
@@ -16,8 +18,17 @@ router.register(r'timeslots', TimeSlotViewSet, basename='timeslot')
 urlpatterns = [
     path('', include(router.urls)),
     path('register/', RegisterView.as_view(), name='register'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    path('schema/', SpectacularAPIView.as_view(), name='schema'),
+    # Схема из памяти (schema.py); собирается manage.py build_schema
+    path('schema/', PrecomputedSchemaView.as_view(), name='schema'),
     path('docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+    # ASGI-нативные версии read-эндпоинтов (async ORM)
+    path('async/restaurants/', async_views.restaurant_list, name='async-restaurant-list'),
+    path('async/tables/available/', async_views.tables_available, name='async-tables-available'),
+    path('async/timeslots/available/', async_views.timeslots_available, name='async-timeslots-available'),
+    # Лента изменений слотов (changefeed.py)
+    path('async/timeslots/changes/', async_views.timeslot_changes, name='async-timeslot-changes'),
+    path('async/timeslots/changes/stream/', async_views.timeslot_changes_stream, name='async-timeslot-changes-stream'),
 ]
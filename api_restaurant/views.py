@@ -1,16 +1,34 @@
 from .models import Restaurant, Table, Booking, TimeSlot
-from .serializers import RestaurantSerializer, TableSerializer, BookingSerializer, TimeSlotSerializer, RegisterSerializer
+from .serializers import (
+    RestaurantSerializer, TableSerializer, BookingSerializer, TimeSlotSerializer, RegisterSerializer,
+    TimeSlotGenerateSerializer, BookingBatchSerializer,
+)
 from rest_framework import viewsets, permissions, filters, generics, status
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.renderers import JSONRenderer
+from rest_framework.views import APIView
 from rest_framework.decorators import action
+from django.db.models import F
 from django.utils import timezone
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from .authentication import ClaimsRefreshToken
+from .caching import CachedReadMixin, cached_response
+from .export import export_response
+from .grid import ALLOWED_STEPS, slot_grid
+from .instrumentation import PrometheusRenderer, instrumentation_settings, registry
+from .pagination import BookingPagination, TablePagination, TimeSlotPagination
+from .routers import ReplicaReadMixin
+from .rows import BOOKING_ROW, TIMESLOT_ROW, FastReadMixin
+from .search import FullTextSearchFilter
 
-class RestaurantViewSet(viewsets.ModelViewSet):
+class RestaurantViewSet(ReplicaReadMixin, CachedReadMixin, viewsets.ModelViewSet):
+    cache_depends_on = ('restaurant',)
     queryset = Restaurant.objects.all()
     serializer_class = RestaurantSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [filters.OrderingFilter, FullTextSearchFilter]
+    search_kind = 'restaurant'
     search_fields = ['name', 'address']
     ordering_fields = ['name']
     ordering = ['name']
@@ -21,10 +39,12 @@ class RestaurantViewSet(viewsets.ModelViewSet):
             return [permissions.IsAdminUser()]  # Только админ может создавать, изменять, удалять
         return [permissions.AllowAny()]  # Пользователь может только смотреть
 
-class TableViewSet(viewsets.ModelViewSet):
+class TableViewSet(ReplicaReadMixin, CachedReadMixin, viewsets.ModelViewSet):
+    cache_depends_on = ('restaurant', 'table', 'timeslot')
     queryset = Table.objects.select_related('restaurant').all()
     serializer_class = TableSerializer
-    filter_backends = [filters.SearchFilter, DjangoFilterBackend, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, FullTextSearchFilter]
+    search_kind = 'table'
     search_fields = ['table_number', 'restaurant__name']
     filterset_fields = ['restaurant', 'capacity']
     ordering_fields = ['table_number', 'capacity']
@@ -36,10 +56,9 @@ class TableViewSet(viewsets.ModelViewSet):
         return [permissions.AllowAny()]  # Пользователь может только смотреть
 
     @action(detail=False, methods=['get'])
+    @cached_response
     def available(self, request):
         """Получить столики с доступными слотами"""
-        from datetime import timedelta
-
         restaurant_id = request.query_params.get('restaurant')
         capacity = request.query_params.get('capacity')
         date = request.query_params.get('date')
@@ -51,29 +70,28 @@ class TableViewSet(viewsets.ModelViewSet):
         if capacity:
             queryset = queryset.filter(capacity__gte=capacity)
 
-        # Фильтрация столиков с доступными слотами
+        # Фильтрация столиков с доступными слотами: одна выборка по сводке TableAvailability
         if date:
             target_date = timezone.datetime.strptime(date, '%Y-%m-%d').date()
-            start_datetime = timezone.make_aware(timezone.datetime.combine(target_date, timezone.datetime.min.time()))
-            end_datetime = start_datetime + timedelta(days=1)
-
-            tables_with_available_slots = Table.objects.filter(
-                time_slots__status='free',
-                time_slots__start_time__gte=start_datetime,
-                time_slots__start_time__lt=end_datetime
-            ).distinct()
-
-            queryset = queryset.filter(id__in=tables_with_available_slots)
+            queryset = queryset.filter(availability__date=target_date)
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        # Список обычный, а available - курсорами с ограниченным размером страницы
+        paginator = TablePagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
-class BookingViewSet(viewsets.ModelViewSet):
-    queryset = Booking.objects.select_related('user', 'table', 'table__restaurant', 'time_slot').all()
+class BookingViewSet(FastReadMixin, viewsets.ModelViewSet):
+    read_row = BOOKING_ROW
+    # timeslot_start - аннотация, а не путь timeslot__start_time: курсор читает поле сортировки с самой строки
+    queryset = Booking.objects.select_related('user', 'table', 'table__restaurant', 'timeslot').annotate(
+        timeslot_start=F('timeslot__start_time')
+    )
     serializer_class = BookingSerializer
+    pagination_class = BookingPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['table', 'table__restaurant']
-    ordering_fields = ['created_at', 'time_slot__start_time']
+    ordering_fields = ['created_at', 'timeslot_start']
     ordering = ['-created_at']
 
     def get_queryset(self):
@@ -85,13 +103,34 @@ class BookingViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_staff:
             return self.queryset
-        return self.queryset.filter(user=user)
+        # user может быть ClaimsUser без строки из БД (authentication.py), поэтому по id
+        return self.queryset.filter(user_id=user.pk)
+
+    def get_serializer_class(self):
+        if self.action == 'batch':
+            return BookingBatchSerializer
+        return super().get_serializer_class()
 
     def get_permissions(self):
-        if self.action in ['list', 'create', 'retrieve', 'destroy']:
+        if self.action in ['list', 'create', 'retrieve', 'destroy', 'batch']:
             return [permissions.IsAuthenticated()]
         return [permissions.IsAdminUser()]
 
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Забронировать несколько слотов (столики на компанию, подряд идущие слоты) одним запросом"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        bookings = serializer.save()
+        created = Booking.objects.filter(pk__in=[booking.pk for booking in bookings]).order_by('timeslot__start_time', 'pk')
+        return Response(BOOKING_ROW.rows(created), status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Потоковая выгрузка броней (?fmt=ndjson|csv) с теми же фильтрами, что и список"""
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_response(request, queryset, BOOKING_ROW, 'bookings')
+
 class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
     permission_classes = [permissions.AllowAny]
@@ -100,16 +139,38 @@ class RegisterView(generics.CreateAPIView):
         user = self.serializer_class(data=request.data)
         user.is_valid(raise_exception=True)
         created_user = user.save()
-        refresh = RefreshToken.for_user(created_user)
+        refresh = ClaimsRefreshToken.for_user(created_user)
         return Response({
             "user": user.data,
             "refresh": str(refresh),
             "access": str(refresh.access_token),
         }, status=status.HTTP_201_CREATED)
 
-class TimeSlotViewSet(viewsets.ModelViewSet):
+class MetricsView(APIView):
+    """Метрики инструментации по эндпоинтам (JSON или ?format=prometheus), только для staff"""
+    permission_classes = [permissions.IsAdminUser]
+    renderer_classes = [JSONRenderer, PrometheusRenderer]
+
+    # Сериализатора нет: снимок метрик - произвольный объект, Prometheus - текст
+    @extend_schema(responses={
+        (200, 'application/json'): OpenApiTypes.OBJECT,
+        (200, 'text/plain'): OpenApiTypes.STR,
+    })
+    def get(self, request):
+        config = instrumentation_settings()
+        return Response({
+            'enabled': config['ENABLED'],
+            'sample_rate': config['SAMPLE_RATE'],
+            'query_budget': config['QUERY_BUDGET'],
+            'views': registry.snapshot(),
+        })
+
+class TimeSlotViewSet(ReplicaReadMixin, CachedReadMixin, FastReadMixin, viewsets.ModelViewSet):
+    read_row = TIMESLOT_ROW
+    cache_depends_on = ('restaurant', 'table', 'timeslot', 'booking')
     queryset = TimeSlot.objects.select_related('table', 'table__restaurant').all()
     serializer_class = TimeSlotSerializer
+    pagination_class = TimeSlotPagination
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['status', 'table', 'table__restaurant']
     ordering_fields = ['start_time', 'end_time']
@@ -126,14 +187,37 @@ class TimeSlotViewSet(viewsets.ModelViewSet):
 
         return queryset
 
+    def get_serializer_class(self):
+        if self.action == 'generate':
+            return TimeSlotGenerateSerializer
+        return super().get_serializer_class()
+
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'generate', 'export']:
             return [permissions.IsAdminUser()]  # Только админ может создавать, изменять, удалять
         return [permissions.AllowAny()]  # Пользователь может только смотреть
 
+    @action(detail=False, methods=['post'])
+    def generate(self, request):
+        """Сгенерировать слоты по часам работы одним запросом (вместо POST на каждый слот)"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        result = serializer.save()
+        return Response(result, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Потоковая выгрузка слотов (?fmt=ndjson|csv) с теми же фильтрами, что и список"""
+        queryset = self.filter_queryset(self.get_queryset())
+        return export_response(request, queryset, TIMESLOT_ROW, 'timeslots')
+
     @action(detail=False, methods=['get'])
+    @cached_response
     def available(self, request):
         # Получить доступные слоты времени с фильтрацией
+        if request.query_params.get('layout') == 'grid':
+            return self.grid_response(request)
+
         queryset = self.get_queryset().filter(
             status='free',
             start_time__gte=timezone.now()
@@ -163,5 +247,29 @@ class TimeSlotViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
 
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
\ No newline at end of file
+        if self.fast_read_enabled():
+            return self.fast_rows_response(queryset)
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def grid_response(self, request):
+        """?layout=grid&restaurant=&date=[&step=30]: день ресторана сеткой ячеек (см. grid.py)"""
+        try:
+            restaurant = int(request.query_params['restaurant'])
+            date = timezone.datetime.strptime(request.query_params['date'], '%Y-%m-%d').date()
+            step = int(request.query_params.get('step', 30))
+        except (KeyError, ValueError):
+            return Response(
+                {"detail": "Для layout=grid нужны restaurant и date (YYYY-MM-DD)."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if step not in ALLOWED_STEPS:
+            return Response(
+                {"detail": f"step - одно из {', '.join(map(str, ALLOWED_STEPS))} минут."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        grid = slot_grid(restaurant, date, self.get_queryset(), step)
+        if grid is None:
+            return Response({"detail": "Ресторан не найден."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(grid)
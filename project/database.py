@@ -0,0 +1,96 @@
+"""
+Настройки БД из переменных окружения.
+
+DB_ENGINE=sqlite (по умолчанию) или postgresql.
+
+SQLite:
+  DB_NAME            путь к файлу (по умолчанию BASE_DIR / 'db.sqlite3')
+  DB_SQLITE_TUNED    1 (по умолчанию) - WAL, synchronous=NORMAL, busy_timeout, mmap
+                     и BEGIN IMMEDIATE для транзакций; 0 - настройки SQLite по умолчанию
+  DB_BUSY_TIMEOUT    сколько секунд ждать блокировку записи (по умолчанию 5)
+
+PostgreSQL:
+  DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+  DB_POOL            1 - пул соединений Django 5.1+ (нужен psycopg[pool]);
+  DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE
+
+Общие:
+  DB_CONN_MAX_AGE    время жизни постоянного соединения, секунд (по умолчанию 60;
+                     с пулом всегда 0 - соединения держит пул)
+  DB_REPLICAS        реплики для чтения через запятую: пути к файлам для SQLite,
+                     хосты для PostgreSQL. Получают алиасы replica1, replica2, ...
+                     (см. api_restaurant/routers.py). Локально SQLite-реплику
+                     можно обновлять командой sync_sqlite_replica.
+"""
+import os
+
+
+def _env_bool(environ, name, default):
+    return environ.get(name, '1' if default else '0').lower() in ('1', 'true', 'yes', 'on')
+
+
+def sqlite_options(busy_timeout):
+    """PRAGMA выполняются на каждом новом соединении (init_command, Django 5.1+)."""
+    return {
+        'timeout': busy_timeout,
+        # Запись сразу берёт блокировку: без неё две транзакции "прочитал - пишу"
+        # упираются друг в друга и одна из них получает "database is locked"
+        'transaction_mode': 'IMMEDIATE',
+        'init_command': (
+            'PRAGMA journal_mode=WAL;'
+            'PRAGMA synchronous=NORMAL;'
+            f'PRAGMA busy_timeout={int(busy_timeout * 1000)};'
+            'PRAGMA mmap_size=134217728;'
+            'PRAGMA temp_store=MEMORY;'
+        ),
+    }
+
+
+def database_config(base_dir, environ=os.environ):
+    engine = environ.get('DB_ENGINE', 'sqlite')
+    conn_max_age = int(environ.get('DB_CONN_MAX_AGE', 60))
+
+    if engine == 'sqlite':
+        config = {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': environ.get('DB_NAME') or base_dir / 'db.sqlite3',
+            'CONN_MAX_AGE': conn_max_age,
+            'CONN_HEALTH_CHECKS': True,
+        }
+        if _env_bool(environ, 'DB_SQLITE_TUNED', True):
+            config['OPTIONS'] = sqlite_options(float(environ.get('DB_BUSY_TIMEOUT', 5)))
+        return _with_replicas(config, environ, 'NAME')
+
+    if engine == 'postgresql':
+        config = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': environ.get('DB_NAME', 'api_exam'),
+            'USER': environ.get('DB_USER', ''),
+            'PASSWORD': environ.get('DB_PASSWORD', ''),
+            'HOST': environ.get('DB_HOST', ''),
+            'PORT': environ.get('DB_PORT', ''),
+            'CONN_MAX_AGE': conn_max_age,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+        if _env_bool(environ, 'DB_POOL', False):
+            config['CONN_MAX_AGE'] = 0
+            config['OPTIONS']['pool'] = {
+                'min_size': int(environ.get('DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(environ.get('DB_POOL_MAX_SIZE', 20)),
+            }
+        return _with_replicas(config, environ, 'HOST')
+
+    raise ValueError(f'Неизвестный DB_ENGINE: {engine}')
+
+
+def _with_replicas(config, environ, replica_key):
+    databases = {'default': config}
+    replicas = [value.strip() for value in environ.get('DB_REPLICAS', '').split(',') if value.strip()]
+    for number, value in enumerate(replicas, start=1):
+        replica = dict(config, OPTIONS=dict(config.get('OPTIONS', {})))
+        replica[replica_key] = value
+        # В тестах реплика - та же тестовая БД, что и основная
+        replica['TEST'] = {'MIRROR': 'default'}
+        databases[f'replica{number}'] = replica
+    return databases
@@ -0,0 +1,65 @@
+"""
+Хеширование паролей из переменных окружения.
+
+  PASSWORD_HASHER      scrypt (по умолчанию) | argon2 (нужен argon2-cffi) | pbkdf2
+  SCRYPT_WORK_FACTOR   N, степень двойки (по умолчанию 2**14)
+  SCRYPT_BLOCK_SIZE    r (по умолчанию 8)
+  SCRYPT_PARALLELISM   p (по умолчанию 1)
+  ARGON2_TIME_COST     по умолчанию 2
+  ARGON2_MEMORY_COST   КиБ, по умолчанию 102400
+  ARGON2_PARALLELISM   по умолчанию 8
+  PBKDF2_ITERATIONS    по умолчанию 1000000
+  HASHING_WORKERS      сколько хешей считается одновременно (по умолчанию - число ядер)
+  HASHING_QUEUE        сколько запросов может ждать свободного воркера, сверх этого -
+                       ответ 503 (по умолчанию 4 * HASHING_WORKERS)
+
+Выбранный алгоритм идёт первым в PASSWORD_HASHERS, остальные остаются для проверки
+старых хешей. Хеш другого алгоритма или с другими параметрами стоимости
+пересчитывается при успешном входе (стандартный механизм Django, must_update).
+"""
+import os
+
+HASHERS = {
+    'scrypt': 'api_restaurant.hashers.ScryptPasswordHasher',
+    'argon2': 'api_restaurant.hashers.Argon2PasswordHasher',
+    'pbkdf2': 'api_restaurant.hashers.PBKDF2PasswordHasher',
+}
+
+LEGACY_HASHERS = [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+PARAMS = {
+    'SCRYPT_WORK_FACTOR': 2 ** 14,
+    'SCRYPT_BLOCK_SIZE': 8,
+    'SCRYPT_PARALLELISM': 1,
+    'ARGON2_TIME_COST': 2,
+    'ARGON2_MEMORY_COST': 102400,
+    'ARGON2_PARALLELISM': 8,
+    'PBKDF2_ITERATIONS': 1000000,
+}
+
+
+def password_hashers(environ=os.environ):
+    algorithm = environ.get('PASSWORD_HASHER', 'scrypt')
+    if algorithm not in HASHERS:
+        raise ValueError(f'Неизвестный PASSWORD_HASHER: {algorithm}')
+    if algorithm == 'argon2':
+        try:
+            import argon2  # noqa: F401
+        except ImportError:
+            raise ValueError('PASSWORD_HASHER=argon2 требует пакет argon2-cffi')
+    return [HASHERS[algorithm]] + [path for name, path in HASHERS.items() if name != algorithm] + LEGACY_HASHERS
+
+
+def password_hasher_params(environ=os.environ):
+    return {name: int(environ.get(name, default)) for name, default in PARAMS.items()}
+
+
+def hashing_pool(environ=os.environ):
+    workers = int(environ.get('HASHING_WORKERS', os.cpu_count() or 1))
+    return {
+        'WORKERS': workers,
+        'QUEUE': int(environ.get('HASHING_QUEUE', 4 * workers)),
+    }
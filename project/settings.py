@@ -10,8 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
+
+from .database import database_config
+from .passwords import hashing_pool, password_hasher_params, password_hashers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -44,6 +49,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы время запроса включало все остальные middleware; выключен - не в цепочке
+    'api_restaurant.instrumentation.InstrumentationMiddleware',
+    # Сжатие ответов API (gzip/brotli); выше всех, кто может менять тело ответа
+    'api_restaurant.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -51,6 +60,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api_restaurant.middleware.PrimaryPinMiddleware',
 ]
 
 ROOT_URLCONF = 'project.urls'
@@ -76,12 +86,13 @@ WSGI_APPLICATION = 'project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
-}
+# Движок, пул/постоянные соединения и режим SQLite задаются переменными окружения,
+# см. project/database.py. Без переменных - db.sqlite3 в WAL-режиме
+DATABASES = database_config(BASE_DIR)
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['api_restaurant.routers.PrimaryReplicaRouter']
+# Сколько секунд после изменяющего запроса клиент читает только из основной БД
+REPLICA_PIN_SECONDS = 5
 
 
 # Password validation
@@ -103,6 +114,13 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Хеширование паролей: алгоритм, параметры стоимости и пул потоков задаются
+# переменными окружения, см. project/passwords.py. По умолчанию - scrypt
+PASSWORD_HASHERS = password_hashers()
+PASSWORD_HASHER_PARAMS = password_hasher_params()
+PASSWORD_HASHING_POOL = hashing_pool()
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -129,7 +147,8 @@ AUTH_USER_MODEL = 'api_restaurant.User'
 
 REST_FRAMEWORK = {
    'DEFAULT_AUTHENTICATION_CLASSES': (
-       'rest_framework_simplejwt.authentication.JWTAuthentication',
+       # id, username и is_staff берутся из токена, без запроса User (api_restaurant/authentication.py)
+       'api_restaurant.authentication.ClaimsJWTAuthentication',
    ),
    'DEFAULT_PERMISSION_CLASSES': (
        'rest_framework.permissions.IsAuthenticated',
@@ -137,6 +156,16 @@ REST_FRAMEWORK = {
    'DEFAULT_FILTER_BACKENDS': (
        'django_filters.rest_framework.DjangoFilterBackend',
    ),
+   # JSON через orjson с откатом на стандартный (api_restaurant/renderers.py, настройка API_JSON)
+   'DEFAULT_RENDERER_CLASSES': (
+       'api_restaurant.renderers.FastJSONRenderer',
+       'rest_framework.renderers.BrowsableAPIRenderer',
+   ),
+   'DEFAULT_PARSER_CLASSES': (
+       'api_restaurant.renderers.FastJSONParser',
+       'rest_framework.parsers.FormParser',
+       'rest_framework.parsers.MultiPartParser',
+   ),
    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
    'PAGE_SIZE': 10,
    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
@@ -144,10 +173,98 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
    "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),  # Время жизни токена доступа, установлено 30 минут, по умолчанию 5 минут
    "REFRESH_TOKEN_LIFETIME": timedelta(days=7),  # Время жизни токена обновления, установлено 7 дней, по умолчанию 1 день
+   "TOKEN_OBTAIN_SERIALIZER": "api_restaurant.authentication.ClaimsTokenObtainPairSerializer",  # Клеймы пользователя в токене
+   "TOKEN_REFRESH_SERIALIZER": "api_restaurant.authentication.ClaimsTokenRefreshSerializer",  # Клеймы при обновлении - из БД
 }
 
+# Доверять клеймам токена (False - пользователь всегда из кэша/БД)
+API_AUTH_TRUST_CLAIMS = True
+# Сколько секунд пользователь лежит в кэше, если клеймам не доверяем
+AUTH_USER_CACHE_TIMEOUT = 60
+
 
 # Чтобы была возможность обрабатывать формы при https протоколе
 CSRF_TRUSTED_ORIGINS = [
    'https://localhost:8000',
 ]
+
+
+# Кэш ответов публичных read-эндпоинтов (api_restaurant/caching.py).
+# Бэкенд можно заменить на общий для всех процессов, например:
+#   'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': '/var/tmp/api_cache'
+#   'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379'
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-responses',
+    },
+}
+API_CACHE = {
+    'ENABLED': True,
+    'ALIAS': 'api',
+    'TIMEOUT': 60,
+}
+
+# Списки слотов и броней строятся из .values() без ModelSerializer (api_restaurant/rows.py)
+API_FAST_READ_PATH = True
+
+# Инструментация запросов (api_restaurant/instrumentation.py): время, SQL, сериализация
+# по эндпоинтам, /api/metrics/ для staff. По умолчанию выключена
+API_INSTRUMENTATION = {
+    'ENABLED': os.environ.get('API_INSTRUMENTATION', '0') == '1',
+    'SAMPLE_RATE': float(os.environ.get('API_INSTRUMENTATION_SAMPLE_RATE', 1.0)),
+    'QUERY_BUDGET': int(os.environ.get('API_QUERY_BUDGET', 20)),
+}
+
+# Фоновые задачи на очереди в БД (api_restaurant/jobs.py), воркер - manage.py run_jobs.
+# PERIODIC - имя задачи -> интервал в секундах. AVAILABILITY_REFRESH='queue' - сводку
+# доступности пересчитывает воркер, а не запрос, изменивший слоты
+BACKGROUND_JOBS = {
+    'POLL_INTERVAL': 5,
+    'SLOT_HORIZON_DAYS': int(os.environ.get('SLOT_HORIZON_DAYS', 30)),
+    'AVAILABILITY_REFRESH': os.environ.get('AVAILABILITY_REFRESH', 'sync'),
+    'PERIODIC': {
+        'archive_expired_slots': 3600,
+        'generate_scheduled_slots': 86400,
+        'prune_slot_changes': 3600,
+    },
+}
+
+# Лента изменений слотов (api_restaurant/changefeed.py): long-poll и SSE вместо опроса
+# /api/timeslots/available/. Брокер по умолчанию - в памяти процесса; для нескольких
+# процессов - api_restaurant.changefeed.CacheBroker с общим кэшем (file, redis) в CACHE_ALIAS
+CHANGE_FEED = {
+    'BROKER': os.environ.get('CHANGE_FEED_BROKER', 'api_restaurant.changefeed.InProcessBroker'),
+    'CACHE_ALIAS': 'default',
+    'RETENTION_HOURS': 24,
+}
+
+# Полнотекстовый поиск ресторанов и столиков (api_restaurant/search.py): FTS5 на SQLite,
+# tsvector + pg_trgm на PostgreSQL. ENABLED=False - обычный SearchFilter (LIKE)
+SEARCH = {
+    'ENABLED': True,
+    'MAX_RESULTS': 500,
+}
+
+# JSON API: 'auto' - orjson, если установлен; 'orjson' | 'stdlib' - явно (api_restaurant/renderers.py)
+API_JSON = {
+    'BACKEND': os.environ.get('API_JSON_BACKEND', 'auto'),
+}
+
+# Сжатие ответов API по Accept-Encoding (api_restaurant/middleware.py): brotli, если
+# установлен пакет brotli, иначе gzip; ответы короче MIN_SIZE байт не сжимаются
+API_COMPRESSION = {
+    'ENABLED': os.environ.get('API_COMPRESSION', '1') == '1',
+    'MIN_SIZE': 1024,
+}
+
+# Схема OpenAPI (api_restaurant/schema.py): собирается manage.py build_schema при деплое,
+# читается с диска при старте и отдаётся из памяти с ETag. PRECOMPUTED=False - генерация
+# на каждый запрос, как у SpectacularAPIView
+API_SCHEMA = {
+    'PRECOMPUTED': os.environ.get('API_SCHEMA_PRECOMPUTED', '1') == '1',
+    'PATH': os.environ.get('API_SCHEMA_PATH', BASE_DIR / 'openapi-schema.json'),
+}